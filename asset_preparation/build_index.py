@@ -3,7 +3,11 @@
 # ==============================================================================
 
 import os
+import sys
+import json
+import hashlib
 import logging
+from datetime import datetime
 from pathlib import Path
 from typing import List, Dict, Any, Optional
 import pandas as pd
@@ -21,6 +25,22 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Index types accepted by OptimizedRAGIndexer(index_type=...)
+INDEX_TYPES = ("auto", "flat", "ivf_flat", "sq8", "sqfp16", "ivf_pq", "hnsw")
+# Index types that store compressed (lossy) codes instead of float32 vectors
+QUANTIZED_INDEX_TYPES = ("sq8", "sqfp16", "ivf_pq")
+
+# File layout, text store, BM25 tokenizer and ONNX encoder are shared with the
+# web demo's search layer, so what is built here is exactly what it reads
+WEB_DEMO_DIR = Path(__file__).resolve().parent.parent / "web_demo"
+if str(WEB_DEMO_DIR) not in sys.path:
+    sys.path.append(str(WEB_DEMO_DIR))
+from src.rag.lexical import tokenize
+from src.rag.manifest import MANIFEST_SUFFIX
+from src.rag.metadata import METADATA_SUFFIX
+from src.rag.packs import DEFAULT_KB_NAME, LEXICAL_SUFFIX, VECTORS_SUFFIX, pack_paths
+from src.rag.text_store import write_text_store
+
 class OptimizedRAGIndexer:
     """
     Optimized RAG indexer with performance improvements and error handling.
@@ -32,16 +52,53 @@ class OptimizedRAGIndexer:
         chunk_size: int = 512,
         chunk_overlap: int = 50,
         batch_size: int = 32,
-        use_gpu: bool = False
+        use_gpu: bool = False,
+        bm25_k1: float = 1.2,
+        bm25_b: float = 0.75,
+        index_type: str = "auto",
+        nlist: Optional[int] = None,
+        pq_m: int = 16,
+        pq_nbits: int = 8,
+        use_opq: bool = False,
+        store_exact_vectors: Optional[bool] = None,
+        hnsw_m: int = 32,
+        hnsw_ef_construction: int = 200,
+        ef_search: int = 64,
+        nprobe: int = 8,
+        encoder_backend: str = "torch",
+        onnx_model_path: Optional[str] = None
     ):
         self.model_name = model_name
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
         self.batch_size = batch_size
         self.use_gpu = use_gpu
+        self.bm25_k1 = bm25_k1
+        self.bm25_b = bm25_b
+        # One of INDEX_TYPES; "auto" keeps the flat/IVF choice by dataset size
+        self.index_type = index_type
+        self.nlist = nlist
+        self.pq_m = pq_m
+        self.pq_nbits = pq_nbits
+        self.use_opq = use_opq
+        # Exact vectors for search-time re-ranking; defaults to on for lossy indexes
+        self.store_exact_vectors = store_exact_vectors
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construction = hnsw_ef_construction
+        # Default search-time knobs recorded in the manifest; callers can override per search
+        self.ef_search = ef_search
+        self.nprobe = nprobe
+        # "onnx" runs an exported (optionally int8) model on ONNX Runtime, see
+        # web_demo/src/rag/encoders.py; onnx_model_path points at the .onnx file
+        self.encoder_backend = encoder_backend
+        self.onnx_model_path = onnx_model_path
+        self.index_report: Dict[str, Any] = {}
         self.embedding_model = None
         self.index = None
+        self.index_params: Dict[str, Any] = {}
         self.texts = []
+        # (plant, disease) label per chunk, parallel to self.texts
+        self.chunk_metadata: List[tuple] = []
         
         # Optimize Windows environment
         self._optimize_windows_environment()
@@ -62,7 +119,11 @@ class OptimizedRAGIndexer:
     
     def load_embedding_model(self):
         """Load embedding model with optimizations."""
-        logger.info(f"Loading embedding model: '{self.model_name}'")
+        logger.info(f"Loading embedding model: '{self.model_name}' ({self.encoder_backend} backend)")
+        
+        if self.encoder_backend == "onnx":
+            self._load_onnx_embedding_model()
+            return
         
         try:
             device = 'cuda' if self.use_gpu else 'cpu'
@@ -83,6 +144,20 @@ class OptimizedRAGIndexer:
             logger.error(f"❌ Failed to load embedding model: {e}")
             raise
     
+    def _load_onnx_embedding_model(self):
+        """Load the ONNX Runtime encoder shared with the web demo's search layer."""
+        try:
+            # Same backend as query-time search, so index and query vectors match.
+            # src.rag imports its search layer lazily, so this loads encoders.py only.
+            from src.rag.encoders import load_encoder
+            
+            self.embedding_model = load_encoder("onnx", self.model_name, self.onnx_model_path)
+            logger.info(f"✅ ONNX embedding model loaded from {self.onnx_model_path}")
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to load ONNX embedding model: {e}")
+            raise
+    
     def create_optimized_chunks(self, text: str) -> List[str]:
         """Create optimized text chunks with better boundary detection."""
         if not text or len(text.strip()) < 10:
@@ -123,6 +198,7 @@ class OptimizedRAGIndexer:
         try:
             df = pd.read_csv(csv_path)
             all_chunks = []
+            self.chunk_metadata = []
             
             # Process each row
             for idx, row in tqdm(df.iterrows(), total=len(df), desc="Processing documents"):
@@ -138,9 +214,11 @@ class OptimizedRAGIndexer:
                 chunks = self.create_optimized_chunks(combined_text)
                 
                 # Add metadata to chunks
+                labels = self._row_labels(row)
                 for chunk in chunks:
                     chunk_with_meta = f"[Source: Row {idx+1}] {chunk}"
                     all_chunks.append(chunk_with_meta)
+                    self.chunk_metadata.append(labels)
             
             logger.info(f"✅ Successfully created {len(all_chunks)} text chunks")
             return all_chunks
@@ -149,6 +227,47 @@ class OptimizedRAGIndexer:
             logger.error(f"❌ Failed to process knowledge base: {e}")
             raise
     
+    @staticmethod
+    def _row_labels(row: pd.Series) -> tuple:
+        """
+        Extract (plant, disease) labels for a knowledge base row.
+        
+        Uses the 'plant'/'disease' columns when present, otherwise splits the
+        'disease_name' column ("Tomato___Late_Blight") as in create_database.py.
+        """
+        plant = row.get('plant') if pd.notna(row.get('plant')) else None
+        disease = row.get('disease') if pd.notna(row.get('disease')) else None
+        disease_name = row.get('disease_name')
+        if (plant is None or disease is None) and pd.notna(disease_name):
+            head, _, tail = str(disease_name).partition('___')
+            plant = plant or head
+            disease = disease or (tail or head)
+        return (
+            str(plant or 'unknown').replace('_', ' ').strip(),
+            str(disease or 'unknown').replace('_', ' ').strip()
+        )
+    
+    def save_chunk_metadata(self, index_path: str):
+        """
+        Save per-chunk plant/disease labels as '<index>.meta.npz'.
+        
+        Each field is stored as sorted distinct labels plus an int32 label id per
+        chunk; web_demo/src/rag/metadata.py turns them into per-crop partitions.
+        """
+        metadata_path = os.path.splitext(index_path)[0] + METADATA_SUFFIX
+        try:
+            arrays = {'chunk_count': np.array(len(self.chunk_metadata), dtype=np.int64)}
+            for position, field in enumerate(('plant', 'disease')):
+                values = [labels[position] for labels in self.chunk_metadata]
+                labels, ids = np.unique(np.array(values, dtype=str), return_inverse=True)
+                arrays[f'{field}_labels'] = labels
+                arrays[f'{field}_ids'] = ids.astype(np.int32)
+            np.savez(metadata_path, **arrays)
+            logger.info(f"✅ Chunk metadata saved to: {metadata_path}")
+        except Exception as e:
+            logger.error(f"❌ Failed to save chunk metadata: {e}")
+            raise
+    
     def generate_embeddings_batch(self, texts: List[str]) -> np.ndarray:
         """Generate embeddings in batches for better performance."""
         if not self.embedding_model:
@@ -185,27 +304,46 @@ class OptimizedRAGIndexer:
             raise
     
     def build_faiss_index(self, embeddings: np.ndarray) -> faiss.Index:
-        """Build optimized FAISS index."""
-        logger.info("Building FAISS index")
+        """
+        Build optimized FAISS index.
+        
+        index_type selects the storage format:
+        - "auto": flat below 1000 vectors, IVF-Flat above (full float32)
+        - "flat" / "ivf_flat": full float32 vectors
+        - "sq8" / "sqfp16": scalar quantization, 1 or 2 bytes per dimension
+        - "ivf_pq": IVF with product quantization, pq_m * pq_nbits / 8 bytes per
+          vector; use_opq adds an OPQ rotation to reduce quantization error
+        - "hnsw": HNSW graph over float32 vectors (hnsw_m links per node), good
+          recall/latency for tens of thousands to a few million chunks
+        """
+        logger.info(f"Building FAISS index (type: {self.index_type})")
         
         try:
+            embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
             dimension = embeddings.shape[1]
+            factory_string = self._index_factory_string(len(embeddings), dimension)
+            index = faiss.index_factory(dimension, factory_string, faiss.METRIC_INNER_PRODUCT)
             
-            # Choose index type based on data size
-            if len(embeddings) < 1000:
-                # Use flat index for small datasets
-                index = faiss.IndexFlatIP(dimension)  # Inner product for normalized vectors
-            else:
-                # Use IVF index for larger datasets
-                nlist = min(100, int(np.sqrt(len(embeddings))))
-                quantizer = faiss.IndexFlatIP(dimension)
-                index = faiss.IndexIVFFlat(quantizer, dimension, nlist)
-                
-                # Train the index
-                index.train(embeddings.astype(np.float32))
+            # Graph construction quality must be set before vectors are added
+            hnsw_index = faiss.downcast_index(index)
+            if isinstance(hnsw_index, faiss.IndexHNSW):
+                hnsw_index.hnsw.efConstruction = self.hnsw_ef_construction
+            
+            # Train the index (IVF centroids, scalar ranges, PQ codebooks)
+            if not index.is_trained:
+                index.train(embeddings)
             
             # Add embeddings to index
-            index.add(embeddings.astype(np.float32))
+            index.add(embeddings)
+            
+            # Store the default search knobs in the index itself as well
+            if 'nprobe' in self.index_params:
+                faiss.extract_index_ivf(index).nprobe = self.index_params['nprobe']
+            if isinstance(hnsw_index, faiss.IndexHNSW):
+                hnsw_index.hnsw.efSearch = self.ef_search
+            
+            self.index_params['factory_string'] = factory_string
+            self.index_params['lossy'] = self.index_type in QUANTIZED_INDEX_TYPES
             
             logger.info(f"✅ FAISS index built with {index.ntotal} vectors")
             return index
@@ -214,6 +352,103 @@ class OptimizedRAGIndexer:
             logger.error(f"❌ Failed to build FAISS index: {e}")
             raise
     
+    def _index_factory_string(self, n_vectors: int, dimension: int) -> str:
+        """Translate index_type into a FAISS index_factory string."""
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown index_type '{self.index_type}'. Expected one of {INDEX_TYPES}.")
+        
+        index_type = self.index_type
+        if index_type == "auto":
+            # Use flat index for small datasets, IVF for larger ones
+            index_type = "flat" if n_vectors < 1000 else "ivf_flat"
+        
+        nlist = self.nlist or min(100, int(np.sqrt(n_vectors)))
+        self.index_params = {}
+        
+        if index_type == "flat":
+            return "Flat"
+        if index_type == "sq8":
+            return "SQ8"
+        if index_type == "sqfp16":
+            return "SQfp16"
+        if index_type == "hnsw":
+            self.index_params.update({
+                'hnsw_m': self.hnsw_m,
+                'ef_construction': self.hnsw_ef_construction,
+                'ef_search': self.ef_search,
+            })
+            return f"HNSW{self.hnsw_m},Flat"
+        
+        self.index_params.update({'nlist': nlist, 'nprobe': min(self.nprobe, nlist)})
+        if index_type == "ivf_flat":
+            return f"IVF{nlist},Flat"
+        
+        # ivf_pq
+        if dimension % self.pq_m != 0:
+            raise ValueError(f"pq_m={self.pq_m} must divide the embedding dimension {dimension}")
+        if n_vectors < 39 * (1 << self.pq_nbits):
+            logger.warning(
+                f"Only {n_vectors} vectors to train {1 << self.pq_nbits} PQ centroids; "
+                "recall may suffer. Consider sq8 or fewer pq_nbits."
+            )
+        self.index_params.update({'pq_m': self.pq_m, 'pq_nbits': self.pq_nbits, 'opq': self.use_opq})
+        prefix = f"OPQ{self.pq_m}," if self.use_opq else ""
+        return f"{prefix}IVF{nlist},PQ{self.pq_m}x{self.pq_nbits}"
+    
+    def evaluate_index(self, index: faiss.Index, embeddings: np.ndarray,
+                       k: int = 10, n_queries: int = 200) -> Dict[str, Any]:
+        """
+        Report memory per vector and recall@k against an exact flat baseline.
+        
+        A sample of the indexed embeddings is used as queries; recall@k is the
+        fraction of each query's exact top-k that the built index also returns.
+        """
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        k = min(k, len(embeddings))
+        rng = np.random.default_rng(0)
+        sample = rng.choice(len(embeddings), size=min(n_queries, len(embeddings)), replace=False)
+        queries = embeddings[sample]
+        
+        baseline = faiss.IndexFlatIP(embeddings.shape[1])
+        baseline.add(embeddings)
+        _, exact_ids = baseline.search(queries, k)
+        _, approx_ids = index.search(queries, k)
+        
+        hits = sum(
+            len(np.intersect1d(exact_ids[row], approx_ids[row]))
+            for row in range(len(queries))
+        )
+        index_bytes = int(faiss.serialize_index(index).nbytes)
+        
+        self.index_report = {
+            'bytes_per_vector': index_bytes / max(index.ntotal, 1),
+            'flat_bytes_per_vector': embeddings.shape[1] * 4,
+            'index_bytes': index_bytes,
+            f'recall@{k}': hits / (len(queries) * k),
+            'recall_queries': len(queries),
+        }
+        logger.info(
+            f"Index report: {self.index_report['bytes_per_vector']:.1f} bytes/vector "
+            f"(flat: {self.index_report['flat_bytes_per_vector']}), "
+            f"recall@{k} = {self.index_report[f'recall@{k}']:.3f}"
+        )
+        return self.index_report
+    
+    def save_exact_vectors(self, embeddings: np.ndarray, index_path: str):
+        """
+        Save full-precision vectors as '<index>.vectors.npy' for re-ranking.
+        
+        The search layer memory-maps this file, so it costs disk, not RAM.
+        """
+        vectors_path = os.path.splitext(index_path)[0] + VECTORS_SUFFIX
+        try:
+            np.save(vectors_path, np.ascontiguousarray(embeddings, dtype=np.float32))
+            self.index_params['vectors_file'] = os.path.basename(vectors_path)
+            logger.info(f"✅ Exact vectors saved to: {vectors_path}")
+        except Exception as e:
+            logger.error(f"❌ Failed to save exact vectors: {e}")
+            raise
+    
     def save_index_and_texts(self, index: faiss.Index, texts: List[str], 
                            index_path: str, texts_path: str):
         """Save FAISS index and texts with error handling."""
@@ -227,10 +462,125 @@ class OptimizedRAGIndexer:
                 pickle.dump(texts, f, protocol=pickle.HIGHEST_PROTOCOL)
             logger.info(f"✅ Text data saved to: {texts_path}")
             
+            # Save texts as a memory-mappable UTF-8 blob + offsets array
+            self.save_text_store(texts, texts_path)
+            
         except Exception as e:
             logger.error(f"❌ Failed to save index/texts: {e}")
             raise
     
+    def build_bm25_index(self, texts: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Build a compact BM25 inverted index with precomputed term weights.
+        
+        Postings are stored as flat NumPy arrays (see web_demo/src/rag/lexical.py),
+        so query-time scoring is a vectorized scatter-add per query term.
+        """
+        logger.info("Building BM25 inverted index")
+        
+        try:
+            postings: Dict[str, Dict[int, int]] = {}
+            doc_lengths = np.zeros(len(texts), dtype=np.float32)
+            
+            for doc_id, text in enumerate(texts):
+                tokens = tokenize(text)
+                doc_lengths[doc_id] = len(tokens)
+                for token in tokens:
+                    term_postings = postings.setdefault(token, {})
+                    term_postings[doc_id] = term_postings.get(doc_id, 0) + 1
+            
+            n_docs = len(texts)
+            avg_length = float(doc_lengths.mean()) if n_docs else 0.0
+            k1, b = self.bm25_k1, self.bm25_b
+            
+            terms = sorted(postings)
+            offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+            docs_parts, weight_parts = [], []
+            
+            for t, term in enumerate(terms):
+                doc_ids = np.fromiter(sorted(postings[term]), dtype=np.int32)
+                tf = np.array([postings[term][d] for d in doc_ids], dtype=np.float32)
+                df = len(doc_ids)
+                idf = np.log((n_docs - df + 0.5) / (df + 0.5) + 1.0)
+                norm = k1 * (1.0 - b + b * doc_lengths[doc_ids] / max(avg_length, 1e-6))
+                docs_parts.append(doc_ids)
+                weight_parts.append((idf * tf * (k1 + 1.0) / (tf + norm)).astype(np.float32))
+                offsets[t + 1] = offsets[t] + df
+            
+            bm25 = {
+                'terms': np.array(terms, dtype=str),
+                'postings_offsets': offsets,
+                'postings_docs': np.concatenate(docs_parts) if docs_parts else np.empty(0, dtype=np.int32),
+                'postings_weights': np.concatenate(weight_parts) if weight_parts else np.empty(0, dtype=np.float32),
+                'doc_count': np.array(n_docs, dtype=np.int64),
+            }
+            
+            logger.info(f"✅ BM25 index built: {len(terms)} terms, {offsets[-1]} postings")
+            return bm25
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to build BM25 index: {e}")
+            raise
+    
+    def save_bm25_index(self, bm25: Dict[str, np.ndarray], index_path: str):
+        """Save the BM25 index as '<index>.bm25.npz' next to the FAISS index."""
+        bm25_path = os.path.splitext(index_path)[0] + LEXICAL_SUFFIX
+        try:
+            np.savez(bm25_path, **bm25)
+            logger.info(f"✅ BM25 index saved to: {bm25_path}")
+        except Exception as e:
+            logger.error(f"❌ Failed to save BM25 index: {e}")
+            raise
+    
+    def save_manifest(self, index: faiss.Index, texts: List[str], index_path: str):
+        """
+        Save '<index>.manifest.json' describing how the index was built.
+        
+        web_demo/src/rag/manifest.py reads it to choose the scoring path and to
+        refuse an index built with a different embedding model.
+        """
+        manifest_path = os.path.splitext(index_path)[0] + MANIFEST_SUFFIX
+        
+        content_hash = hashlib.sha256()
+        for text in texts:
+            content_hash.update(text.encode('utf-8'))
+            content_hash.update(b"\0")
+        
+        manifest = {
+            'metric': 'inner_product' if index.metric_type == faiss.METRIC_INNER_PRODUCT else 'l2',
+            'normalized': True,  # generate_embeddings_batch uses normalize_embeddings=True
+            'embedding_model': self.model_name,
+            'dimension': index.d,
+            'chunk_count': len(texts),
+            'content_hash': content_hash.hexdigest(),
+            'index_type': type(index).__name__,
+            'index_params': self.index_params,
+            'build_report': self.index_report,
+            'created_at': datetime.now().isoformat(),
+        }
+        
+        try:
+            with open(manifest_path, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2)
+            logger.info(f"✅ Index manifest saved to: {manifest_path}")
+        except Exception as e:
+            logger.error(f"❌ Failed to save index manifest: {e}")
+            raise
+    
+    def save_text_store(self, texts: List[str], texts_path: str):
+        """
+        Save texts as one UTF-8 blob plus an int64 offsets array.
+        
+        Written by web_demo/src/rag/text_store.py, which also memory-maps them.
+        """
+        try:
+            write_text_store(texts, texts_path)
+            logger.info(f"✅ Text store saved next to: {texts_path}")
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to save text store: {e}")
+            raise
+    
     def build_complete_index(self, csv_path: str, output_dir: str):
         """Build complete RAG index with all optimizations."""
         logger.info("--- Starting Optimized Knowledge Base Indexing ---")
@@ -251,17 +601,27 @@ class OptimizedRAGIndexer:
             # Build FAISS index
             self.index = self.build_faiss_index(embeddings)
             
-            # Save index and texts
-            # Create archive directory if it doesn't exist
-            archive_dir = Path(output_dir) / "_archive"
-            archive_dir.mkdir(exist_ok=True, parents=True)
+            # Save index and texts where the web demo's search layer reads the
+            # default knowledge base; every side file goes next to the index
+            index_path, texts_path = pack_paths(output_dir, DEFAULT_KB_NAME)
+            
+            self.save_index_and_texts(self.index, self.texts, index_path, texts_path)
+            
+            # Measure memory/recall trade-off and keep exact vectors for re-ranking
+            self.evaluate_index(self.index, embeddings)
+            store_vectors = self.store_exact_vectors
+            if store_vectors is None:
+                store_vectors = self.index_params.get('lossy', False)
+            if store_vectors:
+                self.save_exact_vectors(embeddings, index_path)
+            
+            self.save_manifest(self.index, self.texts, index_path)
             
-            # Use versioned filename
-            index_path = archive_dir / "knowledge_base_v0_generic_46-class.faiss"
-            texts_path = Path(output_dir) / "knowledge_base_text.pkl"
+            # Per-chunk crop/disease labels for filtered search
+            self.save_chunk_metadata(index_path)
             
-            self.save_index_and_texts(self.index, self.texts, 
-                                    str(index_path), str(texts_path))
+            # Build and save the lexical index next to the FAISS index
+            self.save_bm25_index(self.build_bm25_index(self.texts), index_path)
             
             # Performance summary
             self._print_performance_summary()
@@ -283,6 +643,12 @@ class OptimizedRAGIndexer:
             print(f"📐 Embedding dimension: {self.index.d}")
             print(f"🎯 Model: {self.model_name}")
             print(f"⚡ Batch size: {self.batch_size}")
+            print(f"🗂️  Index type: {type(self.index).__name__} ({self.index_params.get('factory_string', '')})")
+            if self.index_report:
+                recall_key = next(k for k in self.index_report if k.startswith('recall@'))
+                print(f"💾 Bytes per vector: {self.index_report['bytes_per_vector']:.1f} "
+                      f"(flat: {self.index_report['flat_bytes_per_vector']})")
+                print(f"🎯 {recall_key} vs flat: {self.index_report[recall_key]:.3f}")
             print("="*60)
 
 # ==============================================================================
@@ -298,7 +664,10 @@ def main():
         "chunk_size": 512,
         "chunk_overlap": 50,
         "batch_size": 32,
-        "use_gpu": False  # Set to True if you have CUDA GPU
+        "use_gpu": False,  # Set to True if you have CUDA GPU
+        # "sq8" / "sqfp16" / "ivf_pq" trade recall for memory on regional packs,
+        # "hnsw" gives better recall/latency for mid-sized indexes
+        "index_type": "auto"
     }
     
     # Paths
@@ -12,20 +12,31 @@ from pathlib import Path
 # [Previous imports remain the same]
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'src')))
 
-from src.pipeline.inference import get_gemma_diagnosis, load_model as load_gemma_model
+from src.pipeline.inference import get_gemma_diagnosis
 from src.pipeline.uncertainty import is_uncertain
-from src.utils.audio_processing import transcribe_audio, text_to_speech, load_whisper_model
-from src.rag.search import search_knowledge_base, load_search_dependencies
+from src.utils.audio_processing import transcribe_audio, text_to_speech
+from src.rag.search import search_knowledge_base
+from src.utils.cache_utils import rate_limit
+from src.utils.resilience import DeadlineExceeded, remaining_time, request_deadline
+from src.utils.logging_utils import configure_logging
+from src.pipeline.startup import start_background_loading, TEXT_COMPONENTS, AUDIO_COMPONENTS
+
+# Package logging is queued to a background writer of the rotating rag_search.log
+configure_logging()
 
 # --- Load models at startup ---
-print("--- Initializing all models. This may take a moment. ---")
-try:
-    load_gemma_model()
-    load_whisper_model()
-    load_search_dependencies()
-    print("--- ✅ All models initialized successfully. ---")
-except Exception as e:
-    print(f"❌ FATAL ERROR during model initialization: {e}")
+# All models load in parallel in the background; text requests are served as
+# soon as the LLM and RAG components are ready, voice once Whisper is.
+print("--- Initializing all models in the background. ---")
+startup = start_background_loading()
+
+# Seconds a request waits for still-loading components before giving up
+STARTUP_WAIT_TIMEOUT = 120
+
+# Seconds one diagnosis may take before retries and waits on shared work are
+# abandoned; once it has passed, the RAG fallback is skipped and the initial
+# diagnosis is returned
+PIPELINE_DEADLINE = 90
 
 # --- Bilingual Labels ---
 LABELS = {
@@ -289,7 +300,12 @@ def _run_diagnostic_pipeline(image_path: str, audio_path: str, text_query: str =
     # Step 3: Check uncertainty and RAG fallback
     print("\n[Step 3/5] Checking for uncertainty...")
     final_diagnosis = initial_diagnosis
-    if is_uncertain(initial_diagnosis):
+    remaining = remaining_time()
+    if is_uncertain(initial_diagnosis) and remaining is not None and remaining <= 0:
+        print("⚠️ Initial diagnosis is uncertain, but the deadline has passed. Skipping RAG fallback.")
+    elif is_uncertain(initial_diagnosis) and not startup.rag_ready():
+        print("⚠️ Initial diagnosis is uncertain, but the knowledge base is not available. Skipping RAG fallback.")
+    elif is_uncertain(initial_diagnosis):
         print("⚠️ Initial diagnosis is uncertain. Triggering RAG fallback.")
         context = search_knowledge_base(user_query, top_k=2)
         
@@ -302,7 +318,10 @@ def _run_diagnostic_pipeline(image_path: str, audio_path: str, text_query: str =
                 f"Context:\n{context_str}\n"
                 "Provide final diagnosis and remedy in both English and Hindi if possible."
             )
-            final_diagnosis = get_gemma_diagnosis(image_path, rag_prompt)
+            try:
+                final_diagnosis = get_gemma_diagnosis(image_path, rag_prompt)
+            except DeadlineExceeded:
+                print("⚠️ Deadline passed during re-evaluation. Using the initial diagnosis.")
     
     # Step 4: Format bilingual response
     formatted_diagnosis = format_bilingual_response(final_diagnosis, user_query)
@@ -484,8 +503,23 @@ def extract_hindi_text(formatted_html: str) -> str:
     
     return clean_text
 
+def _rate_limit_key(request) -> str:
+    """
+    Rate limit key of a request: its Gradio session.
+    
+    Client addresses are not used when a session is known: behind a load
+    balancer or a carrier NAT many farmers share one address.
+    """
+    if request is None:
+        return "default"
+    session = getattr(request, 'session_hash', None)
+    if session:
+        return f"session:{session}"
+    return request.client.host if request.client else "default"
+
 # --- Simplified UI function ---
-def diagnose_plant_bilingual(image_input, audio_input, text_input, selected_problem):
+def diagnose_plant_bilingual(image_input, audio_input, text_input, selected_problem,
+                             request: gr.Request = None):
     """Main function for bilingual diagnosis"""
     
     # Validation
@@ -521,6 +555,66 @@ def diagnose_plant_bilingual(image_input, audio_input, text_input, selected_prob
         """
         return error_msg, None
     
+    # Voice input needs Whisper, which may still be loading or may have failed
+    if not query_text and startup.failed(*AUDIO_COMPONENTS):
+        error_msg = """
+        <div class='result-card result-bad'>
+            <span class='emoji-big'>🎤</span>
+            <h3>Voice input is unavailable / आवाज़ सुविधा उपलब्ध नहीं है</h3>
+            <p>Please type the problem or select a common problem<br>
+            कृपया समस्या टाइप करें या आम समस्याओं में से चुनें</p>
+        </div>
+        """
+        return error_msg, None
+    if not query_text and not startup.audio_ready():
+        error_msg = """
+        <div class='result-card result-bad'>
+            <span class='emoji-big'>⏳</span>
+            <h3>Voice input is starting / आवाज़ सुविधा शुरू हो रही है</h3>
+            <p>Please type the problem or select a common problem for now<br>
+            कृपया अभी समस्या टाइप करें या आम समस्याओं में से चुनें</p>
+        </div>
+        """
+        return error_msg, None
+    
+    # Text requests need the LLM; the RAG fallback degrades to no context
+    # while the knowledge base is loading or if it failed
+    if not startup.wait_for(*TEXT_COMPONENTS, timeout=STARTUP_WAIT_TIMEOUT):
+        failed = startup.failed(*TEXT_COMPONENTS)
+        if failed:
+            # Details go to the console; users only see that the service is down
+            for name, error in failed.items():
+                print(f"❌ Component '{name}' failed to load: {error}")
+            error_msg = """
+            <div class='result-card result-bad'>
+                <span class='emoji-big'>⚠️</span>
+                <h3>Service unavailable / सेवा उपलब्ध नहीं है</h3>
+                <p>The diagnosis models could not be loaded. Please contact the administrator.<br>
+                निदान मॉडल लोड नहीं हो सके। कृपया व्यवस्थापक से संपर्क करें।</p>
+            </div>
+            """
+        else:
+            error_msg = """
+            <div class='result-card result-bad'>
+                <span class='emoji-big'>⏳</span>
+                <h3>Models are still loading / मॉडल लोड हो रहे हैं</h3>
+                <p>Please try again in a moment / कृपया थोड़ी देर बाद पुनः प्रयास करें</p>
+            </div>
+            """
+        return error_msg, None
+    
+    # Full diagnoses run the LLM, so they have their own, lower per-user limit.
+    # Checked last, so rejected or invalid requests don't use up the budget.
+    if not rate_limit(_rate_limit_key(request), route="diagnosis"):
+        error_msg = """
+        <div class='result-card result-bad'>
+            <span class='emoji-big'>⏳</span>
+            <h3>Too many requests / बहुत अधिक अनुरोध</h3>
+            <p>Please wait a minute and try again / कृपया एक मिनट रुककर पुनः प्रयास करें</p>
+        </div>
+        """
+        return error_msg, None
+    
     # Process the inputs
     temp_dir = os.path.join(tempfile.gettempdir(), "krishi_sahayak_temp")
     os.makedirs(temp_dir, exist_ok=True)
@@ -545,9 +639,10 @@ def diagnose_plant_bilingual(image_input, audio_input, text_input, selected_prob
     
     # Run pipeline
     try:
-        final_diagnosis, output_audio_path = _run_diagnostic_pipeline(
-            image_path, audio_path, query_text
-        )
+        with request_deadline(PIPELINE_DEADLINE):
+            final_diagnosis, output_audio_path = _run_diagnostic_pipeline(
+                image_path, audio_path, query_text
+            )
         
         # Clean up temp files
         for path in [audio_path, image_path]:
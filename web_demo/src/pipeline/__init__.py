@@ -4,7 +4,7 @@ AI Pipeline for KrishiSahayak.
 This package contains the core AI processing pipeline for the KrishiSahayak application,
 including model inference and uncertainty estimation.
 """
-from .inference import get_gemma_diagnosis, load_model
+from .inference import get_gemma_diagnosis, aget_gemma_diagnosis, load_model
 from .uncertainty import is_uncertain
 
-__all__ = ['get_gemma_diagnosis', 'load_model', 'is_uncertain']
+__all__ = ['get_gemma_diagnosis', 'aget_gemma_diagnosis', 'load_model', 'is_uncertain']
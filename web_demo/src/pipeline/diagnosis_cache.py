@@ -0,0 +1,118 @@
+# --- src/pipeline/diagnosis_cache.py ---
+"""
+Cache of GGUF model diagnoses.
+
+A diagnosis depends on three things: the prompt, the model file and the
+sampling parameters, so together they form the key:
+  - the prompt, normalized (case and whitespace) and hashed;
+  - the SHA-256 of the model file, computed once and remembered in a
+    ``<model>.sha256`` sidecar, recomputed whenever the file's size or
+    modification time changes;
+  - the sampling parameters (max tokens, temperature, seed, ...).
+
+Entries are kept in a bounded in-memory LRU + TTL cache, backed by the
+persistent cache tier so they survive restarts. The cache is only used with
+greedy decoding, where a cached diagnosis is exactly what a new generation
+would return; sampled diagnoses are always generated fresh.
+"""
+import os
+import json
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+from ..utils.bounded_cache import BoundedTTLCache
+from ..utils.cache_utils import normalize_query, get_persistent, set_persistent
+
+logger = logging.getLogger(__name__)
+
+HASH_SUFFIX = ".sha256"
+# Bytes read per step while hashing the model file
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def model_file_hash(path: str) -> str:
+    """
+    SHA-256 of a model file, reusing the sidecar written by an earlier run.
+
+    Hashing a multi-GB GGUF file takes seconds, so the digest is stored next to
+    it together with the file's size and modification time.
+    """
+    stat = os.stat(path)
+    stamp = f"{stat.st_size} {stat.st_mtime_ns}"
+    sidecar = path + HASH_SUFFIX
+    try:
+        with open(sidecar, 'r', encoding='utf-8') as f:
+            saved_stamp, digest = f.read().split("\n")[:2]
+        if saved_stamp == stamp and digest:
+            return digest
+    except (OSError, ValueError):
+        pass
+
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+    try:
+        with open(sidecar, 'w', encoding='utf-8') as f:
+            f.write(f"{stamp}\n{digest}\n")
+    except OSError as e:
+        logger.warning(f"Could not save model hash next to {path}: {e}")
+    return digest
+
+
+class DiagnosisCache:
+    """Bounded, TTL-aware cache of diagnoses keyed on prompt, model and sampling."""
+
+    NAMESPACE = "diagnosis"
+
+    def __init__(self, max_entries: int = 512, max_bytes: int = 8 * 1024 * 1024,
+                 ttl: float = 24 * 3600):
+        """
+        Args:
+            max_entries: Max diagnoses kept in memory.
+            max_bytes: Max approximate size of the diagnoses kept in memory.
+            ttl: Seconds a diagnosis is served after it was generated.
+        """
+        self.ttl = ttl
+        self._memory = BoundedTTLCache(max_entries=max_entries, max_bytes=max_bytes, ttl=ttl, stripes=4)
+        self._lock = threading.Lock()
+        self._persistent_hits = 0
+
+    @staticmethod
+    def key(prompt: str, sampling: Dict[str, Any]) -> str:
+        """Cache key of a prompt generated with the given sampling parameters."""
+        prompt_hash = hashlib.sha256(normalize_query(prompt).encode('utf-8')).hexdigest()
+        return f"{prompt_hash}|{json.dumps(sampling, sort_keys=True)}"
+
+    def get(self, model_hash: str, key: str) -> Optional[str]:
+        """Return a cached diagnosis from memory or the persistent tier, or None."""
+        memory_key = f"{model_hash}|{key}"
+        text = self._memory.get(memory_key)
+        if text is not None:
+            return text
+        text = get_persistent(self.NAMESPACE, model_hash, key, max_age=self.ttl)
+        if text is not None:
+            with self._lock:
+                self._persistent_hits += 1
+            self._memory.set(memory_key, text)
+        return text
+
+    def set(self, model_hash: str, key: str, text: str) -> None:
+        """Store a diagnosis in memory and queue it for the persistent tier."""
+        self._memory.set(f"{model_hash}|{key}", text)
+        set_persistent(self.NAMESPACE, model_hash, key, text)
+
+    def stats(self) -> Dict[str, Any]:
+        """In-memory hit/miss/eviction/size counts plus hits served from disk."""
+        stats = self._memory.stats()
+        with self._lock:
+            stats['persistent_hits'] = self._persistent_hits
+        return stats
+
+    def reset_stats(self) -> None:
+        self._memory.reset_stats()
+        with self._lock:
+            self._persistent_hits = 0
@@ -5,6 +5,12 @@
 from llama_cpp import Llama
 from PIL import Image
 import os
+import threading
+
+from ..utils.async_utils import run_in_executor
+from ..utils.single_flight import SingleFlight
+from ..rag.monitoring import monitor
+from .diagnosis_cache import DiagnosisCache, model_file_hash
 
 # --- Configuration ---
 # Point this to the location of your GGUF model file.
@@ -12,36 +18,78 @@ MODEL_PATH = os.path.join(
     os.path.dirname(__file__), '..', '..', 'model', 'gemma-3n-q4_k_m.gguf'
 )
 
+# Maximum number of tokens generated per diagnosis
+MAX_NEW_TOKENS = 256
+
+# Sampling temperature of a diagnosis
+TEMPERATURE = 0.3
+# Opt-in deterministic mode: greedy decoding with a fixed seed, so the same
+# prompt always gets the same diagnosis and cached answers match new ones
+DETERMINISTIC_DIAGNOSIS = False
+DIAGNOSIS_SEED = 42
+
+# Diagnosis cache, keyed on prompt, model file hash and sampling parameters.
+# Only used with DETERMINISTIC_DIAGNOSIS; a sampled diagnosis is not reused.
+DIAGNOSIS_CACHE_ENABLED = True
+DIAGNOSIS_CACHE_SIZE = 512           # Max diagnoses kept in memory
+DIAGNOSIS_CACHE_TTL = 24 * 3600      # Seconds a diagnosis is reused
+
+# Returned by _generate_diagnosis when generation fails; never cached
+INFERENCE_ERROR = "Error during inference."
+
 # --- Model Loading (with caching) ---
 model = None
+# SHA-256 of the loaded model file, part of every diagnosis cache key
+model_hash = None
+# Prevents a request and the startup loader from loading the model twice
+_load_lock = threading.Lock()
+
+# Identical concurrent diagnosis requests share one generation
+diagnosis_flight = SingleFlight()
+diagnosis_cache = DiagnosisCache(max_entries=DIAGNOSIS_CACHE_SIZE, ttl=DIAGNOSIS_CACHE_TTL)
+monitor.register_stats('diagnosis_cache', diagnosis_cache)
 
 def load_model():
     """
     Loads the GGUF model using llama-cpp-python.
     """
-    global model
+    global model, model_hash
+    with _load_lock:
+        if model is None:
+            print(f"Loading GGUF model from: {MODEL_PATH}")
+            if not os.path.exists(MODEL_PATH):
+                raise FileNotFoundError(
+                    f"Model not found at {MODEL_PATH}. "
+                    "Please ensure you have downloaded the gemma-3n-q4_k_m.gguf file "
+                    "and placed it in the web_demo/model/ directory."
+                )
+            try:
+                # Note: For multimodal models, llama-cpp-python requires a special
+                # "clip_model_path" to handle the image part. We will simulate
+                # text-only input for this local demo to keep it simple.
+                model = Llama(
+                    model_path=MODEL_PATH,
+                    n_ctx=2048,  # Context size
+                    n_threads=max(os.cpu_count() - 1, 1), # Use all cores but one
+                    seed=DIAGNOSIS_SEED if DETERMINISTIC_DIAGNOSIS else -1, # -1: random seed
+                    verbose=False # Set to True for more detailed logs
+                )
+                print("✅ GGUF model loaded successfully via llama-cpp-python.")
+            except Exception as e:
+                print(f"❌ Error loading GGUF model: {e}")
+                raise
+            if DIAGNOSIS_CACHE_ENABLED and DETERMINISTIC_DIAGNOSIS:
+                try:
+                    # A replaced model file never reuses the old one's diagnoses
+                    model_hash = model_file_hash(MODEL_PATH)
+                except OSError as e:
+                    print(f"⚠️ Could not hash the model file, diagnosis cache disabled: {e}")
+
+def warmup_model():
+    """Runs a one-token generation so the first real request skips setup costs."""
     if model is None:
-        print(f"Loading GGUF model from: {MODEL_PATH}")
-        if not os.path.exists(MODEL_PATH):
-            raise FileNotFoundError(
-                f"Model not found at {MODEL_PATH}. "
-                "Please ensure you have downloaded the gemma-3n-q4_k_m.gguf file "
-                "and placed it in the web_demo/model/ directory."
-            )
-        try:
-            # Note: For multimodal models, llama-cpp-python requires a special
-            # "clip_model_path" to handle the image part. We will simulate
-            # text-only input for this local demo to keep it simple.
-            model = Llama(
-                model_path=MODEL_PATH,
-                n_ctx=2048,  # Context size
-                n_threads=max(os.cpu_count() - 1, 1), # Use all cores but one
-                verbose=False # Set to True for more detailed logs
-            )
-            print("✅ GGUF model loaded successfully via llama-cpp-python.")
-        except Exception as e:
-            print(f"❌ Error loading GGUF model: {e}")
-            raise
+        load_model()
+    model("<start_of_turn>user\nHello<end_of_turn>\n<start_of_turn>model\n", max_tokens=1, echo=False)
 
 def get_gemma_diagnosis(image_path: str, user_query: str) -> str:
     """
@@ -51,27 +99,64 @@ def get_gemma_diagnosis(image_path: str, user_query: str) -> str:
     if model is None:
         load_model()
     
+    # This text-only demo ignores the image, so the prompt and sampling
+    # parameters identify the request
+    prompt = _build_prompt(user_query)
+    sampling = _sampling_params()
+    key = DiagnosisCache.key(prompt, sampling)
+    response_text, _ = diagnosis_flight.do(key, _cached_diagnosis, prompt, sampling, key)
+    return response_text
+
+def _sampling_params() -> dict:
+    """llama.cpp sampling parameters of a diagnosis (part of its cache key)."""
+    params = {
+        'max_tokens': MAX_NEW_TOKENS,
+        'stop': ["<end_of_turn>"],
+        # Temperature 0 makes llama.cpp decode greedily
+        'temperature': 0.0 if DETERMINISTIC_DIAGNOSIS else TEMPERATURE,
+    }
+    if DETERMINISTIC_DIAGNOSIS:
+        params['seed'] = DIAGNOSIS_SEED
+    return params
+
+def _build_prompt(user_query: str) -> str:
+    """Builds a prompt suitable for a text-only query."""
+    return (
+        f"<start_of_turn>user\n"
+        f"A farmer is showing a plant leaf and asks: '{user_query}'. "
+        f"Based on this, what is the likely issue and what is the remedy?"
+        f"<end_of_turn>\n<start_of_turn>model\n"
+    )
+
+def _cached_diagnosis(prompt: str, sampling: dict, key: str) -> str:
+    """Serves a cached diagnosis, or generates and caches one."""
+    use_cache = DIAGNOSIS_CACHE_ENABLED and DETERMINISTIC_DIAGNOSIS and model_hash is not None
+    if use_cache:
+        cached = diagnosis_cache.get(model_hash, key)
+        if cached is not None:
+            return cached
+    response_text = _generate_diagnosis(prompt, sampling)
+    if use_cache and response_text and response_text != INFERENCE_ERROR:
+        diagnosis_cache.set(model_hash, key, response_text)
+    return response_text
+
+def _generate_diagnosis(prompt: str, sampling: dict) -> str:
+    """Runs one llama.cpp generation for a prompt."""
     try:
-        # Build a prompt suitable for a text-only query
-        prompt = (
-            f"<start_of_turn>user\n"
-            f"A farmer is showing a plant leaf and asks: '{user_query}'. "
-            f"Based on this, what is the likely issue and what is the remedy?"
-            f"<end_of_turn>\n<start_of_turn>model\n"
-        )
-
-        # Generate the response
-        output = model(
-            prompt,
-            max_tokens=256,
-            stop=["<end_of_turn>"],
-            temperature=0.3,
-            echo=False
-        )
+        # The seed was fixed when the model was created
+        params = {name: value for name, value in sampling.items() if name != 'seed'}
+        output = model(prompt, echo=False, **params)
         
         response_text = output['choices'][0]['text'].strip()
         return response_text
     except Exception as e:
         print(f"❌ Error during inference: {e}")
-        return "Error during inference."
+        return INFERENCE_ERROR
 
+async def aget_gemma_diagnosis(image_path: str, user_query: str) -> str:
+    """
+    Async variant of get_gemma_diagnosis.
+    Generation runs on the single-worker 'llm' executor, so concurrent sessions
+    queue for the model without blocking the event loop.
+    """
+    return await run_in_executor("llm", get_gemma_diagnosis, image_path, user_query)
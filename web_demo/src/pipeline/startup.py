@@ -0,0 +1,152 @@
+# --- src/pipeline/startup.py ---
+"""
+Parallel background warm-up of all models at startup.
+
+Loads the GGUF model, Whisper, the sentence-transformer, the FAISS index and the
+text store concurrently instead of one after another, and exposes a readiness
+event per component so the UI can start serving text-only requests as soon as
+the LLM is up, while Whisper and the RAG components are still loading. RAG is
+only an uncertainty fallback: until it is ready (or if it fails to load) the
+fallback search returns no context and the LLM's diagnosis stands.
+"""
+import time
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .inference import load_model, warmup_model
+from ..rag import search
+from ..utils.audio_processing import load_whisper_model, warmup_whisper
+
+logger = logging.getLogger(__name__)
+
+# Component groups the UI cares about
+TEXT_COMPONENTS = ("llm",)
+AUDIO_COMPONENTS = ("whisper",)
+RAG_COMPONENTS = ("embedding_model", "faiss_index", "text_store", "rag")
+
+
+class StartupOrchestrator:
+    """Loads and warms up pipeline components in parallel."""
+
+    def __init__(self, warmup: bool = True):
+        """
+        Args:
+            warmup: Run a warm-up call on each component after it has loaded.
+        """
+        self.warmup = warmup
+        # name -> (loader, warm-up function, components that must be ready first)
+        self.components: Dict[str, Tuple[Callable[[], None], Optional[Callable[[], None]], Tuple[str, ...]]] = {
+            "llm": (load_model, warmup_model, ()),
+            "whisper": (load_whisper_model, warmup_whisper, ()),
+            "embedding_model": (search.load_embedding_model, None, ()),
+            "faiss_index": (search.load_faiss_index, None, ()),
+            "text_store": (search.load_text_data, None, ()),
+            # Manifest check, BM25 and exact vectors need the three above
+            "rag": (search.load_search_dependencies, search.warmup_search,
+                    ("embedding_model", "faiss_index", "text_store")),
+        }
+        self.ready: Dict[str, threading.Event] = {name: threading.Event() for name in self.components}
+        self.load_times: Dict[str, float] = {}
+        self.warmup_times: Dict[str, float] = {}
+        self.errors: Dict[str, str] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._started_at: Optional[float] = None
+
+    def start(self) -> "StartupOrchestrator":
+        """Start loading every component in the background and return immediately."""
+        if self._executor is not None:
+            return self
+        self._started_at = time.time()
+        self._executor = ThreadPoolExecutor(
+            max_workers=len(self.components), thread_name_prefix="krishi-startup"
+        )
+        for name in self.components:
+            self._executor.submit(self._load, name)
+        # Workers exit once every component has finished
+        self._executor.shutdown(wait=False)
+        return self
+
+    def _load(self, name: str) -> None:
+        loader, warmup, dependencies = self.components[name]
+        try:
+            for dependency in dependencies:
+                self.ready[dependency].wait()
+                if dependency in self.errors:
+                    raise RuntimeError(f"dependency '{dependency}' failed to load")
+
+            start = time.time()
+            loader()
+            self.load_times[name] = time.time() - start
+
+            if self.warmup and warmup is not None:
+                start = time.time()
+                warmup()
+                self.warmup_times[name] = time.time() - start
+
+            logger.info("Component '%s' ready in %.2fs", name, self.load_times[name])
+        except Exception as e:
+            self.errors[name] = str(e)
+            logger.error("Component '%s' failed to load: %s", name, e)
+        finally:
+            # Set even on failure so waiters don't hang; check errors/is_ready
+            self.ready[name].set()
+            if not self.pending():
+                logger.info("Startup complete: %s", self.report())
+
+    def is_ready(self, *names: str) -> bool:
+        """True if all named components (default: all) loaded without error."""
+        names = names or tuple(self.components)
+        return all(self.ready[n].is_set() and n not in self.errors for n in names)
+
+    def wait_for(self, *names: str, timeout: Optional[float] = None) -> bool:
+        """Block until the named components (default: all) have finished loading."""
+        names = names or tuple(self.components)
+        deadline = None if timeout is None else time.time() + timeout
+        for name in names:
+            remaining = None if deadline is None else max(deadline - time.time(), 0)
+            if not self.ready[name].wait(remaining):
+                return False
+        return self.is_ready(*names)
+
+    def text_ready(self) -> bool:
+        """True once text-only requests (LLM) can be served."""
+        return self.is_ready(*TEXT_COMPONENTS)
+
+    def audio_ready(self) -> bool:
+        """True once voice input can be transcribed."""
+        return self.is_ready(*AUDIO_COMPONENTS)
+
+    def rag_ready(self) -> bool:
+        """True once the knowledge base fallback can be searched."""
+        return self.is_ready(*RAG_COMPONENTS)
+
+    def failed(self, *names: str) -> Dict[str, str]:
+        """Error messages of the named components (default: all) that failed to load."""
+        names = names or tuple(self.components)
+        return {name: self.errors[name] for name in names if name in self.errors}
+
+    def pending(self) -> List[str]:
+        """Components still loading."""
+        return [name for name, event in self.ready.items() if not event.is_set()]
+
+    def report(self) -> Dict[str, object]:
+        """Per-component load and warm-up time breakdown."""
+        return {
+            "load_times": dict(self.load_times),
+            "warmup_times": dict(self.warmup_times),
+            "errors": dict(self.errors),
+            "pending": self.pending(),
+            "elapsed": time.time() - self._started_at if self._started_at else 0.0,
+        }
+
+
+# Global orchestrator instance
+orchestrator = StartupOrchestrator()
+
+
+def start_background_loading(warmup: bool = True) -> StartupOrchestrator:
+    """Start loading all components in the background on the global orchestrator."""
+    orchestrator.warmup = warmup
+    return orchestrator.start()
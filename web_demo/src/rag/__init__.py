@@ -3,8 +3,36 @@ Retrieval-Augmented Generation (RAG) components for KrishiSahayak.
 
 This package provides functionality for semantic search and knowledge base integration
 to enhance the AI's responses with relevant information.
+
+The search API is imported lazily (on first attribute access), so light
+submodules such as ``src.rag.encoders`` can be imported, e.g. by
+asset_preparation/build_index.py, without loading FAISS, the logging setup and
+the search layer's module-level state.
 """
-from .search import search_knowledge_base, load_search_dependencies
+import importlib
+
+# Public name -> submodule defining it
+_EXPORTS = {
+    'search_knowledge_base': '.search',
+    'search_knowledge_base_batch': '.search',
+    'asearch_knowledge_base': '.search',
+    'search_knowledge_base_results': '.search',
+    'search_knowledge_base_batch_results': '.search',
+    'load_search_dependencies': '.search',
+    'get_index_manifest': '.search',
+    'list_regions': '.search',
+    'get_pack_metrics': '.search',
+    'reload_knowledge_base': '.search',
+    'reload_knowledge_base_in_background': '.search',
+    'SearchResults': '.results',
+}
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 # Note: build_faiss_index has been moved to asset_preparation/build_index.py
-__all__ = ['search_knowledge_base', 'load_search_dependencies']
+__all__ = list(_EXPORTS)
@@ -0,0 +1,123 @@
+# --- src/rag/coalescer.py ---
+"""
+Micro-batching coalescer for concurrent search requests.
+
+Requests submitted from many threads are collected for up to ``max_wait``
+seconds (or until ``max_batch_size`` are queued) and answered with a single
+batched call, typically one encoder forward pass plus one matrix index.search.
+Each caller gets its own result through a Future; a caller that stops waiting
+has its request dropped from the next batch. A batch runs in the context of
+its first request, so that request's deadline (see utils/resilience.py)
+bounds the batch's retries.
+"""
+import time
+import queue
+import threading
+import logging
+import contextvars
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BatchFn = Callable[[List[str], List[int]], List[Any]]
+
+
+class SearchCoalescer:
+    """Collects concurrent search requests and runs them as one batch."""
+
+    def __init__(self, batch_fn: BatchFn, max_wait: float = 0.003, max_batch_size: int = 32,
+                 on_batch: Optional[Callable[[int], None]] = None):
+        """
+        Args:
+            batch_fn: Called as batch_fn(queries, top_ks) with each request's query
+                and top_k, returns one result per request.
+            max_wait: Longest time in seconds the first request of a batch waits for company.
+            max_batch_size: Dispatch as soon as this many requests are queued.
+            on_batch: Called with the size of every dispatched batch (for metrics).
+        """
+        self.batch_fn = batch_fn
+        self.max_wait = max_wait
+        self.max_batch_size = max_batch_size
+        self.on_batch = on_batch
+        self._queue: "queue.Queue[Tuple[str, int, Future, contextvars.Context]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, query: str, top_k: int) -> Future:
+        """Queue a search and return a Future for its result."""
+        self._ensure_started()
+        future: Future = Future()
+        self._queue.put((query, top_k, future, contextvars.copy_context()))
+        return future
+
+    def search(self, query: str, top_k: int, timeout: Optional[float] = None) -> Any:
+        """
+        Queue a search and block until its batch has run.
+
+        Raises:
+            concurrent.futures.TimeoutError: The result did not arrive within
+                timeout seconds; the request is cancelled if it has not started.
+        """
+        future = self.submit(query, top_k)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="krishi-search-coalescer", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._dispatch(batch)
+
+    def _dispatch(self, batch: List[Tuple[str, int, Future, contextvars.Context]]) -> None:
+        # Requests whose caller already gave up are skipped
+        batch = [request for request in batch if request[2].set_running_or_notify_cancel()]
+        if not batch:
+            return
+        queries = [query for query, _, _, _ in batch]
+        top_ks = [k for _, k, _, _ in batch]
+
+        try:
+            results = list(batch[0][3].run(self.batch_fn, queries, top_ks))
+        except Exception as e:
+            logger.error("Coalesced batch of %d failed: %s", len(batch), e)
+            for _, _, future, _ in batch:
+                future.set_exception(e)
+            return
+
+        for (_, _, future, _), query_results in zip(batch, results):
+            future.set_result(query_results)
+        # A short result list must not leave the remaining callers waiting forever
+        if len(results) < len(batch):
+            logger.error("Coalesced batch of %d returned only %d results", len(batch), len(results))
+            for _, _, future, _ in batch[len(results):]:
+                future.set_exception(RuntimeError(
+                    f"Batch function returned {len(results)} results for {len(batch)} requests"
+                ))
+
+        if self.on_batch is not None:
+            try:
+                self.on_batch(len(batch))
+            except Exception:
+                logger.debug("on_batch callback failed", exc_info=True)
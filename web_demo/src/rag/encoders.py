@@ -0,0 +1,235 @@
+# --- src/rag/encoders.py ---
+"""
+Pluggable query encoder backends.
+
+- "torch": the regular SentenceTransformer stack.
+- "onnx": the same model exported to ONNX (optionally dynamically int8-quantized)
+  and run on ONNX Runtime from local files, without importing torch.
+
+Both backends expose the subset of the SentenceTransformer API the search layer
+uses: ``encode(sentences, batch_size=..., ...)`` returning a float32 NumPy array
+and ``get_sentence_embedding_dimension()``.
+
+Export, parity check and benchmark from the web_demo directory:
+    python -m src.rag.encoders export all-MiniLM-L6-v2 model/encoder_onnx
+    python -m src.rag.encoders check all-MiniLM-L6-v2 model/encoder_onnx/model_int8.onnx
+"""
+import os
+import time
+import logging
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ENCODER_BACKENDS = ("torch", "onnx")
+
+# Must match the model's max_seq_length (256 for all-MiniLM-L6-v2)
+ONNX_MAX_SEQ_LENGTH = 256
+
+# Sentences used for parity checks and latency benchmarks
+SAMPLE_SENTENCES = [
+    "my tomato plant has curling leaves",
+    "potato leaves have dark brown spots with yellow rings",
+    "white powder on the upper side of grape leaves",
+    "टमाटर की पत्तियाँ पीली हो रही हैं",
+    "how much mancozeb should I spray per litre of water",
+    "rice plants have spindle shaped lesions",
+    "corn leaves show long grey streaks",
+    "apple fruit has black scabby patches",
+]
+
+
+class OnnxEncoder:
+    """Sentence encoder running an exported transformer on ONNX Runtime."""
+
+    def __init__(self, model_path: str, tokenizer_path: Optional[str] = None,
+                 normalize: bool = True, num_threads: Optional[int] = None):
+        """
+        Args:
+            model_path: Path to the exported .onnx file.
+            tokenizer_path: Path to tokenizer.json; defaults to the model's directory.
+            normalize: L2-normalize embeddings (all-MiniLM-L6-v2 ends in a Normalize layer).
+            num_threads: Intra-op threads for ONNX Runtime; defaults to all cores.
+        """
+        try:
+            import onnxruntime as ort
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError(
+                "The ONNX encoder backend requires 'onnxruntime' and 'tokenizers'. "
+                "Install them with: pip install onnxruntime tokenizers"
+            ) from e
+
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(
+                f"ONNX encoder not found at '{model_path}'. "
+                "Run 'python -m src.rag.encoders export' first."
+            )
+        tokenizer_path = tokenizer_path or os.path.join(os.path.dirname(model_path), "tokenizer.json")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.dimension = self.session.get_outputs()[0].shape[-1]
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=ONNX_MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+        self.normalize = normalize
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dimension
+
+    def encode(self, sentences, batch_size: int = 32, normalize_embeddings: bool = False,
+               **kwargs: Any) -> np.ndarray:
+        """Encode sentences into a float32 array of shape (n, dimension)."""
+        if isinstance(sentences, str):
+            sentences = [sentences]
+        batches = [
+            self._encode_batch(sentences[i:i + batch_size])
+            for i in range(0, len(sentences), batch_size)
+        ]
+        embeddings = np.vstack(batches) if batches else np.empty((0, self.dimension), dtype=np.float32)
+        if self.normalize or normalize_embeddings:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings = embeddings / np.maximum(norms, 1e-12)
+        return embeddings.astype(np.float32, copy=False)
+
+    def _encode_batch(self, sentences: Sequence[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(list(sentences))
+        feeds = {
+            'input_ids': np.array([e.ids for e in encodings], dtype=np.int64),
+            'attention_mask': np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            'token_type_ids': np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        feeds = {name: value for name, value in feeds.items() if name in self.input_names}
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        # Mean pooling over real (non-padding) tokens, as in sentence-transformers
+        mask = feeds['attention_mask'][..., None].astype(np.float32)
+        summed = (token_embeddings * mask).sum(axis=1)
+        return summed / np.maximum(mask.sum(axis=1), 1e-9)
+
+
+def load_encoder(backend: str, model_id: str, onnx_model_path: Optional[str] = None,
+                 device: Optional[str] = None):
+    """
+    Create a query encoder for the given backend.
+
+    Args:
+        backend: One of ENCODER_BACKENDS.
+        model_id: SentenceTransformer model id (torch backend).
+        onnx_model_path: Path to the exported .onnx file (onnx backend).
+        device: Torch device for the torch backend.
+    """
+    if backend == "torch":
+        # Imported here so the onnx backend never pulls in torch
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_id, device=device)
+    if backend == "onnx":
+        return OnnxEncoder(onnx_model_path)
+    raise ValueError(f"Unknown encoder backend '{backend}'. Expected one of {ENCODER_BACKENDS}.")
+
+
+def export_onnx(model_id: str, output_dir: str, quantize: bool = True, opset: int = 14) -> Dict[str, str]:
+    """
+    Export a sentence-transformers model to ONNX, optionally with an int8 copy.
+
+    Writes model.onnx, model_int8.onnx (if quantize) and tokenizer.json to output_dir.
+    """
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    hub_id = model_id if "/" in model_id else f"sentence-transformers/{model_id}"
+    os.makedirs(output_dir, exist_ok=True)
+
+    tokenizer = AutoTokenizer.from_pretrained(hub_id)
+    model = AutoModel.from_pretrained(hub_id).eval()
+    tokenizer.save_pretrained(output_dir)
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    paths = {"fp32": os.path.join(output_dir, "model.onnx")}
+    with torch.no_grad():
+        torch.onnx.export(
+            model, tuple(sample[name] for name in input_names), paths["fp32"],
+            input_names=input_names, output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes, opset_version=opset
+        )
+    logger.info("Exported ONNX encoder to %s", paths["fp32"])
+
+    if quantize:
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+        paths["int8"] = os.path.join(output_dir, "model_int8.onnx")
+        quantize_dynamic(paths["fp32"], paths["int8"], weight_type=QuantType.QInt8)
+        logger.info("Quantized ONNX encoder to %s", paths["int8"])
+
+    return paths
+
+
+def check_parity(reference, candidate, sentences: Optional[List[str]] = None) -> Dict[str, float]:
+    """
+    Compare two encoders' embeddings by cosine similarity.
+
+    Returns:
+        Dict with min and mean cosine similarity across the sentences.
+    """
+    sentences = sentences or SAMPLE_SENTENCES
+    a = np.asarray(reference.encode(sentences, normalize_embeddings=True), dtype=np.float32)
+    b = np.asarray(candidate.encode(sentences, normalize_embeddings=True), dtype=np.float32)
+    cosines = (a * b).sum(axis=1)
+    return {'min_cosine': float(cosines.min()), 'mean_cosine': float(cosines.mean())}
+
+
+def benchmark(encoder, sentences: Optional[List[str]] = None, runs: int = 50) -> Dict[str, float]:
+    """
+    Measure single-query encode latency.
+
+    Returns:
+        Dict with mean and p95 latency in milliseconds.
+    """
+    sentences = sentences or SAMPLE_SENTENCES
+    encoder.encode(sentences[:1])  # Warm-up
+    timings = []
+    for i in range(runs):
+        start = time.perf_counter()
+        encoder.encode([sentences[i % len(sentences)]])
+        timings.append((time.perf_counter() - start) * 1000)
+    return {'mean_ms': float(np.mean(timings)), 'p95_ms': float(np.percentile(timings, 95))}
+
+
+# --- Export / parity / benchmark helper ---
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) != 4 or sys.argv[1] not in ("export", "check"):
+        print("Usage: python -m src.rag.encoders export <model_id> <output_dir>")
+        print("       python -m src.rag.encoders check <model_id> <model.onnx>")
+        sys.exit(1)
+
+    command, model_id, target = sys.argv[1:]
+    if command == "export":
+        for kind, path in export_onnx(model_id, target).items():
+            print(f"✅ {kind}: {path}")
+    else:
+        torch_encoder = load_encoder("torch", model_id, device="cpu")
+        onnx_encoder = load_encoder("onnx", model_id, onnx_model_path=target)
+        parity = check_parity(torch_encoder, onnx_encoder)
+        print(f"Parity vs torch: min cosine {parity['min_cosine']:.4f}, mean {parity['mean_cosine']:.4f}")
+        for name, encoder in (("torch", torch_encoder), ("onnx", onnx_encoder)):
+            timing = benchmark(encoder)
+            print(f"{name:>5}: {timing['mean_ms']:.2f} ms mean, {timing['p95_ms']:.2f} ms p95")
+        if parity['min_cosine'] < 0.98:
+            print("❌ Parity check failed (min cosine < 0.98)")
+            sys.exit(1)
+        print("✅ Parity check passed")
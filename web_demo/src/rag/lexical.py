@@ -0,0 +1,102 @@
+# --- src/rag/lexical.py ---
+"""
+BM25 inverted index for lexical retrieval.
+
+The index is built next to the FAISS index by asset_preparation/build_index.py
+and stored as a single ``.bm25.npz`` file of flat NumPy arrays:
+
+- ``terms``: vocabulary (unicode array), row ``t`` owns postings
+  ``postings_offsets[t]:postings_offsets[t + 1]``
+- ``postings_docs``: int32 chunk ids, sorted per term
+- ``postings_weights``: float32 precomputed BM25 term weights (idf * saturated tf)
+- ``doc_count``: number of chunks
+
+Because the weights are precomputed, scoring a query is a handful of vectorized
+scatter-adds, cheap enough to be used as a candidate prefilter for dense search.
+"""
+import re
+import logging
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# build_index.py tokenizes with tokenize() below, so BM25 terms match.
+# The Devanagari block is listed explicitly so Hindi words keep their vowel signs.
+TOKEN_PATTERN = re.compile(r"[\w\u0900-\u097F]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase and split text into word tokens (Latin and Devanagari)."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """
+    Fuse several ranked id lists with reciprocal rank fusion.
+
+    Args:
+        rankings: Ranked lists of chunk ids, best first.
+        k: RRF damping constant.
+
+    Returns:
+        (chunk_id, fused_score) pairs sorted by descending score.
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """Read-only BM25 index over knowledge base chunks."""
+
+    def __init__(self, path: str):
+        with np.load(path, allow_pickle=False) as data:
+            terms = data['terms']
+            self.postings_offsets = data['postings_offsets']
+            self.postings_docs = data['postings_docs']
+            self.postings_weights = data['postings_weights']
+            self.doc_count = int(data['doc_count'])
+        self.vocabulary = {term: i for i, term in enumerate(terms.tolist())}
+        logger.info("BM25 index loaded: %d terms, %d postings",
+                    len(self.vocabulary), len(self.postings_docs))
+
+    def __len__(self) -> int:
+        return self.doc_count
+
+    def score(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Score every chunk that contains at least one query term.
+
+        Returns:
+            (chunk_ids, scores) for the matching chunks, unsorted.
+        """
+        term_ids = {self.vocabulary[t] for t in tokenize(query) if t in self.vocabulary}
+        if not term_ids:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+
+        scores = np.zeros(self.doc_count, dtype=np.float32)
+        for t in term_ids:
+            start, end = self.postings_offsets[t], self.postings_offsets[t + 1]
+            # Doc ids are unique within a postings list, so fancy-index add is safe
+            scores[self.postings_docs[start:end]] += self.postings_weights[start:end]
+
+        chunk_ids = np.flatnonzero(scores).astype(np.int32)
+        return chunk_ids, scores[chunk_ids]
+
+    def search(self, query: str, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the top_k chunks by BM25 score.
+
+        Returns:
+            (chunk_ids, scores) sorted by descending score.
+        """
+        chunk_ids, scores = self.score(query)
+        if len(chunk_ids) > top_k:
+            top = np.argpartition(-scores, top_k - 1)[:top_k]
+            chunk_ids, scores = chunk_ids[top], scores[top]
+        order = np.argsort(-scores, kind='stable')
+        return chunk_ids[order], scores[order]
@@ -0,0 +1,93 @@
+# --- src/rag/manifest.py ---
+"""
+Index manifest sidecar describing how a FAISS index was built.
+
+asset_preparation/build_index.py writes ``<index>.manifest.json`` next to the
+``.faiss`` file. The search layer reads it to pick the matching scoring path
+(query normalization, similarity vs. distance) and to refuse an index that was
+built with a different embedding model.
+"""
+import json
+import os
+import logging
+from typing import Any, Dict, Optional
+
+import faiss
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_SUFFIX = ".manifest.json"
+METRIC_INNER_PRODUCT = "inner_product"
+METRIC_L2 = "l2"
+
+
+class ManifestMismatchError(ValueError):
+    """Raised when an index does not match the running embedding model or text store."""
+
+
+def manifest_path(index_path: str) -> str:
+    """Return the manifest path for a FAISS index path."""
+    return os.path.splitext(index_path)[0] + MANIFEST_SUFFIX
+
+
+def read_manifest(index_path: str) -> Optional[Dict[str, Any]]:
+    """Read the manifest next to an index, or return None if there is none."""
+    path = manifest_path(index_path)
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def infer_manifest(index: faiss.Index, model_id: str, chunk_count: int) -> Dict[str, Any]:
+    """
+    Build a best-effort manifest for a legacy index without a sidecar.
+
+    The indexer has always normalized embeddings for inner-product indexes,
+    so an inner-product index is assumed to hold unit vectors.
+    """
+    inner_product = index.metric_type == faiss.METRIC_INNER_PRODUCT
+    return {
+        'metric': METRIC_INNER_PRODUCT if inner_product else METRIC_L2,
+        'normalized': inner_product,
+        'embedding_model': model_id,
+        'dimension': index.d,
+        'chunk_count': chunk_count,
+        'content_hash': None,
+        'index_type': type(index).__name__,
+        'index_params': {},
+        'inferred': True,
+    }
+
+
+def validate_manifest(manifest: Dict[str, Any], index: faiss.Index, model_id: str,
+                      model_dimension: int, chunk_count: int) -> None:
+    """
+    Check that an index, its text store and the query encoder belong together.
+
+    Raises:
+        ManifestMismatchError: If model, dimension, metric or chunk count disagree.
+    """
+    problems = []
+    if manifest.get('embedding_model') != model_id:
+        problems.append(
+            f"index built with '{manifest.get('embedding_model')}', searching with '{model_id}'"
+        )
+    if manifest.get('dimension') != index.d or index.d != model_dimension:
+        problems.append(
+            f"dimension mismatch: manifest {manifest.get('dimension')}, "
+            f"index {index.d}, encoder {model_dimension}"
+        )
+    if manifest.get('chunk_count') != chunk_count or index.ntotal != chunk_count:
+        problems.append(
+            f"size mismatch: manifest {manifest.get('chunk_count')} chunks, "
+            f"index {index.ntotal} vectors, text store {chunk_count} chunks"
+        )
+    expected_metric = (
+        METRIC_INNER_PRODUCT if index.metric_type == faiss.METRIC_INNER_PRODUCT else METRIC_L2
+    )
+    if manifest.get('metric') != expected_metric:
+        problems.append(f"metric mismatch: manifest {manifest.get('metric')}, index {expected_metric}")
+
+    if problems:
+        raise ManifestMismatchError("Index manifest check failed: " + "; ".join(problems))
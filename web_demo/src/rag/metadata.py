@@ -0,0 +1,102 @@
+# --- src/rag/metadata.py ---
+"""
+Per-chunk crop/disease metadata for filtered search.
+
+asset_preparation/build_index.py writes ``<index>.meta.npz`` next to the FAISS
+index with, for each field ("plant", "disease"), the sorted list of distinct
+labels and an int32 label id per chunk. At load time every label's chunk ids
+are grouped into a partition, so a ``filters={"plant": "tomato"}`` search only
+scores that crop's vectors through a FAISS ID selector.
+"""
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+METADATA_SUFFIX = ".meta.npz"
+FILTER_FIELDS = ("plant", "disease")
+# Filter combinations whose ID selector is kept, least recently used dropped first
+SELECTOR_CACHE_SIZE = 256
+
+
+def normalize_label(value: str) -> str:
+    """Normalize a metadata label ("Bell_Pepper" -> "bell pepper")."""
+    return " ".join(str(value).replace("_", " ").lower().split())
+
+
+class ChunkMetadata:
+    """Label partitions of the knowledge base chunks."""
+
+    def __init__(self, path: str):
+        # field -> label -> sorted int64 chunk ids
+        self.partitions: Dict[str, Dict[str, np.ndarray]] = {}
+        with np.load(path, allow_pickle=False) as data:
+            self.chunk_count = int(data['chunk_count'])
+            for field in FILTER_FIELDS:
+                if f'{field}_labels' not in data:
+                    continue
+                labels = data[f'{field}_labels'].tolist()
+                label_ids = data[f'{field}_ids']
+                order = np.argsort(label_ids, kind='stable')
+                bounds = np.searchsorted(label_ids[order], np.arange(len(labels) + 1))
+                self.partitions[field] = {
+                    normalize_label(label): order[bounds[i]:bounds[i + 1]].astype(np.int64)
+                    for i, label in enumerate(labels)
+                }
+        self._selectors: "OrderedDict[Tuple, Tuple[np.ndarray, faiss.IDSelector]]" = OrderedDict()
+        self._lock = threading.Lock()
+        logger.info("Chunk metadata loaded: %s",
+                    {field: len(parts) for field, parts in self.partitions.items()})
+
+    def labels(self, field: str):
+        """Known labels for a field."""
+        return sorted(self.partitions.get(field, {}))
+
+    def ids_for(self, filters: Dict[str, str]) -> np.ndarray:
+        """
+        Chunk ids matching every filter.
+
+        Raises:
+            ValueError: If a filter field is not available.
+        """
+        ids: Optional[np.ndarray] = None
+        for field, value in filters.items():
+            if field not in self.partitions:
+                raise ValueError(f"Unsupported filter field '{field}'. Available: {list(self.partitions)}")
+            part = self.partitions[field].get(normalize_label(value))
+            if part is None:
+                return np.empty(0, dtype=np.int64)
+            ids = part if ids is None else np.intersect1d(ids, part, assume_unique=True)
+        return ids if ids is not None else np.arange(self.chunk_count, dtype=np.int64)
+
+    def selector_for(self, filters: Dict[str, str]) -> Tuple[np.ndarray, faiss.IDSelector]:
+        """
+        Chunk ids and a FAISS ID selector for a filter combination.
+
+        Selectors are cached (up to SELECTOR_CACHE_SIZE) only for combinations
+        of known labels, so arbitrary user-supplied values can't grow the cache.
+        """
+        key = filter_key(filters)
+        with self._lock:
+            cached = self._selectors.get(key)
+            if cached is not None:
+                self._selectors.move_to_end(key)
+                return cached
+        ids = self.ids_for(filters)
+        cached = (ids, faiss.IDSelectorBatch(ids))
+        if all(value in self.partitions[field] for field, value in key):
+            with self._lock:
+                self._selectors[key] = cached
+                while len(self._selectors) > SELECTOR_CACHE_SIZE:
+                    self._selectors.popitem(last=False)
+        return cached
+
+
+def filter_key(filters: Dict[str, str]) -> Tuple:
+    """Hashable, order-independent key for a filter dict."""
+    return tuple(sorted((field, normalize_label(value)) for field, value in filters.items()))
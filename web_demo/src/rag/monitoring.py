@@ -22,9 +22,30 @@ class RAGMonitor:
             'total_search_time': 0.0,
             'errors': 0,
             'rate_limited_requests': 0,
+            'semantic_cache_lookups': 0,
+            'semantic_cache_hits': 0,
+            'semantic_cache_false_hits': 0,
+            'coalesced_batches': 0,
+            'batch_size_histogram': {},
+            'single_flight_shared': 0,
+            'pack_events': {},
+            'stage_timings': {},
+            'rerank_fallbacks': 0,
             'last_reset': datetime.now().isoformat()
         }
         self.process = psutil.Process()
+        # Name -> object exposing stats() and reset_stats() (caches, retry policies, ...)
+        self.sources: Dict[str, Any] = {}
+
+    def register_stats(self, name: str, source: Any) -> None:
+        """Report a component's own counters under metrics[name].
+        
+        Args:
+            name: Key for the component's stats in get_metrics()
+            source: Object with stats() and reset_stats(), e.g. a
+                BoundedTTLCache or RetryPolicy
+        """
+        self.sources[name] = source
 
     def record_search(self, cache_hit: bool, search_time: float) -> None:
         """Record search metrics.
@@ -57,6 +78,67 @@ class RAGMonitor:
         self.metrics['rate_limited_requests'] += 1
         logger.warning("Rate limit event recorded")
 
+    def record_semantic_cache(self, hit: bool) -> None:
+        """Record a semantic cache lookup.
+        
+        Args:
+            hit: Whether a near-duplicate cached result was served
+        """
+        self.metrics['semantic_cache_lookups'] += 1
+        if hit:
+            self.metrics['semantic_cache_hits'] += 1
+
+    def record_semantic_false_hit(self) -> None:
+        """Record a semantic cache hit that disagreed with the real search."""
+        self.metrics['semantic_cache_false_hits'] += 1
+        logger.debug("Semantic cache false hit recorded")
+
+    def record_single_flight_shared(self) -> None:
+        """Record a request answered by another caller's in-flight computation."""
+        self.metrics['single_flight_shared'] += 1
+
+    def record_batch(self, batch_size: int) -> None:
+        """Record the size of a coalesced search batch.
+        
+        Sizes are bucketed by powers of two ("1", "2", "3-4", "5-8", ...).
+        
+        Args:
+            batch_size: Number of requests answered by one batched search
+        """
+        upper = 1
+        while upper < batch_size:
+            upper *= 2
+        lower = upper // 2 + 1
+        bucket = str(upper) if lower >= upper else f"{lower}-{upper}"
+        histogram = self.metrics['batch_size_histogram']
+        histogram[bucket] = histogram.get(bucket, 0) + 1
+        self.metrics['coalesced_batches'] += 1
+
+    def record_pack_event(self, region: str, event: str) -> None:
+        """Record a data pack registry event.
+        
+        Args:
+            region: Region of the data pack
+            event: "hit", "load" or "evict"
+        """
+        counts = self.metrics['pack_events'].setdefault(region, {})
+        counts[event] = counts.get(event, 0) + 1
+
+    def record_stage(self, stage: str, duration: float) -> None:
+        """Record the time spent in one search pipeline stage.
+        
+        Args:
+            stage: Stage name, e.g. "retrieval" or "rerank"
+            duration: Time taken in seconds
+        """
+        timing = self.metrics['stage_timings'].setdefault(stage, {'count': 0, 'total_time': 0.0})
+        timing['count'] += 1
+        timing['total_time'] += duration
+
+    def record_rerank_fallback(self) -> None:
+        """Record a re-rank that missed its time budget or failed."""
+        self.metrics['rerank_fallbacks'] += 1
+
     def get_metrics(self) -> Dict[str, Any]:
         """Get current metrics with system information.
         
@@ -65,6 +147,16 @@ class RAGMonitor:
         """
         # Calculate derived metrics
         metrics = self.metrics.copy()
+        metrics['batch_size_histogram'] = dict(self.metrics['batch_size_histogram'])
+        metrics['pack_events'] = {
+            region: dict(counts) for region, counts in self.metrics['pack_events'].items()
+        }
+        metrics['stage_timings'] = {
+            stage: dict(timing, avg_time=timing['total_time'] / timing['count'])
+            for stage, timing in self.metrics['stage_timings'].items()
+        }
+        for name, source in self.sources.items():
+            metrics[name] = source.stats()
         metrics['uptime'] = time.time() - metrics['start_time']
         
         if metrics['total_searches'] > 0:
@@ -77,6 +169,19 @@ class RAGMonitor:
         else:
             metrics['avg_search_time'] = 0.0
             metrics['cache_hit_rate'] = 0.0
+
+        if metrics['semantic_cache_lookups'] > 0:
+            metrics['semantic_cache_hit_rate'] = (
+                metrics['semantic_cache_hits'] / metrics['semantic_cache_lookups']
+            )
+        else:
+            metrics['semantic_cache_hit_rate'] = 0.0
+        if metrics['semantic_cache_hits'] > 0:
+            metrics['semantic_cache_false_hit_rate'] = (
+                metrics['semantic_cache_false_hits'] / metrics['semantic_cache_hits']
+            )
+        else:
+            metrics['semantic_cache_false_hit_rate'] = 0.0
             
         # Add system metrics
         try:
@@ -105,8 +210,19 @@ class RAGMonitor:
             'total_search_time': 0.0,
             'errors': 0,
             'rate_limited_requests': 0,
+            'semantic_cache_lookups': 0,
+            'semantic_cache_hits': 0,
+            'semantic_cache_false_hits': 0,
+            'coalesced_batches': 0,
+            'batch_size_histogram': {},
+            'single_flight_shared': 0,
+            'pack_events': {},
+            'stage_timings': {},
+            'rerank_fallbacks': 0,
             'last_reset': datetime.now().isoformat()
         })
+        for source in self.sources.values():
+            source.reset_stats()
         logger.info("Metrics have been reset")
 
 # Global monitor instance
@@ -0,0 +1,408 @@
+# --- src/rag/packs.py ---
+"""
+Regional data packs and an on-demand, memory-budgeted pack registry.
+
+A data pack is one region's knowledge base as laid out by the Regional Data Pack
+ADR (docs/regional_data_pack_adr.md): ``knowledge_base_<region>.faiss`` plus its
+chunk text ``knowledge_base_<region>_text.pkl`` (or the memory-mapped text
+store), and the optional side files build_index.py writes next to the index
+(manifest, BM25, chunk metadata, exact vectors).
+
+PackRegistry discovers the packs in a directory, loads them the first time a
+request names their region, and evicts the least recently used ones when the
+resident packs exceed a memory budget, so one process can serve every state
+without holding all of them in memory.
+"""
+import os
+import glob
+import time
+import uuid
+import pickle
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from .text_store import MappedTextStore, text_store_paths
+from .lexical import BM25Index
+from .metadata import ChunkMetadata, METADATA_SUFFIX
+from .manifest import read_manifest, infer_manifest, validate_manifest
+
+logger = logging.getLogger(__name__)
+
+PACK_PREFIX = "knowledge_base_"
+INDEX_SUFFIX = ".faiss"
+TEXT_SUFFIX = "_text.pkl"
+LEXICAL_SUFFIX = ".bm25.npz"
+VECTORS_SUFFIX = ".vectors.npy"
+# The default knowledge base is the pack pack_paths(data_dir, DEFAULT_KB_NAME):
+# asset_preparation/build_index.py writes it there and the search layer reads it
+DEFAULT_KB_NAME = "v0_generic_46-class"
+
+# Registry events reported to the on_event callback
+PACK_EVENTS = ("hit", "load", "evict")
+
+
+def pack_paths(packs_dir: str, region: str) -> Tuple[str, str]:
+    """Return the (index, text) file paths of a region's pack."""
+    root = os.path.join(packs_dir, f"{PACK_PREFIX}{region}")
+    return root + INDEX_SUFFIX, root + TEXT_SUFFIX
+
+
+def discover_packs(packs_dir: str) -> Dict[str, Tuple[str, str]]:
+    """
+    Find the packs in a directory.
+
+    Returns:
+        Dict mapping region name to its (index, text) paths. Packs without chunk
+        text (neither the pickle nor the text store) are skipped.
+    """
+    packs = {}
+    for index_path in sorted(glob.glob(os.path.join(packs_dir, f"{PACK_PREFIX}*{INDEX_SUFFIX}"))):
+        region = os.path.basename(index_path)[len(PACK_PREFIX):-len(INDEX_SUFFIX)]
+        _, text_path = pack_paths(packs_dir, region)
+        if os.path.exists(text_path) or os.path.exists(text_store_paths(text_path)[0]):
+            packs[region] = (index_path, text_path)
+        else:
+            logger.warning("Skipping pack '%s': no chunk text next to %s", region, index_path)
+    return packs
+
+
+def mmap_io_flags() -> int:
+    """FAISS IO flags for a read-only memory-mapped load."""
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
+    # Newer FAISS builds can also map flat codes zero-copy
+    return flags | getattr(faiss, 'IO_FLAG_MMAP_IFC', 0)
+
+
+def read_faiss_index(path: str, use_mmap: bool = False):
+    """Read (or memory-map) a FAISS index."""
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"FAISS index not found at '{path}'. "
+            "Please run 'asset_preparation/build_index.py' first."
+        )
+    if use_mmap:
+        return faiss.read_index(path, mmap_io_flags())
+    return faiss.read_index(path)
+
+
+def read_text_data(path: str, use_mmap: bool = False):
+    """
+    Read chunk text, from the memory-mapped text store when use_mmap is set and
+    the store exists, otherwise from the pickle.
+    """
+    if use_mmap:
+        blob_path, _ = text_store_paths(path)
+        if os.path.exists(blob_path):
+            return MappedTextStore(path)
+        logger.warning(f"Text store not found at '{blob_path}', falling back to pickle")
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"Text data not found at '{path}'. "
+            "Please run 'asset_preparation/build_index.py' first."
+        )
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+class DataPack:
+    """One knowledge base: FAISS index, chunk text and optional side files."""
+
+    def __init__(self, name: str, index_path: str, text_path: str,
+                 index=None, text_data=None):
+        self.name = name
+        self.index_path = index_path
+        self.text_path = text_path
+        self.index = index
+        self.text_data = text_data
+        self.lexical_index: Optional[BM25Index] = None
+        self.chunk_metadata: Optional[ChunkMetadata] = None
+        self.exact_vectors: Optional[np.ndarray] = None
+        # Set last by finalize(); a pack with a manifest is ready to search
+        self.manifest: Optional[Dict[str, Any]] = None
+        self.memory_bytes = 0
+        # Set once a hot reload has replaced this pack; its results are no longer cached
+        self.retired = False
+        # Identifies the pack's content, index build and embedding model in
+        # persistent cache keys; set by finalize(), None if it cannot be determined
+        self.cache_scope: Optional[str] = None
+        # Unique per loaded copy, for result_scope when cache_scope is unknown
+        self.snapshot_id = uuid.uuid4().hex
+        # Near-duplicate query cache over this copy's results (see search.py)
+        self.semantic_cache = None
+
+    @property
+    def result_scope(self) -> str:
+        """
+        Scope of this pack's results in every result cache tier.
+
+        Copies with the same content share it, so cached results survive a
+        reload of identical files; without a cache_scope every copy has its own.
+        """
+        return self.cache_scope or f"{self.name}#{self.snapshot_id}"
+
+    @property
+    def root(self) -> str:
+        return os.path.splitext(self.index_path)[0]
+
+    @property
+    def lexical_path(self) -> str:
+        return self.root + LEXICAL_SUFFIX
+
+    @property
+    def metadata_path(self) -> str:
+        return self.root + METADATA_SUFFIX
+
+    @property
+    def vectors_path(self) -> str:
+        return self.root + VECTORS_SUFFIX
+
+    def load(self, model_id: str, model_dimension: int, use_mmap: bool = False) -> "DataPack":
+        """Read the index and chunk text, then finalize the pack."""
+        self.index = read_faiss_index(self.index_path, use_mmap)
+        self.text_data = read_text_data(self.text_path, use_mmap)
+        return self.finalize(model_id, model_dimension, use_mmap)
+
+    def finalize(self, model_id: str, model_dimension: int, use_mmap: bool = False) -> "DataPack":
+        """
+        Load the optional side files and check the manifest against the loaded
+        index, text and embedding model.
+
+        Raises:
+            ManifestMismatchError: If the pack was built for another model or
+                its index and text disagree.
+        """
+        # BM25 index (optional, enables hybrid search)
+        if os.path.exists(self.lexical_path):
+            try:
+                self.lexical_index = BM25Index(self.lexical_path)
+            except Exception as e:
+                # Dense search still works without it
+                logger.error(f"Could not load BM25 index for pack '{self.name}': {e}")
+
+        # Chunk metadata (optional, enables filtered search)
+        if os.path.exists(self.metadata_path):
+            try:
+                self.chunk_metadata = ChunkMetadata(self.metadata_path)
+            except Exception as e:
+                # Unfiltered search still works without it
+                logger.error(f"Could not load chunk metadata for pack '{self.name}': {e}")
+
+        manifest = read_manifest(self.index_path)
+        if manifest is None:
+            logger.warning(f"No manifest for pack '{self.name}', inferring metric from the index type")
+            manifest = infer_manifest(self.index, model_id, len(self.text_data))
+        validate_manifest(manifest, self.index, model_id, model_dimension, len(self.text_data))
+
+        # Exact vectors for re-ranking lossy indexes, memory-mapped
+        vectors_file = manifest.get('index_params', {}).get('vectors_file')
+        if vectors_file:
+            # Looked up next to the index under its current name, so a renamed
+            # pack keeps re-ranking; the name recorded at build time is a fallback
+            vectors_path = self.vectors_path
+            if not os.path.exists(vectors_path):
+                vectors_path = os.path.join(os.path.dirname(self.index_path), vectors_file)
+            if os.path.exists(vectors_path):
+                self.exact_vectors = np.load(vectors_path, mmap_mode='r')
+            else:
+                logger.warning(f"Exact vectors file not found at '{vectors_path}', re-ranking disabled")
+
+        self.memory_bytes = self._estimate_memory(use_mmap)
+        self.cache_scope = self._cache_scope(manifest)
+        self.manifest = manifest
+        return self
+
+    def _cache_scope(self, manifest: Dict[str, Any]) -> Optional[str]:
+        """
+        Scope for persisted results: embedding model, index type and content hash.
+
+        Legacy indexes without a content hash fall back to the index file's size
+        and modification time.
+        """
+        content = manifest.get('content_hash')
+        if not content:
+            try:
+                stat = os.stat(self.index_path)
+            except OSError:
+                return None
+            content = f"{stat.st_size}-{stat.st_mtime_ns}"
+        return f"{manifest.get('embedding_model')}|{manifest.get('index_type')}|{content}"
+
+    def _estimate_memory(self, use_mmap: bool) -> int:
+        """
+        Approximate resident size from the on-disk size of the files read into
+        private memory. Memory-mapped files live in the shared page cache and
+        are not counted.
+        """
+        paths = []
+        if not use_mmap:
+            paths.append(self.index_path)
+        if not isinstance(self.text_data, MappedTextStore):
+            paths.append(self.text_path)
+        if self.lexical_index is not None:
+            paths.append(self.lexical_path)
+        if self.chunk_metadata is not None:
+            paths.append(self.metadata_path)
+        return sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+
+
+class PackRegistry:
+    """Loads data packs on demand and keeps them within a memory budget."""
+
+    def __init__(self, packs_dir: str, loader: Callable[[DataPack], None],
+                 memory_budget_bytes: int,
+                 on_event: Optional[Callable[[str, str], None]] = None):
+        """
+        Args:
+            packs_dir: Directory searched for ``knowledge_base_<region>.faiss`` packs.
+            loader: Loads a DataPack in place (typically ``pack.load(...)``).
+            memory_budget_bytes: Resident packs above this size are evicted, least
+                recently used first. The most recently used pack always stays.
+            on_event: Called as on_event(region, event) for each PACK_EVENTS event.
+        """
+        self.packs_dir = packs_dir
+        self.loader = loader
+        self.memory_budget_bytes = memory_budget_bytes
+        self.on_event = on_event
+        self._packs: Dict[str, Tuple[str, str]] = {}
+        self._resident: "OrderedDict[str, DataPack]" = OrderedDict()
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    def regions(self, refresh: bool = False) -> List[str]:
+        """Regions with a pack on disk."""
+        with self._lock:
+            if refresh or not self._packs:
+                self._packs = discover_packs(self.packs_dir)
+            return sorted(self._packs)
+
+    def has(self, region: str) -> bool:
+        """True if a pack exists for the region (rescans the directory on a miss)."""
+        return region in self.regions() or region in self.regions(refresh=True)
+
+    def get(self, region: str) -> DataPack:
+        """
+        Return the loaded pack for a region, loading it on first use.
+
+        Evicted packs stay usable by requests that already hold them; their
+        memory is released once those requests finish.
+
+        Raises:
+            ValueError: If there is no pack for the region.
+        """
+        with self._lock:
+            pack = self._resident.get(region)
+            if pack is not None:
+                self._resident.move_to_end(region)
+                self._record(region, "hit")
+                return pack
+            load_lock = self._load_locks.setdefault(region, threading.Lock())
+
+        # Load outside the registry lock so other regions keep being served
+        with load_lock:
+            with self._lock:
+                pack = self._resident.get(region)
+                if pack is not None:
+                    self._resident.move_to_end(region)
+                    self._record(region, "hit")
+                    return pack
+            return self._load(region)
+
+    def reload(self, region: str) -> DataPack:
+        """
+        Load a fresh copy of a region's pack from disk and swap it in.
+
+        The old copy is marked retired; requests already holding it finish on
+        it. If loading fails, the old copy stays in place.
+
+        Raises:
+            ValueError: If there is no pack for the region.
+        """
+        with self._lock:
+            load_lock = self._load_locks.setdefault(region, threading.Lock())
+        with load_lock:
+            return self._load(region)
+
+    def _load(self, region: str) -> DataPack:
+        """Load a region's pack and make it the resident copy. Caller holds its load lock."""
+        if not self.has(region):
+            raise ValueError(f"No data pack for region '{region}'. Available: {self.regions()}")
+
+        index_path, text_path = self._packs[region]
+        logger.info(f"Loading data pack '{region}' from {index_path}")
+        start = time.time()
+        pack = DataPack(region, index_path, text_path)
+        self.loader(pack)
+        load_time = time.time() - start
+
+        with self._lock:
+            previous = self._resident.pop(region, None)
+            if previous is not None:
+                previous.retired = True
+            self._resident[region] = pack
+            self._record(region, "load")
+            self._stats[region]['load_time'] += load_time
+            self._stats[region]['memory_bytes'] = pack.memory_bytes
+            self._evict_over_budget()
+        logger.info(f"Data pack '{region}' loaded in {load_time:.2f}s "
+                    f"({pack.memory_bytes / (1024 * 1024):.1f} MB)")
+        return pack
+
+    def evict(self, region: str) -> bool:
+        """Drop a resident pack. Returns False if it was not loaded."""
+        with self._lock:
+            if self._resident.pop(region, None) is None:
+                return False
+            self._record(region, "evict")
+            return True
+
+    def peek(self, region: str) -> Optional[DataPack]:
+        """The region's loaded pack, if any, without loading it or counting a hit."""
+        with self._lock:
+            return self._resident.get(region)
+
+    def resident(self) -> List[str]:
+        """Loaded regions, least recently used first."""
+        with self._lock:
+            return list(self._resident)
+
+    def resident_bytes(self) -> int:
+        """Estimated memory held by the loaded packs."""
+        with self._lock:
+            return sum(pack.memory_bytes for pack in self._resident.values())
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Per-pack hit/load/evict counts, load time and memory, plus totals."""
+        with self._lock:
+            return {
+                'memory_budget_bytes': self.memory_budget_bytes,
+                'resident_bytes': sum(pack.memory_bytes for pack in self._resident.values()),
+                'resident': list(self._resident),
+                'packs': {
+                    region: dict(stats, resident=region in self._resident)
+                    for region, stats in self._stats.items()
+                },
+            }
+
+    def _evict_over_budget(self) -> None:
+        """Evict least recently used packs until within budget. Caller holds _lock."""
+        total = sum(pack.memory_bytes for pack in self._resident.values())
+        while total > self.memory_budget_bytes and len(self._resident) > 1:
+            region, pack = self._resident.popitem(last=False)
+            total -= pack.memory_bytes
+            self._record(region, "evict")
+            logger.info(f"Evicted data pack '{region}' ({pack.memory_bytes / (1024 * 1024):.1f} MB)")
+
+    def _record(self, region: str, event: str) -> None:
+        """Count a registry event. Caller holds _lock."""
+        stats = self._stats.setdefault(
+            region, {'hits': 0, 'loads': 0, 'evictions': 0, 'load_time': 0.0, 'memory_bytes': 0}
+        )
+        stats[{'hit': 'hits', 'load': 'loads', 'evict': 'evictions'}[event]] += 1
+        if self.on_event is not None:
+            self.on_event(region, event)
@@ -1,5 +1,6 @@
 # ==============================================================================
 # RAG Performance Monitor & Validator
+# Run from web_demo/ as: python -m src.rag.performance_monitor
 # ==============================================================================
 
 import time
@@ -15,6 +16,8 @@ import logging
 from dataclasses import dataclass
 import json
 
+from ..utils.logging_utils import benchmark_logging
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -225,6 +228,8 @@ class RAGPerformanceMonitor:
         
         # Run benchmarks
         benchmark_results = self.run_benchmark_suite(test_queries)
+        benchmark_results['logging_overhead'] = benchmark_logging()
+        benchmark_results['logging_overhead_slow_disk'] = benchmark_logging(iterations=200, write_delay=0.001)
         
         # System information
         system_info = {
@@ -331,6 +336,20 @@ class RAGPerformanceMonitor:
             print(f"   • Average Memory: {stats['avg_memory_usage']:.2f} MB")
             print(f"   • Average CPU: {stats['avg_cpu_usage']:.2f}%")
         
+        if 'logging_overhead' in benchmark_results:
+            overhead = benchmark_results['logging_overhead']
+            print("\n📝 Logging Cost per Request:")
+            print(f"   • Synchronous file handler: {overhead['sync_us_per_request']:.1f} µs")
+            print(f"   • Queued, lazy formatting: {overhead['queue_us_per_request']:.1f} µs")
+            print(f"   • Queued + sampled routine lines: {overhead['queue_sampled_us_per_request']:.1f} µs")
+        
+        if 'logging_overhead_slow_disk' in benchmark_results:
+            overhead = benchmark_results['logging_overhead_slow_disk']
+            print("\n📝 Logging Cost per Request, 1 ms disk writes:")
+            print(f"   • Synchronous file handler: {overhead['sync_us_per_request']:.1f} µs")
+            print(f"   • Queued, lazy formatting: {overhead['queue_us_per_request']:.1f} µs")
+            print(f"   • Queued + sampled routine lines: {overhead['queue_sampled_us_per_request']:.1f} µs")
+        
         print(f"\n📈 Test Results: {benchmark_results['successful_queries']}/{benchmark_results['total_queries']} queries successful")
         print("="*80)
 
@@ -0,0 +1,57 @@
+# --- src/rag/reranker.py ---
+"""
+Cross-encoder re-ranking of retrieved candidates.
+
+The bi-encoder (all-MiniLM-L6-v2) embeds query and chunks separately, which is
+fast but coarse. A cross-encoder reads each (query, chunk) pair together and
+scores relevance much more precisely, so re-scoring the top-N bi-encoder
+candidates and keeping the best k puts better chunks into the RAG prompt.
+All N pairs are scored in one batched forward pass.
+"""
+import logging
+from typing import Optional
+
+import numpy as np
+
+from .results import SearchResults
+
+logger = logging.getLogger(__name__)
+
+
+class CrossEncoderReranker:
+    """Re-scores search results with a sentence-transformers CrossEncoder."""
+
+    def __init__(self, model_id: str, max_length: int = 256, device: Optional[str] = None):
+        """
+        Args:
+            model_id: CrossEncoder model id, e.g. 'cross-encoder/ms-marco-MiniLM-L-6-v2'.
+            max_length: Max tokens per (query, chunk) pair; longer chunks are truncated.
+            device: Torch device; defaults to the library's choice.
+        """
+        # Imported here so the module can be imported without torch
+        import torch
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_id, max_length=max_length, device=device)
+        # predict() otherwise applies the model's configured activation, which
+        # for the ms-marco cross-encoders is the identity (raw logits)
+        self.activation = torch.nn.Sigmoid()
+
+    def rerank(self, query: str, candidates: SearchResults, top_k: int) -> SearchResults:
+        """
+        Score every candidate against the query and return the top_k.
+
+        Returns:
+            SearchResults: Candidates in cross-encoder order, scored with the
+            sigmoid of the model's relevance logit (single-label models).
+        """
+        if not candidates:
+            return candidates
+        texts = candidates.texts()
+        scores = self.model.predict(
+            [(query, text) for text in texts],
+            batch_size=len(texts), show_progress_bar=False,
+            activation_fn=self.activation, convert_to_numpy=True
+        )
+        scores = np.asarray(scores, dtype=np.float32).reshape(-1)
+        order = np.argsort(-scores, kind='stable')[:top_k]
+        return SearchResults(candidates.ids[order], scores[order], candidates.pack)
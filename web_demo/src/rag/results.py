@@ -0,0 +1,87 @@
+# --- src/rag/results.py ---
+"""
+Compact structured search results.
+
+A SearchResults holds the ranked chunk ids (int32) and relevance scores
+(float32) of one query plus a reference to the pack they came from. Chunk text
+is only looked up in the pack's text store when it is asked for, so caches
+keep a few bytes per hit instead of a copy of every chunk, and downstream
+stages (re-rankers, prompt builders) can work on ids directly.
+"""
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+
+class SearchResults:
+    """Ranked chunk ids and relevance scores for one query."""
+
+    __slots__ = ('ids', 'scores', 'pack', 'rate_limited')
+
+    def __init__(self, ids, scores, pack=None, rate_limited: bool = False):
+        """
+        Args:
+            ids: Chunk ids in rank order.
+            scores: Relevance score of each chunk (higher is better).
+            pack: The DataPack the ids refer to; needed to resolve text.
+            rate_limited: The request was rejected by the rate limiter.
+        """
+        self.ids = np.asarray(ids, dtype=np.int32)
+        self.scores = np.asarray(scores, dtype=np.float32)
+        self.pack = pack
+        self.rate_limited = rate_limited
+        # Cached results are shared between callers
+        self.ids.setflags(write=False)
+        self.scores.setflags(write=False)
+
+    @classmethod
+    def empty(cls, pack=None, rate_limited: bool = False) -> "SearchResults":
+        return cls(np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32), pack, rate_limited)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __bool__(self) -> bool:
+        return len(self.ids) > 0
+
+    def __iter__(self) -> Iterator[Tuple[int, float]]:
+        return zip(self.ids.tolist(), self.scores.tolist())
+
+    def __getitem__(self, key) -> "SearchResults":
+        """Slice to a prefix/sub-range, e.g. ``results[:top_k]``."""
+        if not isinstance(key, slice):
+            raise TypeError("SearchResults only supports slicing; iterate for (id, score) pairs")
+        return SearchResults(self.ids[key], self.scores[key], self.pack, self.rate_limited)
+
+    def __repr__(self) -> str:
+        pack_name = getattr(self.pack, 'name', None)
+        return f"SearchResults(ids={self.ids.tolist()}, scores={np.round(self.scores, 3).tolist()}, pack={pack_name!r})"
+
+    def __reduce__(self):
+        # Pickled for the persistent and shared caches: ids and scores only,
+        # rebuilt through __init__ so they come back read-only
+        return (SearchResults, (self.ids, self.scores, None, self.rate_limited))
+
+    def with_pack(self, pack) -> "SearchResults":
+        """The same ids and scores bound to another pack (None to detach), without copying."""
+        return SearchResults(self.ids, self.scores, pack, self.rate_limited)
+
+    def texts(self) -> List[str]:
+        """Chunk texts, resolved from the pack's text store; empty without a pack."""
+        if len(self.ids) == 0 or self.pack is None:
+            return []
+        text_data = self.pack.text_data
+        return [text_data[i] for i in self.ids.tolist()]
+
+    def format(self, limit: Optional[int] = None) -> List[str]:
+        """Chunk texts annotated with their relevance score, as search_knowledge_base returns them."""
+        results = self if limit is None else self[:limit]
+        return [
+            f"{text}\n[Relevance: {score:.2f}]"
+            for text, score in zip(results.texts(), results.scores.tolist())
+        ]
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the id and score arrays."""
+        return self.ids.nbytes + self.scores.nbytes
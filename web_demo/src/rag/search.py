@@ -3,33 +3,133 @@
 import faiss
 import numpy as np
 import os
-import pickle
+import random
 import logging
-from typing import List, Dict, Any, Optional
-from datetime import datetime
-from sentence_transformers import SentenceTransformer
+import threading
+import contextvars
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import List, Dict, Any, Optional, Tuple
 
 # Import our utilities
-from ..utils.cache_utils import get_cache, set_cache, rate_limit, with_retry
+from ..utils.cache_utils import (
+    get_cache, set_cache, get_cache_key, rate_limit, with_retry, clear_cache,
+    get_cached_embedding, set_cached_embedding, get_search_cache, CACHE_TTL,
+    get_persistent, set_persistent, preload_cache, preload_embeddings, set_embedding_scope,
+    get_shared_cache
+)
+from ..utils.async_utils import run_in_executor, get_executor
+from ..utils.single_flight import SingleFlight
+from ..utils.resilience import CircuitBreaker, CircuitOpenError, DeadlineExceeded, remaining_time
+from ..utils.logging_utils import set_sample_rate, log_routine
 from .monitoring import monitor
-
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('rag_search.log'),
-        logging.StreamHandler()
-    ]
+from .semantic_cache import SemanticCache
+from .coalescer import SearchCoalescer
+from .encoders import load_encoder
+from .reranker import CrossEncoderReranker
+from .metadata import filter_key
+from .lexical import reciprocal_rank_fusion
+from .manifest import METRIC_INNER_PRODUCT
+from .text_store import MappedTextStore
+from .results import SearchResults
+from .packs import (
+    DEFAULT_KB_NAME, DataPack, PackRegistry, pack_paths, read_faiss_index, read_text_data
 )
+
+# Logging is configured by the application (see configure_logging in
+# utils/logging_utils.py, called from app.py)
 logger = logging.getLogger(__name__)
+# Fraction of routine per-request lines (search started, cache hit/miss, ...)
+# that are logged; warnings and errors are always logged
+LOG_SAMPLE_RATE = 0.05
+set_sample_rate(logger, LOG_SAMPLE_RATE)
+# Result cache hit/miss/eviction/size stats appear in get_rag_metrics()
+monitor.register_stats('result_cache', get_search_cache())
 
 # --- Configuration ---
 # This must match the model used in build_index.py
 EMBEDDING_MODEL_ID = 'all-MiniLM-L6-v2'
 DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(__file__)))), 'data', 'processed')
-INDEX_FILE_PATH = os.path.join(DATA_DIR, "knowledge_base_v0_generic_46-class.faiss")
-TEXT_DATA_PATH = os.path.join(DATA_DIR, "knowledge_base_v0_generic_46-class_text.pkl")
+# Where asset_preparation/build_index.py writes the default knowledge base
+INDEX_FILE_PATH, TEXT_DATA_PATH = pack_paths(DATA_DIR, DEFAULT_KB_NAME)
+
+# Query encoder backend: "torch" (SentenceTransformer) or "onnx" (ONNX Runtime,
+# no torch import). Export and parity-check the ONNX model with
+# 'python -m src.rag.encoders'; the int8 model is the fastest on CPU.
+ENCODER_BACKEND = "torch"
+ONNX_MODEL_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'model', 'encoder_onnx', 'model_int8.onnx'
+)
+
+# Encoder batch size used by search_knowledge_base_batch
+BATCH_ENCODE_SIZE = 64
+
+# Memory-map the FAISS index and read chunk text from the UTF-8 blob store
+# (see text_store.py) instead of unpickling it. Lets worker processes share
+# the page cache and keeps cold start independent of knowledge base size.
+USE_MMAP = False
+
+# Semantic cache: serve a stored result when a new query's embedding is within
+# SEMANTIC_CACHE_THRESHOLD cosine similarity of an already answered query.
+SEMANTIC_CACHE_ENABLED = True
+SEMANTIC_CACHE_THRESHOLD = 0.92
+SEMANTIC_CACHE_MAX_ENTRIES = 1000
+# Fraction of semantic hits re-checked against a real search to count false hits
+SEMANTIC_CACHE_VERIFY_RATE = 0.05
+
+# Regional data packs ('knowledge_base_<region>.faiss' + '_text.pkl', see
+# packs.py) are loaded on demand for region=... searches and evicted least
+# recently used first once they hold more than PACK_MEMORY_BUDGET_MB. The
+# default knowledge base above is always resident and not counted; packs live
+# in their own directory so it is never discovered as a region.
+PACKS_DIR = os.path.join(DATA_DIR, 'packs')
+PACK_MEMORY_BUDGET_MB = 512
+
+# Hybrid retrieval uses the BM25 index build_index.py writes next to the FAISS
+# index ('<index>.bm25.npz'); filters=... uses its chunk metadata ('<index>.meta.npz')
+SEARCH_MODES = ("dense", "hybrid")
+# Candidates taken from each ranking before reciprocal rank fusion
+HYBRID_CANDIDATES = 50
+RRF_K = 60
+# Above this many chunks, dense scoring only runs on the lexical candidates
+HYBRID_PREFILTER_MIN_CHUNKS = 50000
+
+# Re-rank candidates from compressed (SQ/PQ) indexes with the exact vectors the
+# builder stores in '<index>.vectors.npy' (memory-mapped, so it costs disk, not RAM)
+RERANK_EXACT = True
+RERANK_CANDIDATE_FACTOR = 4
+
+# Cross-encoder re-ranking: re-score the top CROSS_ENCODER_CANDIDATES bi-encoder
+# hits in one batched pass and keep the best top_k. If scoring takes longer than
+# CROSS_ENCODER_TIME_BUDGET_MS the bi-encoder order is returned instead.
+CROSS_ENCODER_ENABLED = False
+CROSS_ENCODER_MODEL_ID = 'cross-encoder/ms-marco-MiniLM-L-6-v2'
+CROSS_ENCODER_CANDIDATES = 20
+CROSS_ENCODER_TIME_BUDGET_MS = 150
+
+# Default search-time knobs for approximate indexes; search_knowledge_base
+# accepts per-call overrides so UI calls and batch jobs can share one index.
+DEFAULT_NPROBE = 8       # IVF lists scanned per query
+DEFAULT_EF_SEARCH = 64   # HNSW candidate list size
+
+# Micro-batching: concurrent default dense cache misses are collected for up to
+# COALESCE_MAX_WAIT_MS (or COALESCE_MAX_BATCH requests) and answered with one
+# batched encode, semantic cache probes on those embeddings and one index.search
+COALESCE_ENABLED = True
+COALESCE_MAX_WAIT_MS = 3
+COALESCE_MAX_BATCH = 32
+
+# Retries: only transient errors (timeouts, dropped connections) are retried,
+# after a jittered delay of at most SEARCH_RETRY_BASE_DELAY * 2**attempt seconds
+# and never past the request deadline. After SEARCH_BREAKER_THRESHOLD consecutive
+# failed searches, searches fail fast for SEARCH_BREAKER_RESET seconds until a
+# probe search succeeds.
+SEARCH_RETRY_ATTEMPTS = 3
+SEARCH_RETRY_BASE_DELAY = 0.05
+SEARCH_BREAKER_THRESHOLD = 5
+SEARCH_BREAKER_RESET = 30
+
+# Returned in place of results when a user exceeds the rate limit
+RATE_LIMIT_MESSAGE = "Rate limit exceeded. Please try again later."
 
 # Performance monitoring
 SEARCH_METRICS = {
@@ -49,121 +149,389 @@ import time
 embedding_model = None
 index = None
 text_data = None
+cross_encoder = None
+# The default knowledge base once fully set up (index, text, side files, manifest)
+default_pack: Optional[DataPack] = None
+pack_registry: Optional[PackRegistry] = None
+coalescer = None
+# De-duplicates identical concurrent cache misses, keyed like the result cache
+search_flight = SingleFlight()
+# Shared by every retried search helper: they fail together when the index does
+search_breaker = CircuitBreaker("search", SEARCH_BREAKER_THRESHOLD, SEARCH_BREAKER_RESET)
+search_retry = with_retry(
+    max_retries=SEARCH_RETRY_ATTEMPTS, backoff_factor=SEARCH_RETRY_BASE_DELAY,
+    name="search", breaker=search_breaker
+)
+monitor.register_stats('search_retry', search_retry)
+# Guards each lazily loaded component against concurrent double loading
+_load_locks = {
+    name: threading.Lock()
+    for name in ('embedding_model', 'index', 'text_data', 'finalize', 'packs', 'cross_encoder',
+                 'coalescer', 'semantic_cache')
+}
+# Serializes hot reloads; searches never take it
+_reload_lock = threading.Lock()
 
-def load_search_dependencies():
+def load_search_dependencies(use_mmap: Optional[bool] = None):
     """
     Loads all necessary components for searching into memory.
     - FAISS index
     - Text data
     - Embedding model
+
+    The three components can also be loaded separately (and in parallel, see
+    pipeline/startup.py); this function then only finishes the setup. It is safe
+    to call from several threads at once.
+
+    Args:
+        use_mmap (bool, optional): Memory-map the index and text store instead of
+            reading them into private memory. Defaults to USE_MMAP.
     """
-    global embedding_model, index, text_data
+    global default_pack
+
+    # --- 1-3. Embedding model, FAISS index, text data ---
+    load_embedding_model()
+    load_faiss_index(use_mmap)
+    load_text_data(use_mmap)
+    if CROSS_ENCODER_ENABLED:
+        load_cross_encoder()
+
+    if default_pack is not None:
+        return
 
-    # --- 1. Load Embedding Model ---
-    if embedding_model is None:
-        print("Loading embedding model for search...")
+    with _load_locks['finalize']:
+        if default_pack is not None:
+            return
+
+        # --- 4-6. BM25 and chunk metadata (optional), manifest check, exact vectors ---
+        pack = DataPack("default", INDEX_FILE_PATH, TEXT_DATA_PATH, index=index, text_data=text_data)
+        pack.finalize(
+            EMBEDDING_MODEL_ID, embedding_model.get_sentence_embedding_dimension(),
+            USE_MMAP if use_mmap is None else use_mmap
+        )
+        if pack.lexical_index is not None:
+            print("✅ BM25 index loaded successfully.")
+        if pack.chunk_metadata is not None:
+            print("✅ Chunk metadata loaded successfully.")
+        if pack.exact_vectors is not None:
+            print("✅ Exact vectors mapped for re-ranking.")
+
+        # Published last: a non-None default pack means search is fully set up
+        default_pack = pack
+        manifest = pack.manifest
+        print(f"✅ Index manifest OK ({manifest['index_type']}, metric={manifest['metric']}, "
+              f"normalized={manifest['normalized']}).")
+
+        # --- 7. Warm caches from the persistent tier, share results between workers ---
+        _preload_persistent_cache(pack)
+        _register_shared_cache()
+
+def load_embedding_model():
+    """Loads the query embedding model."""
+    global embedding_model
+    if embedding_model is not None:
+        return
+    with _load_locks['embedding_model']:
+        if embedding_model is not None:
+            return
+        print(f"Loading embedding model for search ({ENCODER_BACKEND} backend)...")
         try:
-            embedding_model = SentenceTransformer(EMBEDDING_MODEL_ID)
+            embedding_model = load_encoder(ENCODER_BACKEND, EMBEDDING_MODEL_ID, ONNX_MODEL_PATH)
+            # Backends differ slightly numerically, so each keeps its own persisted embeddings
+            set_embedding_scope(f"{ENCODER_BACKEND}|{EMBEDDING_MODEL_ID}")
             print("✅ Embedding model loaded.")
         except Exception as e:
-            print(f"❌ ERROR: Could not load SentenceTransformer model. {e}")
+            print(f"❌ ERROR: Could not load embedding model. {e}")
             raise
 
-    # --- 2. Load FAISS Index ---
-    if index is None:
+def load_cross_encoder():
+    """Loads the cross-encoder used to re-rank candidates."""
+    global cross_encoder
+    if cross_encoder is not None:
+        return
+    with _load_locks['cross_encoder']:
+        if cross_encoder is not None:
+            return
+        print(f"Loading cross-encoder for re-ranking: {CROSS_ENCODER_MODEL_ID}")
+        try:
+            cross_encoder = CrossEncoderReranker(CROSS_ENCODER_MODEL_ID)
+            print("✅ Cross-encoder loaded.")
+        except Exception as e:
+            print(f"❌ ERROR: Could not load cross-encoder. {e}")
+            raise
+
+def load_faiss_index(use_mmap: Optional[bool] = None):
+    """Loads (or memory-maps) the FAISS index."""
+    global index
+    if use_mmap is None:
+        use_mmap = USE_MMAP
+    if index is not None:
+        return
+    with _load_locks['index']:
+        if index is not None:
+            return
         print(f"Loading FAISS index from: {INDEX_FILE_PATH}")
-        if not os.path.exists(INDEX_FILE_PATH):
-            raise FileNotFoundError(
-                f"FAISS index not found at '{INDEX_FILE_PATH}'. "
-                "Please run 'src/rag/build_index.py' first."
-            )
         try:
-            index = faiss.read_index(INDEX_FILE_PATH)
-            print("✅ FAISS index loaded successfully.")
+            index = read_faiss_index(INDEX_FILE_PATH, use_mmap)
+            if use_mmap:
+                print("✅ FAISS index memory-mapped successfully.")
+            else:
+                print("✅ FAISS index loaded successfully.")
+        except FileNotFoundError:
+            raise
         except Exception as e:
             print(f"❌ ERROR: Could not load FAISS index. {e}")
             raise
 
-    # --- 3. Load Text Data ---
-    if text_data is None:
+def load_text_data(use_mmap: Optional[bool] = None):
+    """Loads the chunk text, from the memory-mapped store or the pickle."""
+    global text_data
+    if use_mmap is None:
+        use_mmap = USE_MMAP
+    if text_data is not None:
+        return
+    with _load_locks['text_data']:
+        if text_data is not None:
+            return
         print(f"Loading text data from: {TEXT_DATA_PATH}")
-        if not os.path.exists(TEXT_DATA_PATH):
-            raise FileNotFoundError(
-                f"Text data not found at '{TEXT_DATA_PATH}'. "
-                "Please run 'src/rag/build_index.py' first."
-            )
         try:
-            with open(TEXT_DATA_PATH, 'rb') as f:
-                text_data = pickle.load(f)
-            print("✅ Text data loaded successfully.")
+            text_data = read_text_data(TEXT_DATA_PATH, use_mmap)
+            if isinstance(text_data, MappedTextStore):
+                print("✅ Text store memory-mapped successfully.")
+            else:
+                print("✅ Text data loaded successfully.")
+        except FileNotFoundError:
+            raise
         except Exception as e:
             print(f"❌ ERROR: Could not load text data. {e}")
             raise
 
-def search_knowledge_base(query: str, top_k: int = 3, user_id: str = "default") -> list[str]:
+def warmup_search():
+    """
+    Pays first-call costs (encoder graph, index pages, BLAS threads) before
+    traffic arrives. Bypasses caches and metrics.
+    """
+    load_search_dependencies()
+    pack = default_pack
+    embedding = embedding_model.encode(["tomato leaves turning yellow"], convert_to_tensor=False)
+    query = np.array(embedding, dtype=np.float32)
+    if pack.manifest['normalized']:
+        faiss.normalize_L2(query)
+    _search_index(pack, query, min(3, pack.index.ntotal))
+
+def get_index_manifest(region: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Returns the manifest of the default index, or of a loaded regional pack.
+    Returns None if that index is not loaded.
+    """
+    if region is None:
+        return default_pack.manifest if default_pack is not None else None
+    registry = _get_pack_registry()
+    if region not in registry.resident():
+        return None
+    return registry.get(region).manifest
+
+def reload_knowledge_base(region: Optional[str] = None, index_path: Optional[str] = None,
+                          text_path: Optional[str] = None,
+                          use_mmap: Optional[bool] = None) -> Dict[str, Any]:
+    """
+    Hot-reloads a knowledge base without restarting the app.
+
+    A new snapshot (index, text and side files) is loaded next to the live one
+    and validated (manifest, index/text sizes, a test search). It then replaces
+    the live snapshot in a single reference swap, so searches already running
+    finish on the old snapshot. Cached results are scoped to the snapshot that
+    produced them (see DataPack.result_scope), so the new snapshot never serves
+    the old one's; those still in memory are dropped. If anything fails, the
+    live snapshot stays in place.
+
+    Args:
+        region (str, optional): Regional pack to reload; None reloads the default
+            knowledge base.
+        index_path (str, optional): Load the default knowledge base from this index
+            instead of the live one's path, e.g. a freshly built file.
+        text_path (str, optional): Chunk text to go with index_path.
+        use_mmap (bool, optional): As in load_search_dependencies. Defaults to USE_MMAP.
+
+    Returns:
+        Dict[str, Any]: The manifest of the new snapshot.
+
+    Raises:
+        FileNotFoundError, ManifestMismatchError, ValueError: The new snapshot
+            could not be loaded or validated; the old one is still serving.
+    """
+    global default_pack, index, text_data
+
+    with _reload_lock:
+        start = time.time()
+        if region is not None:
+            load_embedding_model()
+            registry = _get_pack_registry()
+            previous = registry.peek(region)
+            pack = registry.reload(region)
+            invalidated = _drop_cached_results(previous, pack)
+        elif default_pack is None:
+            # Nothing live yet: a normal first load
+            load_search_dependencies(use_mmap)
+            return default_pack.manifest
+        else:
+            live = default_pack
+            pack = DataPack(
+                live.name, index_path or live.index_path, text_path or live.text_path
+            )
+            pack.load(
+                EMBEDDING_MODEL_ID, embedding_model.get_sentence_embedding_dimension(),
+                USE_MMAP if use_mmap is None else use_mmap
+            )
+            _check_pack(pack)
+
+            # The swap: searches pick up the new snapshot, and with it the scope
+            # of its cached results, from their next _get_pack()
+            default_pack = pack
+            index, text_data = pack.index, pack.text_data
+            live.retired = True
+
+            invalidated = _drop_cached_results(live, pack)
+            _preload_persistent_cache(pack)
+
+        logger.info(
+            f"Knowledge base '{pack.name}' reloaded in {time.time() - start:.2f}s "
+            f"({len(pack.text_data)} chunks, {invalidated} cached results invalidated)"
+        )
+        return pack.manifest
+
+def reload_knowledge_base_in_background(**kwargs) -> Future:
+    """
+    Runs reload_knowledge_base on the 'reload' executor and returns its Future.
+    Accepts the same keyword arguments as reload_knowledge_base.
+    """
+    return get_executor("reload").submit(reload_knowledge_base, **kwargs)
+
+def list_regions(refresh: bool = False) -> List[str]:
+    """Regions with a data pack in PACKS_DIR."""
+    return _get_pack_registry().regions(refresh)
+
+def get_pack_metrics() -> Dict[str, Any]:
+    """Per-pack hit/load/evict counts, load times and resident memory."""
+    return _get_pack_registry().get_metrics()
+
+def search_knowledge_base(query: str, top_k: int = 3, user_id: str = "default",
+                          **kwargs) -> list[str]:
     """
     Searches the knowledge base for text chunks relevant to the query.
     Implements caching and rate limiting.
 
+    Accepts the same keyword arguments as search_knowledge_base_results and
+    formats its results.
+
+    Returns:
+        list[str]: The most relevant text chunks, each annotated with its
+                 relevance score. Returns an empty list if an error occurs or no
+                 results are found, and a rate limit message if rate limited.
+    """
+    return _to_strings(search_knowledge_base_results(query, top_k, user_id, **kwargs))
+
+def search_knowledge_base_results(query: str, top_k: int = 3, user_id: str = "default",
+                                  mode: str = "dense", ef_search: Optional[int] = None,
+                                  nprobe: Optional[int] = None,
+                                  filters: Optional[Dict[str, str]] = None,
+                                  region: Optional[str] = None,
+                                  rerank: Optional[bool] = None) -> SearchResults:
+    """
+    Searches the knowledge base and returns structured results.
+    Implements caching and rate limiting.
+
+    Results hold chunk ids and scores; chunk text is read from the text store
+    only when asked for (SearchResults.texts / format), so re-rankers and
+    prompt builders can work on ids.
+
     Args:
         query (str): The user's query text.
         top_k (int, optional): The number of top results to return. Defaults to 3.
         user_id (str, optional): User identifier for rate limiting. Defaults to "default".
+        mode (str, optional): "dense" for embedding search only, or "hybrid" to fuse
+            BM25 and dense rankings with reciprocal rank fusion. Defaults to "dense".
+        ef_search (int, optional): HNSW candidate list size for this call; higher
+            is slower but more accurate. Defaults to the manifest or DEFAULT_EF_SEARCH.
+        nprobe (int, optional): IVF lists to scan for this call. Defaults to the
+            manifest or DEFAULT_NPROBE.
+        filters (dict, optional): Restrict scoring to chunks with these labels,
+            e.g. {"plant": "tomato"} or {"plant": "potato", "disease": "late blight"}.
+        region (str, optional): Search this region's data pack (loaded on first
+            use, see list_regions) instead of the default knowledge base.
+        rerank (bool, optional): Re-rank candidates with the cross-encoder.
+            Defaults to CROSS_ENCODER_ENABLED.
 
     Returns:
-        list[str]: A list of the most relevant text chunks from the knowledge base.
-                 Returns an empty list if an error occurs, no results found, or rate limited.
+        SearchResults: The most relevant chunks. Empty if an error occurs or no
+                 results are found; empty with rate_limited set if rate limited.
     """
     start_time = time.time()
-    logger.info(f"Search initiated - User: {user_id}, Query: '{query[:50]}{'...' if len(query) > 50 else ''}'")
+    log_routine(logger, "Search initiated - User: %s, Query: '%.50s'", user_id, query)
     
     # Input validation
     if not query or not query.strip():
         logger.warning("Empty query received")
-        return []
+        return SearchResults.empty()
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode '{mode}'. Expected one of {SEARCH_MODES}.")
+    if region is not None and not _get_pack_registry().has(region):
+        raise ValueError(f"No data pack for region '{region}'. Available: {list_regions()}")
 
     # Check rate limit
     if not rate_limit(user_id):
         logger.warning(f"Rate limit exceeded for user: {user_id}")
         monitor.record_rate_limit()
-        return ["Rate limit exceeded. Please try again later."]
+        return SearchResults.empty(rate_limited=True)
 
-    # Check cache first
-    cache_start = time.time()
-    cached_result = get_cache(query, top_k)
-    cache_time = time.time() - cache_start
-    
-    if cached_result is not None:
-        logger.info(f"Cache hit for query: '{query[:50]}...' (took {cache_time:.4f}s)")
-        monitor.record_search(cache_hit=True, search_time=cache_time)
-        return cached_result
-        
-    logger.info(f"Cache miss for query: '{query[:50]}...' (check took {cache_time:.4f}s)")
-    search_start_time = time.time()
+    if rerank is None:
+        rerank = CROSS_ENCODER_ENABLED
+    retrieval_variant = _cache_variant(mode, ef_search, nprobe, filters, region)
+    cache_variant = ",".join(filter(None, [retrieval_variant, "rerank" if rerank else ""]))
 
     try:
-        # Ensure all dependencies are loaded
-        load_search_dependencies()
+        # Ensure all dependencies are loaded. Cached results are scoped to the
+        # snapshot that produced them, so the pack is resolved first.
+        pack = _get_pack(region)
+        
+        # Check cache first
+        cache_start = time.time()
+        cached_result = get_cache(query, top_k, cache_variant, pack.result_scope)
+        cache_time = time.time() - cache_start
+        
+        if cached_result is not None:
+            log_routine(logger, "Cache hit for query: '%.50s' (took %.4fs)", query, cache_time)
+            monitor.record_search(cache_hit=True, search_time=cache_time)
+            return cached_result.with_pack(pack)
+            
+        log_routine(logger, "Cache miss for query: '%.50s' (check took %.4fs)", query, cache_time)
+        search_start_time = time.time()
         
         # Validate we have data to search
-        if not text_data or len(text_data) == 0:
+        if not pack.text_data or len(pack.text_data) == 0:
             raise ValueError("Knowledge base is empty. Please verify the data files.")
             
         # Adjust top_k if it's larger than our dataset
-        top_k = min(top_k, len(text_data))
-        
-        logger.info(f"Processing search for query: '{query[:50]}...'")
+        top_k = min(top_k, len(pack.text_data))
         
-        # Perform the search with retry logic
-        results = _perform_search(query, top_k)
+        log_routine(logger, "Processing search for query: '%.50s'", query)
         
-        # Cache the results
-        if results:
-            set_cache(query, top_k, results)
+        # Identical concurrent misses on the same snapshot share one computation
+        (results, served_from_cache), shared = search_flight.do(
+            (pack.result_scope, get_cache_key(query, top_k, cache_variant)),
+            _search_uncached, pack, query, top_k, mode, ef_search, nprobe, filters,
+            retrieval_variant, cache_variant, rerank
+        )
+        if shared:
+            monitor.record_single_flight_shared()
+        if shared or served_from_cache:
+            monitor.record_search(cache_hit=True, search_time=time.time() - search_start_time)
+            return results
         
         search_time = time.time() - search_start_time
         total_time = time.time() - start_time
-        logger.info(f"Search completed in {search_time:.2f}s (total: {total_time:.2f}s). Found {len(results)} results.")
+        log_routine(logger, "Search completed in %.2fs (total: %.2fs). Found %d results.",
+                    search_time, total_time, len(results))
         
         # Record the search metrics
         monitor.record_search(cache_hit=False, search_time=search_time)
@@ -172,10 +540,9 @@ def search_knowledge_base(query: str, top_k: int = 3, user_id: str = "default")
         if monitor.metrics['total_searches'] % 10 == 0:
             metrics = monitor.get_metrics()
             logger.info(
-                f"Performance metrics - "
-                f"Searches: {metrics['total_searches']}, "
-                f"Cache Hit Rate: {metrics.get('cache_hit_rate', 0):.1%}, "
-                f"Avg Search Time: {metrics.get('avg_search_time', 0):.3f}s"
+                "Performance metrics - Searches: %d, Cache Hit Rate: %.1f%%, Avg Search Time: %.3fs",
+                metrics['total_searches'], metrics.get('cache_hit_rate', 0) * 100,
+                metrics.get('avg_search_time', 0)
             )
             
         return results
@@ -185,54 +552,852 @@ def search_knowledge_base(query: str, top_k: int = 3, user_id: str = "default")
         logger.error(error_msg)
         logger.error(f"Please ensure the following files exist:\n- {INDEX_FILE_PATH}\n- {TEXT_DATA_PATH}")
         monitor.record_error("file_not_found")
-        return []
+        return SearchResults.empty()
+        
+    except (CircuitOpenError, DeadlineExceeded) as e:
+        # Failing fast on purpose; no stack trace needed
+        logger.warning(f"Search skipped: {e}")
+        monitor.record_error("circuit_open" if isinstance(e, CircuitOpenError) else "deadline_exceeded")
+        return SearchResults.empty()
         
     except Exception as e:
         error_msg = f"Error in search_knowledge_base: {str(e)}"
         logger.error(error_msg, exc_info=True)
         monitor.record_error("search_error")
-        return []
+        return SearchResults.empty()
+
+async def asearch_knowledge_base(query: str, top_k: int = 3, user_id: str = "default",
+                                 **kwargs) -> list[str]:
+    """
+    Async variant of search_knowledge_base.
+    
+    Runs the search on the bounded 'search' executor so the event loop stays
+    free while the query is encoded and the index is scanned. Accepts the same
+    keyword arguments as search_knowledge_base.
+    """
+    return await run_in_executor("search", search_knowledge_base, query, top_k, user_id, **kwargs)
+
+def _search_uncached(pack: DataPack, query: str, top_k: int, mode: str, ef_search: Optional[int],
+                     nprobe: Optional[int], filters: Optional[Dict[str, str]],
+                     retrieval_variant: str, cache_variant: str, rerank: bool):
+    """
+    Computes and caches the results for a query that missed the exact cache.
+    
+    Runs at most once per cache key at a time (see search_flight). With rerank,
+    CROSS_ENCODER_CANDIDATES candidates are retrieved and re-ranked down to top_k.
+    
+    Returns:
+        Tuple of (SearchResults, served_from_cache), where served_from_cache is
+        True for semantic cache hits.
+    """
+    # Results persisted by an earlier run of the app
+    persisted = _persistent_lookup(pack, query, top_k, cache_variant, rerank)
+    if persisted is not None:
+        return persisted, True
+    
+    # Default dense searches of the default pack only
+    use_semantic_cache = SEMANTIC_CACHE_ENABLED and cache_variant == ""
+    coalesce = COALESCE_ENABLED and cache_variant == ""
+    
+    # Serve near-duplicate rephrasings from the semantic cache; coalesced
+    # searches probe it in their batch, after the batched encode
+    if use_semantic_cache and not coalesce:
+        semantic_results = _semantic_cache_lookup(pack, query, top_k)
+        if semantic_results is not None:
+            set_cache(query, top_k, semantic_results.with_pack(None), scope=pack.result_scope)
+            return semantic_results, True
+    
+    # Filters are resolved (and rejected) before any retried call
+    allowed_ids, selector = _filter_selector(pack, filters)
+    if allowed_ids is not None and len(allowed_ids) == 0:
+        logger.info(f"No chunks match filters {filters}")
+        return SearchResults.empty(pack), False
+    
+    # Perform the search with retry logic
+    n_retrieve = max(top_k, min(CROSS_ENCODER_CANDIDATES, len(pack.text_data))) if rerank else top_k
+    retrieval_start = time.time()
+    if mode == "hybrid":
+        results = _perform_hybrid_search(pack, query, n_retrieve, ef_search, nprobe, allowed_ids, selector)
+    elif coalesce:
+        # Batches search the default pack current when they run, which a hot
+        # reload may have replaced since; results are cached under their own pack
+        try:
+            results, semantic_hit = _get_coalescer().search(query, n_retrieve, timeout=remaining_time())
+        except FutureTimeoutError:
+            remaining = remaining_time()
+            if remaining is None or remaining > 0:
+                raise  # The batch itself failed with a timeout
+            raise DeadlineExceeded("Deadline passed while waiting for a coalesced search") from None
+        if results.pack is not None:
+            pack = results.pack
+        if semantic_hit:
+            set_cache(query, top_k, results.with_pack(None), scope=pack.result_scope)
+            return results, True
+    else:
+        results = _perform_search(pack, query, n_retrieve, _search_params(pack, ef_search, nprobe, selector))
+    monitor.record_stage("retrieval", time.time() - retrieval_start)
+    
+    cacheable = True
+    if rerank:
+        results, cacheable = _cross_encoder_rerank(query, results, top_k)
+    
+    # Cache ids and scores only (no pack reference, so cached entries never
+    # keep an evicted pack alive) under the pack's scope, unless a hot reload
+    # replaced the pack meanwhile. Bi-encoder fallbacks after a missed re-rank
+    # budget are not cached.
+    if results and cacheable and not pack.retired:
+        set_cache(query, top_k, results.with_pack(None), cache_variant, pack.result_scope)
+        _persistent_store(pack, query, top_k, results, cache_variant, rerank)
+        if use_semantic_cache:
+            _semantic_cache_add(pack, query, top_k, results)
+    
+    return results, False
+
+def search_knowledge_base_batch(queries: List[str], top_k: int = 3, user_id: str = "default",
+                                **kwargs) -> List[List[str]]:
+    """
+    Searches the knowledge base for several queries at once.
+
+    Accepts the same keyword arguments as search_knowledge_base_batch_results
+    and formats its results.
+
+    Returns:
+        List[List[str]]: One result list per input query, in the same order.
+                 Empty, rate-limited or failed queries get the same value
+                 search_knowledge_base would return for them.
+    """
+    return [
+        _to_strings(results)
+        for results in search_knowledge_base_batch_results(queries, top_k, user_id, **kwargs)
+    ]
 
-@with_retry(max_retries=3, backoff_factor=0.5)
-def _perform_search(query: str, top_k: int) -> List[str]:
+def search_knowledge_base_batch_results(queries: List[str], top_k: int = 3, user_id: str = "default",
+                                        ef_search: Optional[int] = None,
+                                        nprobe: Optional[int] = None,
+                                        filters: Optional[Dict[str, str]] = None,
+                                        region: Optional[str] = None) -> List[SearchResults]:
     """
-    Internal function to perform the actual search with retry logic.
+    Searches the knowledge base for several queries at once, returning
+    structured results.
     
+    Cache lookups, rate limiting and monitoring are applied per query exactly as in
+    search_knowledge_base; all cache misses are then encoded in one
+    SentenceTransformer.encode call and searched with a single matrix index.search.
+
     Args:
+        queries (List[str]): The user queries.
+        top_k (int, optional): The number of top results to return per query. Defaults to 3.
+        user_id (str, optional): User identifier for rate limiting. Defaults to "default".
+        ef_search (int, optional): HNSW candidate list size, as in search_knowledge_base.
+        nprobe (int, optional): IVF lists to scan, as in search_knowledge_base.
+        filters (dict, optional): Label filters applied to every query, as in
+            search_knowledge_base.
+        region (str, optional): Data pack to search, as in search_knowledge_base.
+
+    Returns:
+        List[SearchResults]: One result per input query, in the same order.
+                 Empty, rate-limited or failed queries get the same value
+                 search_knowledge_base_results would return for them.
+    """
+    start_time = time.time()
+    log_routine(logger, "Batch search initiated - User: %s, Queries: %d", user_id, len(queries))
+    
+    results: List[SearchResults] = [SearchResults.empty() for _ in queries]
+    pending: Dict[str, List[int]] = {}
+    cache_variant = _cache_variant("dense", ef_search, nprobe, filters, region)
+    
+    try:
+        # Ensure all dependencies are loaded. Cached results are scoped to the
+        # snapshot that produced them, so the pack is resolved first.
+        pack = _get_pack(region)
+        
+        for position, query in enumerate(queries):
+            # Input validation
+            if not query or not query.strip():
+                logger.warning("Empty query received")
+                continue
+            
+            # Check rate limit
+            if not rate_limit(user_id):
+                logger.warning(f"Rate limit exceeded for user: {user_id}")
+                monitor.record_rate_limit()
+                results[position] = SearchResults.empty(rate_limited=True)
+                continue
+            
+            # Check cache first
+            cache_start = time.time()
+            cached_result = get_cache(query, top_k, cache_variant, pack.result_scope)
+            cache_time = time.time() - cache_start
+            
+            if cached_result is not None:
+                monitor.record_search(cache_hit=True, search_time=cache_time)
+                results[position] = cached_result.with_pack(pack)
+                continue
+            
+            # Identical queries in the same batch are searched once
+            pending.setdefault(query, []).append(position)
+        
+        if not pending:
+            return results
+        
+        # Results persisted by an earlier run of the app
+        for query in list(pending):
+            persisted = _persistent_lookup(pack, query, top_k, cache_variant)
+            if persisted is not None:
+                monitor.record_search(cache_hit=True, search_time=0.0)
+                for position in pending.pop(query):
+                    results[position] = persisted
+        if not pending:
+            return results
+        
+        log_routine(logger, "Batch cache misses: %d of %d queries", len(pending), len(queries))
+        search_start_time = time.time()
+        
+        # Validate we have data to search
+        if not pack.text_data or len(pack.text_data) == 0:
+            raise ValueError("Knowledge base is empty. Please verify the data files.")
+        
+        # Adjust top_k if it's larger than our dataset
+        effective_top_k = min(top_k, len(pack.text_data))
+        
+        miss_queries = list(pending)
+        _, selector = _filter_selector(pack, filters)
+        batch_results = _perform_search_batch(
+            pack, miss_queries, effective_top_k, _search_params(pack, ef_search, nprobe, selector)
+        )
+        
+        search_time = time.time() - search_start_time
+        per_query_time = search_time / len(miss_queries)
+        
+        for query, query_results in zip(miss_queries, batch_results):
+            # Cache under the requested top_k so single-query lookups hit too
+            if query_results and not pack.retired:
+                set_cache(query, top_k, query_results.with_pack(None), cache_variant, pack.result_scope)
+                _persistent_store(pack, query, top_k, query_results, cache_variant)
+            for position in pending[query]:
+                results[position] = query_results
+            monitor.record_search(cache_hit=False, search_time=per_query_time)
+        
+        total_time = time.time() - start_time
+        log_routine(logger, "Batch search completed in %.2fs (total: %.2fs) for %d queries.",
+                    search_time, total_time, len(miss_queries))
+        
+    except FileNotFoundError as e:
+        logger.error(f"Knowledge base files not found: {e}")
+        logger.error(f"Please ensure the following files exist:\n- {INDEX_FILE_PATH}\n- {TEXT_DATA_PATH}")
+        monitor.record_error("file_not_found")
+        
+    except Exception as e:
+        logger.error(f"Error in search_knowledge_base_batch: {str(e)}", exc_info=True)
+        monitor.record_error("search_error")
+    
+    return results
+
+def _search_once(pack: DataPack, query: str, top_k: int, params=None) -> SearchResults:
+    """
+    Internal function to perform the actual search, without retries.
+    
+    Called directly from code already running under search_retry, so a
+    failure is retried (and counted by the breaker) only once; other callers
+    use _perform_search.
+    
+    Args:
+        pack (DataPack): The knowledge base to search
         query (str): The search query
         top_k (int): Number of results to return
+        params (faiss.SearchParameters, optional): Per-call search parameters
         
     Returns:
-        List[str]: List of search results
+        SearchResults: The ranked chunks
     """
     try:
-        # 1. Encode the query into a vector
-        query_embedding = embedding_model.encode([query], convert_to_tensor=False)
-        query_embedding = np.array(query_embedding, dtype=np.float32)
+        # 1. Encode the query into a vector (reusing a cached embedding if any)
+        query_embedding = _encode_queries(pack, [query])
 
         # 2. Search the FAISS index
         # D: distances, I: indices
-        distances, indices = index.search(query_embedding, top_k)
+        distances, indices = _search_index(pack, query_embedding, top_k, params)
         
-        # Filter out any invalid indices
-        valid_indices = [i for i in indices[0] if 0 <= i < len(text_data)]
+        # 3. Keep the valid chunk ids with their relevance scores
+        return _to_results(pack, distances[0], indices[0])
         
-        if not valid_indices:
-            logger.warning("No valid results found in knowledge base")
-            return []
-            
-        # 3. Retrieve the corresponding text chunks with their relevance scores
-        results = [
-            f"{text_data[i]}\n[Relevance: {1 - distances[0][j]:.2f}]" 
-            for j, i in enumerate(valid_indices)
+    except Exception as e:
+        logger.error(f"Error in _search_once: {str(e)}", exc_info=True)
+        raise  # Let the retry decorator handle it
+
+# _search_once with retry logic
+_perform_search = search_retry(_search_once)
+
+@search_retry
+def _perform_search_batch(pack: DataPack, queries: List[str], top_k: int,
+                         params=None) -> List[SearchResults]:
+    """
+    Internal function to search several queries with one encode and one index call.
+    
+    Args:
+        pack (DataPack): The knowledge base to search
+        queries (List[str]): The search queries
+        top_k (int): Number of results to return per query
+        params (faiss.SearchParameters, optional): Per-call search parameters
+        
+    Returns:
+        List[SearchResults]: One result per query, in input order
+    """
+    try:
+        # 1. Encode all uncached queries in a single forward pass
+        query_embeddings = _encode_queries(pack, queries)
+
+        # 2. Search the FAISS index with the whole query matrix
+        distances, indices = _search_index(pack, query_embeddings, top_k, params)
+        
+        # 3. Split the result matrix back into per-query results
+        return [
+            _to_results(pack, distances[row], indices[row])
+            for row in range(len(queries))
         ]
         
-        return results
+    except Exception as e:
+        logger.error(f"Error in _perform_search_batch: {str(e)}", exc_info=True)
+        raise  # Let the retry decorator handle it
+
+@search_retry
+def _perform_coalesced_batch(pack: DataPack, queries: List[str],
+                             top_ks: List[int]) -> List[Tuple[SearchResults, bool]]:
+    """
+    Internal function answering a coalesced batch with one encode and one index call.
+    
+    The batch's embeddings are first probed against the semantic cache; only
+    the misses are searched, at the largest of their top_k values.
+    
+    Args:
+        pack (DataPack): The knowledge base to search
+        queries (List[str]): The search queries
+        top_ks (List[int]): Number of results to return for each query
+        
+    Returns:
+        List of (SearchResults, semantic_hit) per query, in input order
+    """
+    try:
+        # 1. Encode the whole batch in a single forward pass
+        query_embeddings = _encode_queries(pack, queries)
+        outcomes: List[Optional[Tuple[SearchResults, bool]]] = [None] * len(queries)
+        
+        # 2. Serve near-duplicate rephrasings from the semantic cache
+        if SEMANTIC_CACHE_ENABLED:
+            for row, (query, top_k) in enumerate(zip(queries, top_ks)):
+                cached = _semantic_cache_lookup(pack, query, top_k, query_embeddings[row])
+                if cached is not None:
+                    outcomes[row] = (cached, True)
+        
+        # 3. One search at the largest top_k; smaller requests take a prefix
+        misses = [row for row, outcome in enumerate(outcomes) if outcome is None]
+        if misses:
+            distances, indices = _search_index(
+                pack, query_embeddings[misses], max(top_ks[row] for row in misses)
+            )
+            for i, row in enumerate(misses):
+                outcomes[row] = (_to_results(pack, distances[i], indices[i])[:top_ks[row]], False)
+        return outcomes
         
     except Exception as e:
-        logger.error(f"Error in _perform_search: {str(e)}", exc_info=True)
+        logger.error(f"Error in _perform_coalesced_batch: {str(e)}", exc_info=True)
         raise  # Let the retry decorator handle it
 
+@search_retry
+def _perform_hybrid_search(pack: DataPack, query: str, top_k: int, ef_search: Optional[int] = None,
+                           nprobe: Optional[int] = None, allowed_ids: Optional[np.ndarray] = None,
+                           filter_sel=None) -> SearchResults:
+    """
+    Internal function to fuse BM25 and dense rankings with reciprocal rank fusion.
+    
+    For large knowledge bases the lexical candidates also act as a prefilter,
+    so dense scoring only runs on chunks that share a term with the query.
+    Falls back to dense search when no BM25 index is available.
+    
+    Args:
+        pack (DataPack): The knowledge base to search
+        query (str): The search query
+        top_k (int): Number of results to return
+        ef_search (int, optional): HNSW candidate list size
+        nprobe (int, optional): IVF lists to scan
+        allowed_ids (np.ndarray, optional): Chunk ids matching the label filters,
+            restricting both rankings (see _filter_selector)
+        filter_sel (faiss.IDSelector, optional): Selector for allowed_ids
+        
+    Returns:
+        SearchResults: The fused ranking
+    """
+    lexical_index = pack.lexical_index
+    if lexical_index is None:
+        logger.warning("BM25 index not loaded, falling back to dense search")
+        return _search_once(pack, query, top_k, _search_params(pack, ef_search, nprobe, filter_sel))
+    
+    try:
+        # 1. Lexical candidates
+        if allowed_ids is None:
+            lexical_ids, _ = lexical_index.search(query, HYBRID_CANDIDATES)
+        else:
+            lexical_ids, _ = lexical_index.search(query, len(lexical_index))
+            lexical_ids = lexical_ids[np.isin(lexical_ids, allowed_ids)][:HYBRID_CANDIDATES]
+        
+        # 2. Dense candidates, restricted to the lexical ones on large indexes
+        query_embedding = _encode_queries(pack, [query])
+        n_candidates = min(HYBRID_CANDIDATES, len(pack.text_data))
+        if len(lexical_ids) > 0 and len(pack.text_data) >= HYBRID_PREFILTER_MIN_CHUNKS:
+            selector = faiss.IDSelectorBatch(lexical_ids.astype(np.int64))
+            params = _search_params(pack, ef_search, nprobe, selector)
+            _, dense_ids = _search_index(pack, query_embedding, min(n_candidates, len(lexical_ids)), params)
+        else:
+            params = _search_params(pack, ef_search, nprobe, filter_sel)
+            _, dense_ids = _search_index(pack, query_embedding, n_candidates, params)
+        dense_ranking = [int(i) for i in dense_ids[0] if i >= 0]
+        
+        # 3. Fuse; relevance is the fused score relative to rank 1 in both lists
+        fused = reciprocal_rank_fusion([lexical_ids.tolist(), dense_ranking], k=RRF_K)[:top_k]
+        best_possible = 2.0 / (RRF_K + 1)
+        return SearchResults(
+            [chunk_id for chunk_id, _ in fused],
+            [score / best_possible for _, score in fused],
+            pack
+        )
+        
+    except Exception as e:
+        logger.error(f"Error in _perform_hybrid_search: {str(e)}", exc_info=True)
+        raise  # Let the retry decorator handle it
+
+def _cross_encoder_rerank(query: str, candidates: SearchResults, top_k: int):
+    """
+    Re-ranks candidates with the cross-encoder within CROSS_ENCODER_TIME_BUDGET_MS.
+    
+    Scoring runs on the single-worker 'rerank' executor, so the caller stops
+    waiting when the budget (or the request deadline) runs out. Work the
+    caller gave up on is cancelled if still queued, and skipped if it was
+    already picked up, so a backlog of late requests doesn't delay the next
+    ones. A cross-encoder that is not loaded yet is loaded there too, so early
+    calls fall back.
+    
+    Args:
+        query (str): The search query
+        candidates (SearchResults): Bi-encoder candidates, best first
+        top_k (int): Number of results to return
+        
+    Returns:
+        Tuple of (SearchResults, reranked), where reranked is False if the
+        bi-encoder order was returned instead.
+    """
+    if len(candidates) <= 1:
+        return candidates[:top_k], True
+    
+    abandoned = threading.Event()
+    
+    def score():
+        if abandoned.is_set():
+            return None
+        load_cross_encoder()
+        if abandoned.is_set():
+            return None
+        return cross_encoder.rerank(query, candidates, top_k)
+    
+    timeout = CROSS_ENCODER_TIME_BUDGET_MS / 1000
+    remaining = remaining_time()
+    if remaining is not None:
+        timeout = max(0.0, min(timeout, remaining))
+    
+    start = time.time()
+    future = get_executor("rerank").submit(contextvars.copy_context().run, score)
+    try:
+        reranked = future.result(timeout=timeout)
+        monitor.record_stage("rerank", time.time() - start)
+        return reranked, True
+    except FutureTimeoutError:
+        abandoned.set()
+        future.cancel()
+        logger.warning(f"Re-ranking exceeded {CROSS_ENCODER_TIME_BUDGET_MS} ms budget, using bi-encoder order")
+        monitor.record_rerank_fallback()
+    except Exception as e:
+        logger.error(f"Re-ranking failed, using bi-encoder order: {e}")
+        monitor.record_rerank_fallback()
+    return candidates[:top_k], False
+
+def _search_index(pack: DataPack, query_embeddings: np.ndarray, top_k: int, params=None):
+    """
+    Searches the FAISS index, re-ranking with exact vectors when available.
+    
+    For compressed indexes, RERANK_CANDIDATE_FACTOR * top_k candidates are
+    fetched and re-scored with the exact inner product before truncating.
+    
+    Args:
+        pack (DataPack): The knowledge base to search
+        query_embeddings (np.ndarray): Query matrix of shape (n, dim)
+        top_k (int): Number of results per query
+        params (faiss.SearchParameters, optional): Per-call search parameters
+        
+    Returns:
+        Tuple of (scores, ids) arrays of shape (n, top_k)
+    """
+    exact_vectors = pack.exact_vectors
+    rerank = (
+        RERANK_EXACT and exact_vectors is not None
+        and pack.manifest['metric'] == METRIC_INNER_PRODUCT
+    )
+    if params is None:
+        params = _search_params(pack)
+    if not rerank:
+        return pack.index.search(query_embeddings, top_k, params=params)
+    
+    n_candidates = min(top_k * RERANK_CANDIDATE_FACTOR, pack.index.ntotal)
+    _, candidate_ids = pack.index.search(query_embeddings, n_candidates, params=params)
+    
+    scores = np.full((len(query_embeddings), top_k), -np.inf, dtype=np.float32)
+    ids = np.full((len(query_embeddings), top_k), -1, dtype=np.int64)
+    for row, query_vector in enumerate(query_embeddings):
+        valid = candidate_ids[row][candidate_ids[row] >= 0]
+        if len(valid) == 0:
+            continue
+        # Sorted ids keep reads from the memory map sequential
+        valid = np.sort(valid)
+        exact_scores = np.asarray(exact_vectors[valid], dtype=np.float32) @ query_vector
+        order = np.argsort(-exact_scores)[:top_k]
+        scores[row, :len(order)] = exact_scores[order]
+        ids[row, :len(order)] = valid[order]
+    return scores, ids
+
+def _cache_variant(mode: str, ef_search: Optional[int], nprobe: Optional[int],
+                   filters: Optional[Dict[str, str]] = None,
+                   region: Optional[str] = None) -> str:
+    """
+    Builds the cache key variant for a retrieval configuration.
+    
+    Default dense searches of the default pack keep the original cache key;
+    regional packs, other modes, explicit ef_search / nprobe overrides and
+    filters get their own entries.
+    """
+    parts = [] if region is None else [f"region={region}"]
+    if mode != "dense":
+        parts.append(mode)
+    if ef_search is not None:
+        parts.append(f"ef{ef_search}")
+    if nprobe is not None:
+        parts.append(f"np{nprobe}")
+    if filters:
+        parts.extend(f"{field}={value}" for field, value in filter_key(filters))
+    return ",".join(parts)
+
+def _filter_selector(pack: DataPack, filters: Optional[Dict[str, str]]):
+    """
+    Resolves label filters to the matching chunk ids and a FAISS ID selector.
+    
+    Returns:
+        Tuple of (chunk_ids, selector), or (None, None) when there are no filters.
+    
+    Raises:
+        ValueError: If filters are given but no chunk metadata is available.
+    """
+    if not filters:
+        return None, None
+    if pack.chunk_metadata is None:
+        raise ValueError(
+            f"Filtered search needs chunk metadata at '{pack.metadata_path}'. "
+            "Rebuild the index with asset_preparation/build_index.py."
+        )
+    return pack.chunk_metadata.selector_for(filters)
+
+def _search_params(pack: DataPack, ef_search: Optional[int] = None,
+                   nprobe: Optional[int] = None, selector=None):
+    """
+    Builds per-call FAISS search parameters for the loaded index type.
+    
+    Parameters are passed per call instead of setting index.nprobe /
+    index.hnsw.efSearch, so concurrent callers with different knobs don't
+    interfere. Returns None when the index needs no parameters.
+    
+    Args:
+        pack (DataPack): The knowledge base to search
+        ef_search (int, optional): HNSW candidate list size
+        nprobe (int, optional): IVF lists to scan
+        selector (faiss.IDSelector, optional): Restricts the search to some ids
+    """
+    index_params = pack.manifest.get('index_params', {}) if pack.manifest else {}
+    base = faiss.downcast_index(pack.index)
+    pre_transform = isinstance(base, faiss.IndexPreTransform)
+    if pre_transform:
+        base = faiss.downcast_index(base.index)
+    
+    if isinstance(base, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = ef_search or index_params.get('ef_search', DEFAULT_EF_SEARCH)
+    elif isinstance(base, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF()
+        params.nprobe = nprobe or index_params.get('nprobe', DEFAULT_NPROBE)
+    elif selector is not None:
+        params = faiss.SearchParameters()
+    else:
+        return None
+    
+    if selector is not None:
+        params.sel = selector
+    if pre_transform:
+        wrapper = faiss.SearchParametersPreTransform()
+        wrapper.index_params = params
+        # Keep the inner parameters alive as long as the wrapper
+        wrapper.referenced_objects = [params]
+        return wrapper
+    return params
+
+def _encode_queries(pack: DataPack, queries: List[str]) -> np.ndarray:
+    """
+    Returns a float32 embedding matrix for the queries.
+    
+    Embeddings come from the query-embedding cache when possible, so every
+    retrieval variant (different top_k, filters or index) reuses them; the
+    remaining queries are encoded together in one call and cached.
+    
+    Args:
+        pack (DataPack): The knowledge base the embeddings are searched against
+        queries (List[str]): The search queries
+        
+    Returns:
+        np.ndarray: Array of shape (len(queries), dim)
+    """
+    embeddings: List[Optional[np.ndarray]] = [get_cached_embedding(q) for q in queries]
+    missing = [i for i, emb in enumerate(embeddings) if emb is None]
+    
+    if missing:
+        encoded = embedding_model.encode(
+            [queries[i] for i in missing],
+            batch_size=BATCH_ENCODE_SIZE,
+            convert_to_tensor=False
+        )
+        encoded = np.asarray(encoded, dtype=np.float32)
+        for row, i in enumerate(missing):
+            embeddings[i] = encoded[row]
+            set_cached_embedding(queries[i], encoded[row])
+    
+    # Copy, so cached embeddings stay raw whatever the index expects
+    matrix = np.array(np.vstack(embeddings), dtype=np.float32, order='C')
+    if pack.manifest is not None and pack.manifest['normalized']:
+        faiss.normalize_L2(matrix)
+    return matrix
+
+def _get_pack(region: Optional[str]) -> DataPack:
+    """Returns the loaded default pack, or a region's pack from the registry."""
+    if region is None:
+        load_search_dependencies()
+        return default_pack
+    load_embedding_model()
+    return _get_pack_registry().get(region)
+
+def _get_pack_registry() -> PackRegistry:
+    """Returns the regional pack registry, creating it on first use."""
+    global pack_registry
+    if pack_registry is None:
+        with _load_locks['packs']:
+            if pack_registry is None:
+                pack_registry = PackRegistry(
+                    PACKS_DIR, _load_pack,
+                    memory_budget_bytes=PACK_MEMORY_BUDGET_MB * 1024 * 1024,
+                    on_event=monitor.record_pack_event
+                )
+    return pack_registry
+
+def _load_pack(pack: DataPack) -> None:
+    """Loads and checks a regional pack with the running embedding model and load settings."""
+    pack.load(EMBEDDING_MODEL_ID, embedding_model.get_sentence_embedding_dimension(), USE_MMAP)
+    _check_pack(pack)
+
+def _check_pack(pack: DataPack) -> None:
+    """
+    Runs a test search on a freshly loaded pack before it serves traffic.
+    Also pays its first-call costs (index pages, BLAS threads).
+    
+    Raises:
+        ValueError: If the search returns no valid chunk ids.
+    """
+    _, ids = _search_index(pack, _encode_queries(pack, ["tomato leaves turning yellow"]), 1)
+    if not 0 <= ids[0][0] < len(pack.text_data):
+        raise ValueError(f"Test search on pack '{pack.name}' returned no valid chunk")
+
+def _get_coalescer() -> SearchCoalescer:
+    """Returns the request coalescer, creating it on first use."""
+    global coalescer
+    if coalescer is None:
+        with _load_locks['coalescer']:
+            if coalescer is None:
+                coalescer = SearchCoalescer(
+                    # Resolved per batch, so batches always search the current default pack
+                    batch_fn=lambda queries, top_ks: _perform_coalesced_batch(default_pack, queries, top_ks),
+                    max_wait=COALESCE_MAX_WAIT_MS / 1000,
+                    max_batch_size=COALESCE_MAX_BATCH,
+                    on_batch=monitor.record_batch
+                )
+    return coalescer
+
+def _get_semantic_cache(pack: DataPack) -> SemanticCache:
+    """
+    Returns a pack's semantic cache, creating it for the loaded encoder on first use.
+    
+    Each snapshot has its own, so a hot-reloaded pack starts empty and late
+    additions from searches on the old snapshot never reach it.
+    """
+    if pack.semantic_cache is None:
+        with _load_locks['semantic_cache']:
+            if pack.semantic_cache is None:
+                pack.semantic_cache = SemanticCache(
+                    dimension=embedding_model.get_sentence_embedding_dimension(),
+                    threshold=SEMANTIC_CACHE_THRESHOLD,
+                    max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+                    ttl=CACHE_TTL
+                )
+    return pack.semantic_cache
+
+def _semantic_cache_lookup(pack: DataPack, query: str, top_k: int,
+                           embedding: Optional[np.ndarray] = None) -> Optional[SearchResults]:
+    """
+    Looks up a near-duplicate query in the semantic cache.
+    
+    A sampled fraction of hits is verified against a real search; a hit whose
+    top chunk differs is counted as a false hit, evicted and treated as a miss.
+    A verification search that fails is logged and the hit is served.
+    
+    Args:
+        pack (DataPack): The knowledge base used to verify sampled hits
+        query (str): The search query
+        top_k (int): Number of results requested
+        embedding (np.ndarray, optional): The query's embedding, if already encoded
+        
+    Returns:
+        Optional[SearchResults]: The cached results, or None on a miss
+    """
+    cache = _get_semantic_cache(pack)
+    if embedding is None:
+        embedding = _encode_queries(pack, [query])[0]
+    match = cache.lookup(embedding, top_k)
+    monitor.record_semantic_cache(hit=match is not None)
+    
+    if match is None:
+        return None
+    
+    cached_query, results, similarity = match
+    log_routine(logger, "Semantic cache hit for query: '%.50s' (similar to '%.50s', %.3f)",
+                query, cached_query, similarity)
+    
+    if random.random() < SEMANTIC_CACHE_VERIFY_RATE:
+        # Also runs inside the retried coalesced batch, so not retried here;
+        # a failed check leaves the hit unverified rather than failing the search
+        try:
+            actual = _search_once(pack, query, top_k)
+        except Exception as e:
+            logger.warning(f"Semantic cache verification failed: {e}")
+            actual = results
+        if actual.ids[:1].tolist() != results.ids[:1].tolist():
+            logger.info(f"Semantic cache false hit for query: '{query[:50]}...'")
+            monitor.record_semantic_false_hit()
+            cache.discard(cached_query, top_k)
+            return None
+    
+    return results.with_pack(pack)
+
+def _persistent_scope(pack: DataPack, rerank: bool = False) -> Optional[str]:
+    """Scope of a pack's persisted results; re-ranked results also depend on the cross-encoder."""
+    if pack.cache_scope is None:
+        return None
+    return f"{pack.cache_scope}|{CROSS_ENCODER_MODEL_ID}" if rerank else pack.cache_scope
+
+def _persistent_lookup(pack: DataPack, query: str, top_k: int, cache_variant: str,
+                       rerank: bool = False) -> Optional[SearchResults]:
+    """Reads a result persisted by an earlier run and puts it in the in-memory cache."""
+    scope = _persistent_scope(pack, rerank)
+    if scope is None:
+        return None
+    stored = get_persistent('search', scope, get_cache_key(query, top_k, cache_variant))
+    if stored is None:
+        return None
+    results = _from_persisted(stored)
+    set_cache(query, top_k, results, cache_variant, pack.result_scope)
+    return results.with_pack(pack)
+
+def _persistent_store(pack: DataPack, query: str, top_k: int, results: SearchResults,
+                      cache_variant: str, rerank: bool = False) -> None:
+    """Queues a result for the persistent tier, as (ids, scores) arrays."""
+    scope = _persistent_scope(pack, rerank)
+    if scope is not None:
+        set_persistent('search', scope, get_cache_key(query, top_k, cache_variant),
+                       (results.ids, results.scores))
+
+def _from_persisted(stored) -> SearchResults:
+    """Rebuilds cached results (no pack) from persisted (ids, scores)."""
+    ids, scores = stored
+    return SearchResults(ids, scores)
+
+def _preload_persistent_cache(pack: DataPack) -> None:
+    """Warms the result and embedding caches with entries persisted by earlier runs."""
+    results = preload_cache(pack.cache_scope, decode=_from_persisted) if pack.cache_scope else 0
+    embeddings = preload_embeddings()
+    if results or embeddings:
+        print(f"✅ Preloaded {results} cached results and {embeddings} query embeddings.")
+
+def _register_shared_cache() -> None:
+    """Reports the cross-process result cache's stats, if enabled.
+    
+    Results are shared under their pack's result_scope, so workers only
+    exchange results of the same knowledge base version.
+    """
+    shared = get_shared_cache()
+    if shared is not None:
+        monitor.register_stats('shared_cache', shared)
+
+def _drop_cached_results(previous: Optional[DataPack], pack: DataPack) -> int:
+    """
+    Frees this process's cached results of a snapshot replaced by a hot reload.
+    
+    They can no longer be served anyway (their scope is the old snapshot's),
+    unless the new snapshot has the same content and so the same scope.
+    """
+    if previous is None or previous.result_scope == pack.result_scope:
+        return 0
+    return clear_cache(previous.result_scope)
+
+def _semantic_cache_add(pack: DataPack, query: str, top_k: int, results: SearchResults) -> None:
+    """Stores a search result in the semantic cache under the query's embedding."""
+    embedding = get_cached_embedding(query)
+    if embedding is None:
+        embedding = _encode_queries(pack, [query])[0]
+    _get_semantic_cache(pack).add(query, embedding, top_k, results.with_pack(None))
+
+def _to_results(pack: DataPack, distances_row: np.ndarray, indices_row: np.ndarray) -> SearchResults:
+    """
+    Turns one row of FAISS output into structured results.
+    
+    Args:
+        pack (DataPack): The knowledge base that was searched
+        distances_row (np.ndarray): Distances returned for a single query
+        indices_row (np.ndarray): Chunk ids returned for a single query
+        
+    Returns:
+        SearchResults: The valid chunk ids with their relevance scores
+    """
+    valid = (indices_row >= 0) & (indices_row < len(pack.text_data))
+    if not valid.any():
+        logger.warning("No valid results found in knowledge base")
+    return SearchResults(indices_row[valid], _to_relevance(pack, distances_row[valid]), pack)
+
+def _to_relevance(pack: DataPack, distances_row: np.ndarray) -> np.ndarray:
+    """
+    Converts raw FAISS scores into relevance values for the loaded index.
+    
+    Inner-product indexes over normalized vectors already return cosine
+    similarity; L2 indexes return distances, where smaller is better.
+    """
+    if pack.manifest is not None and pack.manifest['metric'] == METRIC_INNER_PRODUCT:
+        return distances_row
+    return 1 - distances_row
+
+def _to_strings(results: SearchResults) -> List[str]:
+    """Formats structured results for callers that expect annotated text chunks."""
+    if results.rate_limited:
+        return [RATE_LIMIT_MESSAGE]
+    return results.format()
+
 # --- Self-test block ---
 if __name__ == '__main__':
     print("--- Running Knowledge Base Search Self-Test ---")
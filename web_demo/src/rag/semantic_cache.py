@@ -0,0 +1,114 @@
+# --- src/rag/semantic_cache.py ---
+"""
+Semantic near-duplicate cache for search results.
+
+Keeps a small FAISS inner-product index over the (L2-normalized) embeddings of
+recently answered queries. A new query whose embedding has cosine similarity
+above the configured threshold with a cached query, for the same top_k, is
+served the stored SearchResults, so trivial rephrasings skip the index search.
+Results are stored detached from their pack (see SearchResults.with_pack).
+"""
+import time
+import threading
+import logging
+from typing import Dict, Optional, Tuple
+
+import faiss
+import numpy as np
+
+from .results import SearchResults
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """Bounded, TTL-aware cache of search results keyed on query embeddings."""
+
+    def __init__(self, dimension: int, threshold: float = 0.92,
+                 max_entries: int = 1000, ttl: float = 3600):
+        """
+        Args:
+            dimension: Embedding dimension of the query encoder.
+            threshold: Minimum cosine similarity for a cached result to be served.
+            max_entries: Maximum number of cached queries; the oldest is evicted first.
+            ttl: Time-to-live of an entry in seconds.
+        """
+        self.dimension = dimension
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._index = faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+        # id -> (query, top_k, results, timestamp); dict keeps insertion order
+        self._entries: Dict[int, Tuple[str, int, SearchResults, float]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        vector = np.array(embedding, dtype=np.float32).reshape(1, -1)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def lookup(self, embedding: np.ndarray, top_k: int,
+               neighbours: int = 4) -> Optional[Tuple[str, SearchResults, float]]:
+        """
+        Find a cached result for a semantically equivalent query.
+
+        Args:
+            embedding: Query embedding (normalized internally).
+            top_k: The top_k the caller asked for; only entries with the same top_k match.
+            neighbours: Number of nearest cached queries to inspect.
+
+        Returns:
+            (cached_query, results, similarity) for the best match, or None.
+        """
+        with self._lock:
+            if not self._entries:
+                return None
+            similarities, ids = self._index.search(
+                self._normalize(embedding), min(neighbours, len(self._entries))
+            )
+            now = time.time()
+            for similarity, entry_id in zip(similarities[0], ids[0]):
+                if similarity < self.threshold:
+                    break  # Results are sorted by similarity
+                entry = self._entries.get(int(entry_id))
+                if entry is None:
+                    continue
+                cached_query, cached_top_k, results, timestamp = entry
+                if now - timestamp >= self.ttl:
+                    self._remove(int(entry_id))
+                    continue
+                if cached_top_k == top_k:
+                    return cached_query, results, float(similarity)
+        return None
+
+    def add(self, query: str, embedding: np.ndarray, top_k: int, results: SearchResults) -> None:
+        """Store a query's ranked results under its embedding."""
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._index.add_with_ids(self._normalize(embedding), np.array([entry_id], dtype=np.int64))
+            self._entries[entry_id] = (query, top_k, results, time.time())
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def discard(self, query: str, top_k: int) -> None:
+        """Remove the entries stored for an exact query, e.g. after a false hit."""
+        with self._lock:
+            stale = [i for i, (q, k, _, _) in self._entries.items() if q == query and k == top_k]
+            for entry_id in stale:
+                self._remove(entry_id)
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        with self._lock:
+            self._index.reset()
+            self._entries.clear()
+
+    def _remove(self, entry_id: int) -> None:
+        self._index.remove_ids(np.array([entry_id], dtype=np.int64))
+        self._entries.pop(entry_id, None)
@@ -0,0 +1,107 @@
+# --- src/rag/text_store.py ---
+"""
+Memory-mapped storage for knowledge base text chunks.
+
+The chunks are stored as one UTF-8 blob plus an int64 offsets array with
+``len(chunks) + 1`` entries, so chunk ``i`` is ``blob[offsets[i]:offsets[i + 1]]``.
+Both files are opened with ``np.memmap``/``np.load(mmap_mode='r')``, which lets
+several worker processes share the OS page cache, and a chunk is only decoded
+when it is actually returned.
+"""
+import os
+import pickle
+import logging
+from typing import Iterator, List, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# File suffixes used next to the text pickle / FAISS index
+BLOB_SUFFIX = ".bin"
+OFFSETS_SUFFIX = ".offsets.npy"
+
+
+def text_store_paths(base_path: str) -> tuple:
+    """Return the (blob, offsets) file paths for a text store base path."""
+    root, _ = os.path.splitext(base_path)
+    return root + BLOB_SUFFIX, root + OFFSETS_SUFFIX
+
+
+def write_text_store(texts: Sequence[str], base_path: str) -> None:
+    """
+    Write text chunks as a UTF-8 blob plus an offsets array.
+
+    Args:
+        texts (Sequence[str]): The text chunks, in index order.
+        base_path (str): Path whose extension is replaced by the store suffixes.
+    """
+    blob_path, offsets_path = text_store_paths(base_path)
+    offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+
+    with open(blob_path, 'wb') as f:
+        position = 0
+        for i, text in enumerate(texts):
+            encoded = text.encode('utf-8')
+            f.write(encoded)
+            position += len(encoded)
+            offsets[i + 1] = position
+
+    np.save(offsets_path, offsets)
+    logger.info("Text store written: %d chunks, %d bytes", len(texts), int(offsets[-1]))
+
+
+class MappedTextStore:
+    """Read-only, lazily decoded view over a memory-mapped text store."""
+
+    def __init__(self, base_path: str):
+        blob_path, offsets_path = text_store_paths(base_path)
+        if not os.path.exists(blob_path) or not os.path.exists(offsets_path):
+            raise FileNotFoundError(
+                f"Text store not found at '{blob_path}' / '{offsets_path}'. "
+                "Run 'python -m src.rag.text_store <text.pkl>' to convert the pickle."
+            )
+        self.offsets = np.load(offsets_path, mmap_mode='r')
+        # np.memmap cannot map an empty file
+        if int(self.offsets[-1]) > 0:
+            self.blob = np.memmap(blob_path, dtype=np.uint8, mode='r')
+        else:
+            self.blob = np.zeros(0, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(f"Chunk index {i} out of range")
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self.blob[start:end].tobytes().decode('utf-8')
+
+    def __iter__(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def nbytes(self) -> int:
+        """Size of the mapped text blob in bytes."""
+        return int(self.offsets[-1])
+
+
+# --- Conversion helper ---
+if __name__ == '__main__':
+    import sys
+
+    if len(sys.argv) != 2:
+        print("Usage: python -m src.rag.text_store <knowledge_base_text.pkl>")
+        sys.exit(1)
+
+    pickle_path = sys.argv[1]
+    with open(pickle_path, 'rb') as f:
+        chunks: List[str] = pickle.load(f)
+    write_text_store(chunks, pickle_path)
+
+    store = MappedTextStore(pickle_path)
+    assert len(store) == len(chunks), "Chunk count mismatch after conversion"
+    assert all(store[i] == chunks[i] for i in range(len(chunks))), "Chunk text mismatch"
+    print(f"✅ Converted {len(chunks)} chunks to {text_store_paths(pickle_path)[0]}")
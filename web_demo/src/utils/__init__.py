@@ -3,7 +3,20 @@ Utility functions for the KrishiSahayak application.
 
 This package contains various utility functions used throughout the application,
 including audio processing and other helper functions.
+
+The audio helpers are imported lazily (on first attribute access), so the
+light utilities (caches, rate limiting, resilience, logging) don't pull in
+Whisper, torch and gTTS.
 """
-from .audio_processing import transcribe_audio, text_to_speech, load_whisper_model
+import importlib
+
+_AUDIO_EXPORTS = ('transcribe_audio', 'atranscribe_audio', 'text_to_speech', 'load_whisper_model')
+
+
+def __getattr__(name):
+    if name in _AUDIO_EXPORTS:
+        return getattr(importlib.import_module('.audio_processing', __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
-__all__ = ['transcribe_audio', 'text_to_speech', 'load_whisper_model']
+__all__ = list(_AUDIO_EXPORTS)
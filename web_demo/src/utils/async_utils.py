@@ -0,0 +1,62 @@
+"""
+Bounded executors for running blocking pipeline work from asyncio code.
+
+Each kind of work gets its own small thread pool, so a burst of slow LLM calls
+cannot starve cheap searches, and the event loop itself never blocks. Work
+runs in a copy of the caller's context, so context variables such as the
+request deadline (see utils/resilience.py) carry over to the worker thread.
+"""
+import asyncio
+import functools
+import threading
+import contextvars
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+# Max concurrent workers per executor. llama.cpp and Whisper models are not
+# safe to call concurrently, so they get a single worker each.
+EXECUTOR_WORKERS = {
+    'search': 4,
+    'llm': 1,
+    'audio': 1,
+    # Knowledge base hot reloads, one at a time
+    'reload': 1,
+    # Cross-encoder re-ranking; one forward pass at a time
+    'rerank': 1,
+}
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(name: str) -> ThreadPoolExecutor:
+    """Return the named executor, creating it on first use."""
+    with _executors_lock:
+        executor = _executors.get(name)
+        if executor is None:
+            executor = ThreadPoolExecutor(
+                max_workers=EXECUTOR_WORKERS.get(name, 1),
+                thread_name_prefix=f"krishi-{name}"
+            )
+            _executors[name] = executor
+        return executor
+
+
+async def run_in_executor(name: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking function on the named executor and await its result."""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        get_executor(name), functools.partial(context.run, func, *args, **kwargs)
+    )
+
+
+def shutdown_executors(wait: bool = True) -> None:
+    """Shut down all executors, e.g. from an application shutdown hook."""
+    with _executors_lock:
+        for executor in _executors.values():
+            executor.shutdown(wait=wait)
+        _executors.clear()
@@ -6,6 +6,10 @@ from gtts import gTTS
 import os
 import torch
 import time  # <--- FIXED: Added the missing import
+import threading
+import numpy as np
+
+from .async_utils import run_in_executor
 
 # --- Configuration ---
 WHISPER_MODEL_SIZE = "base"
@@ -13,20 +17,29 @@ TTS_OUTPUT_DIR = "web_demo/audio_outputs"
 
 # --- Model Loading (with caching) ---
 whisper_model = None
+# Prevents a request and the startup loader from loading the model twice
+_load_lock = threading.Lock()
 
 def load_whisper_model():
     """Loads the Whisper model into memory."""
     global whisper_model
+    with _load_lock:
+        if whisper_model is None:
+            print("Loading Whisper model (base)...")
+            try:
+                device = "cuda" if torch.cuda.is_available() else "cpu"
+                print(f"Using device: {device}")
+                whisper_model = whisper.load_model(WHISPER_MODEL_SIZE, device=device)
+                print("Whisper model loaded successfully.")
+            except Exception as e:
+                print(f"Error loading Whisper model: {e}")
+                raise
+
+def warmup_whisper():
+    """Transcribes one second of silence so the first real request skips setup costs."""
     if whisper_model is None:
-        print("Loading Whisper model (base)...")
-        try:
-            device = "cuda" if torch.cuda.is_available() else "cpu"
-            print(f"Using device: {device}")
-            whisper_model = whisper.load_model(WHISPER_MODEL_SIZE, device=device)
-            print("Whisper model loaded successfully.")
-        except Exception as e:
-            print(f"Error loading Whisper model: {e}")
-            raise
+        load_whisper_model()
+    whisper_model.transcribe(np.zeros(16000, dtype=np.float32))
 
 def transcribe_audio(audio_file_path: str) -> str:
     """Transcribes an audio file to text using Whisper."""
@@ -44,6 +57,10 @@ def transcribe_audio(audio_file_path: str) -> str:
         print(f"An error occurred during transcription: {e}")
         return "Sorry, could not understand the audio."
 
+async def atranscribe_audio(audio_file_path: str) -> str:
+    """Async variant of transcribe_audio, run on the single-worker 'audio' executor."""
+    return await run_in_executor("audio", transcribe_audio, audio_file_path)
+
 def text_to_speech(text: str, lang: str = 'hi', slow: bool = False) -> str:
     """Converts text to speech and saves it as an MP3 file."""
     if not text:
@@ -0,0 +1,187 @@
+"""
+Thread-safe, bounded LRU cache with TTL expiry.
+
+Keys are spread over independently locked stripes, so concurrent workers
+rarely wait on each other. Each stripe keeps two ordered dicts:
+
+- entries, in least-recently-used order, for LRU eviction;
+- expiry, in insertion order. With one TTL for all entries that is also
+  expiry order, so expired entries are always at the front and are dropped
+  in amortized O(1) per operation instead of by a full scan. Entries set
+  with a shorter TTL of their own (e.g. copied from another cache tier with
+  part of their lifetime used up) are also checked when read.
+
+Limits (entry count and approximate bytes) are split evenly across stripes.
+"""
+import sys
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate memory held by a cached value, in bytes."""
+    nbytes = getattr(value, 'nbytes', None)
+    if isinstance(nbytes, int):
+        return nbytes
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class _Stripe:
+    """One independently locked shard of the cache."""
+
+    __slots__ = ('lock', 'entries', 'expiry', 'bytes', 'hits', 'misses', 'evictions', 'expirations')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # key -> (value, expires_at, size), least recently used first
+        self.entries: "OrderedDict[Hashable, Tuple[Any, float, int]]" = OrderedDict()
+        # key -> expires_at, oldest first
+        self.expiry: "OrderedDict[Hashable, float]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+
+class BoundedTTLCache:
+    """LRU + TTL cache bounded by entry count and approximate byte size."""
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024,
+                 ttl: float = 3600, stripes: int = 16,
+                 size_fn: Callable[[Any], int] = estimate_size):
+        """
+        Args:
+            max_entries: Max entries across all stripes.
+            max_bytes: Max approximate size of keys and values across all stripes.
+            ttl: Seconds an entry stays valid after it was set.
+            stripes: Number of independently locked shards.
+            size_fn: Estimates a value's size in bytes.
+        """
+        self.ttl = ttl
+        self.size_fn = size_fn
+        self._stripes = [_Stripe() for _ in range(stripes)]
+        self._max_entries = max(1, max_entries // stripes)
+        self._max_bytes = max(1, max_bytes // stripes)
+
+    def _stripe(self, key: Hashable) -> _Stripe:
+        return self._stripes[hash(key) % len(self._stripes)]
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired."""
+        stripe = self._stripe(key)
+        now = time.time()
+        with stripe.lock:
+            self._expire(stripe, now)
+            entry = stripe.entries.get(key)
+            if entry is not None and entry[1] <= now:
+                self._remove(stripe, key)
+                stripe.expirations += 1
+                entry = None
+            if entry is None:
+                stripe.misses += 1
+                return None
+            stripe.entries.move_to_end(key)
+            stripe.hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """
+        Store a value, evicting least recently used entries to stay within limits.
+
+        Args:
+            ttl: Seconds this entry stays valid, at most the cache's TTL.
+                Defaults to the cache's TTL.
+        """
+        size = self.size_fn(value) + sys.getsizeof(key)
+        stripe = self._stripe(key)
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else min(ttl, self.ttl))
+        with stripe.lock:
+            self._remove(stripe, key)
+            stripe.entries[key] = (value, expires_at, size)
+            stripe.expiry[key] = expires_at
+            stripe.bytes += size
+            self._expire(stripe, now)
+            while stripe.entries and (
+                len(stripe.entries) > self._max_entries or stripe.bytes > self._max_bytes
+            ):
+                self._remove(stripe, next(iter(stripe.entries)))
+                stripe.evictions += 1
+
+    def delete(self, key: Hashable) -> bool:
+        """Remove a key. Returns False if it was not cached."""
+        stripe = self._stripe(key)
+        with stripe.lock:
+            return self._remove(stripe, key)
+
+    def clear(self, match: Optional[Callable[[Hashable], bool]] = None) -> int:
+        """Remove all entries, or those whose key matches. Returns the number removed."""
+        removed = 0
+        for stripe in self._stripes:
+            with stripe.lock:
+                keys = [k for k in stripe.entries if match is None or match(k)]
+                for key in keys:
+                    self._remove(stripe, key)
+                removed += len(keys)
+        return removed
+
+    def expire(self) -> int:
+        """Drop expired entries in every stripe. Returns the number dropped."""
+        now = time.time()
+        dropped = 0
+        for stripe in self._stripes:
+            with stripe.lock:
+                before = stripe.expirations
+                self._expire(stripe, now)
+                dropped += stripe.expirations - before
+        return dropped
+
+    def __len__(self) -> int:
+        return sum(len(stripe.entries) for stripe in self._stripes)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction/expiration counts and current size."""
+        totals = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'entries': 0, 'bytes': 0}
+        for stripe in self._stripes:
+            with stripe.lock:
+                totals['hits'] += stripe.hits
+                totals['misses'] += stripe.misses
+                totals['evictions'] += stripe.evictions
+                totals['expirations'] += stripe.expirations
+                totals['entries'] += len(stripe.entries)
+                totals['bytes'] += stripe.bytes
+        lookups = totals['hits'] + totals['misses']
+        totals['hit_rate'] = totals['hits'] / lookups if lookups else 0.0
+        totals['max_entries'] = self._max_entries * len(self._stripes)
+        totals['max_bytes'] = self._max_bytes * len(self._stripes)
+        return totals
+
+    def reset_stats(self) -> None:
+        """Zero the counters, keeping the cached entries."""
+        for stripe in self._stripes:
+            with stripe.lock:
+                stripe.hits = stripe.misses = stripe.evictions = stripe.expirations = 0
+
+    @staticmethod
+    def _remove(stripe: _Stripe, key: Hashable) -> bool:
+        """Remove a key from a stripe. Caller holds the stripe lock."""
+        entry = stripe.entries.pop(key, None)
+        if entry is None:
+            return False
+        stripe.expiry.pop(key, None)
+        stripe.bytes -= entry[2]
+        return True
+
+    def _expire(self, stripe: _Stripe, now: float) -> None:
+        """Drop expired entries from the front of the expiry order. Caller holds the stripe lock."""
+        while stripe.expiry:
+            key, expires_at = next(iter(stripe.expiry.items()))
+            if expires_at > now:
+                break
+            self._remove(stripe, key)
+            stripe.expirations += 1
@@ -1,103 +1,327 @@
 """
 Utility functions for caching and rate limiting.
 """
-import time
-from functools import wraps
-from typing import Any, Callable, Dict, List, Optional, Tuple
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Optional
 import logging
 from datetime import datetime, timedelta
 
+import numpy as np
+
+from .bounded_cache import BoundedTTLCache
+from .rate_limiter import MemoryRateLimiter, SQLiteRateLimiter
+from .persistent_cache import PersistentCache
+from .shared_cache import SharedResultCache
+from .resilience import CircuitBreaker, RetryPolicy, is_transient_error
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# In-memory cache for storing search results
-_search_cache: Dict[str, Tuple[Any, float]] = {}
-# Track user requests for rate limiting
-_user_requests: Dict[str, List[float]] = {}
+# Bounded LRU cache of query embeddings, shared by every retrieval variant
+_embedding_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+_embedding_cache_lock = threading.Lock()
 
 # Configuration
 CACHE_TTL = 3600  # 1 hour in seconds
 RATE_LIMIT = 10   # Max requests per minute per user
 RATE_WINDOW = 60   # Time window in seconds
+# Per-route limits: route -> (max requests, window in seconds) per user
+ROUTE_RATE_LIMITS = {
+    'search': (RATE_LIMIT, RATE_WINDOW),
+    'diagnosis': (3, RATE_WINDOW),  # Full diagnosis runs the LLM, far costlier than a search
+}
+# 'memory' limits each process on its own; 'sqlite' shares limits between
+# worker processes on one host through RATE_LIMIT_DB_PATH
+RATE_LIMIT_BACKEND = 'memory'
+RATE_LIMIT_DB_PATH = os.path.join(tempfile.gettempdir(), 'krishi_rate_limits.sqlite3')
+RATE_LIMIT_MAX_USERS = 100000  # Max per-user states kept in memory
+EMBEDDING_CACHE_SIZE = 2048  # Max query embeddings kept (~1.5 KB each for MiniLM)
+CACHE_MAX_ENTRIES = 10000    # Max cached search results
+CACHE_MAX_BYTES = 32 * 1024 * 1024  # Max approximate size of cached search results
+CACHE_STRIPES = 16           # Independently locked shards, so concurrent workers rarely contend
+# On-disk tier under the in-memory caches, so restarts and deploys start warm
+PERSISTENT_CACHE_ENABLED = True
+PERSISTENT_CACHE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))),
+    'data', 'cache', 'rag_cache.sqlite3'
+)
+PERSISTENT_CACHE_MAX_AGE = 7 * 24 * 3600  # Entries older than a week are deleted on startup
+PERSISTENT_PRELOAD_LIMIT = 2000           # Most recent entries per cache loaded at startup
+# Result cache shared by the worker processes on one host, under each process's
+# in-memory cache. Enable when running several workers of app.py.
+SHARED_CACHE_ENABLED = False
+SHARED_CACHE_PATH = os.path.join(os.path.dirname(PERSISTENT_CACHE_PATH), 'shared_results.sqlite3')
 
-def get_cache_key(query: str, top_k: int) -> str:
-    """Generate a cache key from query and parameters."""
-    return f"{query.lower().strip()}:{top_k}"
-
-def get_cache(query: str, top_k: int) -> Optional[List[str]]:
-    """Retrieve a cached search result if it exists and is not expired."""
-    cache_key = get_cache_key(query, top_k)
-    if cache_key in _search_cache:
-        result, timestamp = _search_cache[cache_key]
-        if time.time() - timestamp < CACHE_TTL:
-            logger.debug(f"Cache hit for query: {query[:50]}...")
-            return result
-        logger.debug(f"Cache expired for query: {query[:50]}...")
-        del _search_cache[cache_key]
-    return None
+# Rate limiter, created on first use
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+# Persistent cache tier, opened on first use (False if it could not be opened)
+_persistent_cache = None
+_persistent_cache_lock = threading.Lock()
+# Shared result cache, opened on first use (False if it could not be opened)
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+# Names the embedding model the cached embeddings come from; embeddings are
+# only persisted once it is set
+_embedding_scope: Optional[str] = None
 
-def set_cache(query: str, top_k: int, result: List[str]) -> None:
-    """Store a search result in the cache."""
-    cache_key = get_cache_key(query, top_k)
-    _search_cache[cache_key] = (result, time.time())
-    logger.debug(f"Cached result for query: {query[:50]}...")
+# In-memory LRU + TTL cache for storing search results, keyed by (scope, cache key)
+_search_cache = BoundedTTLCache(
+    max_entries=CACHE_MAX_ENTRIES, max_bytes=CACHE_MAX_BYTES,
+    ttl=CACHE_TTL, stripes=CACHE_STRIPES
+)
+
+def get_cache_key(query: str, top_k: int, variant: str = "") -> str:
+    """Generate a cache key from query and parameters.
+    
+    ``variant`` distinguishes retrieval modes that return different results
+    for the same query and top_k (e.g. dense vs hybrid).
+    """
+    key = f"{query.lower().strip()}:{top_k}"
+    return f"{key}:{variant}" if variant else key
+
+def get_cache(query: str, top_k: int, variant: str = "", scope: str = "") -> Optional[Any]:
+    """Retrieve a cached search result if it exists and is not expired.
+    
+    ``scope`` names the knowledge base version the result must come from;
+    results of other versions never match. Misses in this process's cache fall
+    through to the shared cache, if enabled.
+    """
+    cache_key = get_cache_key(query, top_k, variant)
+    result = _search_cache.get((scope, cache_key))
+    if result is None:
+        shared = get_shared_cache()
+        if shared is not None and scope:
+            entry = shared.get_with_ttl(scope, cache_key)
+            if entry is not None:
+                # Expires here when it does in the shared tier, not a full TTL later
+                result, remaining_ttl = entry
+                _search_cache.set((scope, cache_key), result, ttl=remaining_ttl)
+    if result is not None:
+        logger.debug("Cache hit for query: %.50s", query)
+    return result
+
+def set_cache(query: str, top_k: int, result: Any, variant: str = "", scope: str = "") -> None:
+    """Store a search result of a knowledge base version (scope) in the cache.
+    
+    Least recently used entries are evicted when full.
+    """
+    cache_key = get_cache_key(query, top_k, variant)
+    _search_cache.set((scope, cache_key), result)
+    shared = get_shared_cache()
+    if shared is not None and scope:
+        shared.set(scope, cache_key, result)
+    logger.debug("Cached result for query: %.50s", query)
 
 def clear_expired_cache() -> None:
     """Remove expired cache entries."""
-    current_time = time.time()
-    expired_keys = [k for k, (_, t) in _search_cache.items() 
-                   if current_time - t >= CACHE_TTL]
-    for key in expired_keys:
-        del _search_cache[key]
-    if expired_keys:
-        logger.info(f"Cleared {len(expired_keys)} expired cache entries")
-
-def rate_limit(user_id: str = "default") -> bool:
+    expired = _search_cache.expire()
+    if expired:
+        logger.info(f"Cleared {expired} expired cache entries")
+
+def clear_cache(scope: Optional[str] = None) -> int:
+    """Remove cached search results, all of them or those of one scope.
+    
+    Clearing every scope also empties the shared cache. Clearing one scope
+    only frees this process's memory: other workers may still serve that
+    version, and its shared entries expire with the TTL.
+    
+    Returns:
+        Number of entries removed from this process's cache
     """
-    Check if a user has exceeded the rate limit.
-    Returns True if the request is allowed, False if rate limited.
+    if scope is None:
+        removed = _search_cache.clear()
+        shared = get_shared_cache()
+        if shared is not None:
+            shared.clear()
+    else:
+        removed = _search_cache.clear(lambda key: key[0] == scope)
+    if removed:
+        logger.info(f"Cleared {removed} cache entries")
+    return removed
+
+def get_search_cache() -> BoundedTTLCache:
+    """This process's search result cache (for stats reporting)."""
+    return _search_cache
+
+def get_shared_cache() -> Optional[SharedResultCache]:
+    """The cross-process result cache, opened on first use; None if disabled or unavailable."""
+    global _shared_cache
+    if not SHARED_CACHE_ENABLED:
+        return None
+    if _shared_cache is None:
+        with _shared_cache_lock:
+            if _shared_cache is None:
+                try:
+                    _shared_cache = SharedResultCache(SHARED_CACHE_PATH, ttl=CACHE_TTL)
+                    logger.info(f"Shared result cache opened at {SHARED_CACHE_PATH}")
+                except Exception as e:
+                    logger.error(f"Could not open shared result cache, continuing without it: {e}")
+                    _shared_cache = False
+    return _shared_cache or None
+
+def get_persistent_cache() -> Optional[PersistentCache]:
+    """The persistent cache tier, opened on first use; None if disabled or unavailable."""
+    global _persistent_cache
+    if not PERSISTENT_CACHE_ENABLED:
+        return None
+    if _persistent_cache is None:
+        with _persistent_cache_lock:
+            if _persistent_cache is None:
+                try:
+                    _persistent_cache = PersistentCache(PERSISTENT_CACHE_PATH, max_age=PERSISTENT_CACHE_MAX_AGE)
+                    logger.info(f"Persistent cache opened at {PERSISTENT_CACHE_PATH}")
+                except Exception as e:
+                    logger.error(f"Could not open persistent cache, continuing without it: {e}")
+                    _persistent_cache = False
+    return _persistent_cache or None
+
+def get_persistent(namespace: str, scope: str, key: str,
+                   max_age: Optional[float] = None) -> Optional[Any]:
+    """Read a value from the persistent tier, or None if missing, older than max_age seconds or unavailable."""
+    store = get_persistent_cache()
+    return store.get(namespace, scope, key, max_age) if store is not None else None
+
+def set_persistent(namespace: str, scope: str, key: str, value: Any) -> None:
+    """Queue a value for the persistent tier (written in the background)."""
+    store = get_persistent_cache()
+    if store is not None:
+        store.put(namespace, scope, key, value)
+
+def preload_cache(scope: str, decode: Optional[Callable[[Any], Any]] = None,
+                  limit: int = PERSISTENT_PRELOAD_LIMIT) -> int:
+    """Load the most recently persisted search results of a scope into the result cache.
+    
+    Args:
+        scope: The knowledge base scope the results were persisted under
+        decode: Turns a persisted value back into a cached result
+        limit: Max results loaded
+        
+    Returns:
+        Number of results loaded
+    """
+    store = get_persistent_cache()
+    if store is None:
+        return 0
+    entries = store.preload('search', scope, min(limit, CACHE_MAX_ENTRIES))
+    for key, value in entries:
+        _search_cache.set((scope, key), decode(value) if decode is not None else value)
+    return len(entries)
+
+def normalize_query(query: str) -> str:
+    """Normalize query text for embedding lookups (case and whitespace)."""
+    return re.sub(r"\s+", " ", query.lower().strip())
+
+def get_cached_embedding(query: str) -> Optional[np.ndarray]:
+    """Return the cached float32 embedding for a query, or None on a miss.
+    
+    Misses in memory fall through to the persistent tier.
     """
-    current_time = time.time()
+    key = normalize_query(query)
+    with _embedding_cache_lock:
+        embedding = _embedding_cache.get(key)
+        if embedding is not None:
+            _embedding_cache.move_to_end(key)
+            return embedding
+    if _embedding_scope is not None:
+        stored = get_persistent('embedding', _embedding_scope, key)
+        if stored is not None:
+            return _store_embedding(key, stored)
+    return None
+
+def set_cached_embedding(query: str, embedding: np.ndarray) -> None:
+    """Store a query embedding, evicting the least recently used entry when full."""
+    key = normalize_query(query)
+    value = _store_embedding(key, embedding)
+    if _embedding_scope is not None:
+        set_persistent('embedding', _embedding_scope, key, value)
+
+def _store_embedding(key: str, embedding: np.ndarray) -> np.ndarray:
+    """Put an embedding in the in-memory LRU and return the stored read-only copy."""
+    value = np.array(embedding, dtype=np.float32)
+    value.setflags(write=False)  # Shared between callers, must not be mutated
+    with _embedding_cache_lock:
+        _embedding_cache[key] = value
+        _embedding_cache.move_to_end(key)
+        while len(_embedding_cache) > EMBEDDING_CACHE_SIZE:
+            _embedding_cache.popitem(last=False)
+    return value
+
+def set_embedding_scope(scope: str) -> None:
+    """Name the model cached embeddings come from (e.g. backend and model id).
     
-    # Remove old requests outside the rate limit window
-    if user_id in _user_requests:
-        _user_requests[user_id] = [
-            t for t in _user_requests[user_id] 
-            if current_time - t < RATE_WINDOW
-        ]
+    Persisted embeddings are only reused by a model with the same scope.
+    """
+    global _embedding_scope
+    _embedding_scope = scope
+
+def preload_embeddings(limit: int = PERSISTENT_PRELOAD_LIMIT) -> int:
+    """Load the most recently persisted embeddings for the current scope into memory.
     
-    # Check rate limit
-    request_count = len(_user_requests.get(user_id, []))
-    if request_count >= RATE_LIMIT:
-        logger.warning(f"Rate limit exceeded for user {user_id}")
-        return False
+    Returns:
+        Number of embeddings loaded
+    """
+    store = get_persistent_cache()
+    if store is None or _embedding_scope is None:
+        return 0
+    entries = store.preload('embedding', _embedding_scope, min(limit, EMBEDDING_CACHE_SIZE))
+    for key, embedding in entries:
+        _store_embedding(key, embedding)
+    return len(entries)
+
+def clear_embedding_cache() -> None:
+    """Drop all cached query embeddings."""
+    with _embedding_cache_lock:
+        _embedding_cache.clear()
+
+def get_rate_limiter():
+    """The shared rate limiter for RATE_LIMIT_BACKEND, created on first use."""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            if RATE_LIMIT_BACKEND == 'sqlite':
+                _rate_limiter = SQLiteRateLimiter(ROUTE_RATE_LIMITS, RATE_LIMIT_DB_PATH)
+            else:
+                _rate_limiter = MemoryRateLimiter(ROUTE_RATE_LIMITS, max_keys=RATE_LIMIT_MAX_USERS)
+    return _rate_limiter
+
+def rate_limit(user_id: str = "default", route: str = "search") -> bool:
+    """
+    Check if a user has exceeded the rate limit for a route.
+    Returns True if the request is allowed, False if rate limited.
+    """
+    if get_rate_limiter().allow(user_id, route):
+        return True
+    logger.warning(f"Rate limit exceeded for user {user_id} on route {route}")
+    return False
+
+def with_retry(max_retries: int = 3, backoff_factor: float = 0.5, name: Optional[str] = None,
+               breaker: Optional[CircuitBreaker] = None,
+               is_transient: Callable[[BaseException], bool] = is_transient_error) -> RetryPolicy:
+    """Decorator for adding retry logic to functions.
     
-    # Record this request
-    if user_id not in _user_requests:
-        _user_requests[user_id] = []
-    _user_requests[user_id].append(current_time)
+    Only transient errors (see utils/resilience.py) are retried, after a
+    jittered delay of at most backoff_factor * 2**attempt seconds, and never
+    past the request deadline. Other errors are raised at once.
     
-    return True
-
-def with_retry(max_retries: int = 3, backoff_factor: float = 0.5):
-    """Decorator for adding retry logic to functions."""
-    def decorator(func):
-        @wraps(func)
-        def wrapper(*args, **kwargs):
-            last_exception = None
-            for attempt in range(max_retries):
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    last_exception = e
-                    wait_time = backoff_factor * (2 ** attempt)  # Exponential backoff
-                    logger.warning(
-                        f"Attempt {attempt + 1} failed: {str(e)}. "
-                        f"Retrying in {wait_time:.2f}s..."
-                    )
-                    time.sleep(wait_time)
-            logger.error(f"All {max_retries} attempts failed")
-            raise last_exception
-        return wrapper
-    return decorator
+    Args:
+        max_retries: Total attempts, including the first
+        backoff_factor: Backoff cap before the first retry, in seconds
+        name: Used in logs; defaults to "retry"
+        breaker: Optional circuit breaker guarding the wrapped calls
+        is_transient: Decides whether a failure is retried
+        
+    Returns:
+        RetryPolicy: The decorator, which also exposes retry stats()
+    """
+    return RetryPolicy(
+        name or "retry", max_attempts=max_retries, base_delay=backoff_factor,
+        max_delay=backoff_factor * 2 ** max(max_retries - 2, 0),
+        is_transient=is_transient, breaker=breaker
+    )
@@ -0,0 +1,213 @@
+"""
+Non-blocking logging for the request path.
+
+Log records of this package's loggers are put on an in-memory queue by the
+calling thread and written by a single background thread
+(logging.handlers.QueueListener) to a size-rotated file and the console, so a
+search never waits on disk I/O. Records keep their message template and
+arguments until the writer thread formats them.
+
+On a fast local disk a queued record costs about as much as a direct write
+(the writer thread competes for the GIL); the queue pays off when writes are
+slow or stall (network volumes, busy disks, rotation), which then no longer
+hold up requests. Most of the saving on the request path comes from sampling
+routine lines (see benchmark_logging).
+
+Routine per-request lines (search started, cache hit, ...) go through
+log_routine(), which keeps only the logger's sample rate of them and decides
+before a record is even created; warnings, errors and other lines are
+unaffected.
+"""
+import os
+import time
+import queue
+import atexit
+import random
+import logging
+import tempfile
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Optional
+
+# Configuration
+# Top-level package whose loggers are routed through the queue ("src")
+LOG_PACKAGE = __name__.split('.')[0]
+LOG_FILE = 'rag_search.log'
+LOG_LEVEL = logging.INFO
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+LOG_MAX_BYTES = 10 * 1024 * 1024  # Rotate the log file at 10 MB
+LOG_BACKUP_COUNT = 5              # Rotated files kept (rag_search.log.1 ... .5)
+
+_listener: Optional[QueueListener] = None
+_listener_lock = threading.Lock()
+# Logger name -> fraction of routine lines kept (1.0 when not set)
+_sample_rates: Dict[str, float] = {}
+
+
+class _SlowFileHandler(logging.FileHandler):
+    """FileHandler whose writes take a fixed extra delay, like a slow or network disk."""
+
+    def __init__(self, filename: str, write_delay: float):
+        super().__init__(filename, encoding='utf-8')
+        self.write_delay = write_delay
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if self.write_delay:
+            time.sleep(self.write_delay)
+        super().emit(record)
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves formatting to the writer thread.
+
+    The stock handler merges the message and its arguments before enqueueing
+    (so records can cross process boundaries); within one process the record
+    can be queued as is.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def set_sample_rate(logger: logging.Logger, rate: float) -> None:
+    """Set the fraction of a logger's routine lines that log_routine keeps."""
+    _sample_rates[logger.name] = rate
+
+
+def log_routine(logger: logging.Logger, msg: str, *args) -> None:
+    """
+    Log a routine per-request INFO line, subject to the logger's sample rate.
+
+    Pass the message as a %-style template with arguments, like logger.info;
+    nothing is created or formatted for lines that are sampled out.
+    """
+    if not logger.isEnabledFor(logging.INFO):
+        return
+    rate = _sample_rates.get(logger.name, 1.0)
+    if rate >= 1.0 or random.random() < rate:
+        logger.info(msg, *args, stacklevel=2)
+
+
+def configure_logging(log_file: str = LOG_FILE, level: int = LOG_LEVEL,
+                      max_bytes: int = LOG_MAX_BYTES,
+                      backup_count: int = LOG_BACKUP_COUNT) -> QueueListener:
+    """
+    Route this package's logging through a queue to a background writer thread.
+
+    Gives the LOG_PACKAGE logger a LazyQueueHandler and stops its records
+    from propagating, so the root logger and other libraries' logging are
+    left as the application configured them. The writer thread writes to a
+    RotatingFileHandler and the console. Call it from the application entry
+    point; only the first call configures anything.
+
+    Returns:
+        QueueListener: The running writer, stopped automatically at exit.
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            return _listener
+
+        formatter = logging.Formatter(LOG_FORMAT)
+        file_handler = RotatingFileHandler(
+            log_file, maxBytes=max_bytes, backupCount=backup_count,
+            encoding='utf-8', delay=True
+        )
+        console_handler = logging.StreamHandler()
+        for handler in (file_handler, console_handler):
+            handler.setFormatter(formatter)
+
+        log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+        package_logger = logging.getLogger(LOG_PACKAGE)
+        package_logger.addHandler(LazyQueueHandler(log_queue))
+        package_logger.setLevel(level)
+        package_logger.propagate = False
+
+        _listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+        _listener.start()
+        atexit.register(shutdown_logging)
+        return _listener
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def benchmark_logging(iterations: int = 2000, sample_rate: float = 0.05,
+                      write_delay: float = 0.0) -> Dict[str, float]:
+    """
+    Measure the logging cost a request pays, in microseconds per request.
+
+    Each simulated request logs the five INFO lines of a search cache miss.
+    Compared setups:
+      - sync: FileHandler on the calling thread with f-string messages
+      - queue: LazyQueueHandler with lazy %-style arguments
+      - queue_sampled: as queue, through log_routine sampled at sample_rate
+
+    Args:
+        iterations: Simulated requests per setup.
+        sample_rate: Fraction of routine lines kept by queue_sampled.
+        write_delay: Extra seconds each file write takes, to simulate a slow
+            disk. With 0 (a fast local disk) sync and queue cost about the same.
+
+    Returns:
+        Dict with the mean cost per request for each setup.
+    """
+    query = "my tomato plant has curling leaves and yellow spots"
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for setup in ("sync", "queue", "queue_sampled"):
+            logger = logging.getLogger(f"krishi.logging_benchmark.{setup}")
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            file_handler = _SlowFileHandler(os.path.join(tmp, f"{setup}.log"), write_delay)
+            file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+            listener = None
+            if setup == "sync":
+                logger.addHandler(file_handler)
+            else:
+                log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(-1)
+                logger.addHandler(LazyQueueHandler(log_queue))
+                listener = QueueListener(log_queue, file_handler)
+                listener.start()
+            set_sample_rate(logger, sample_rate if setup == "queue_sampled" else 1.0)
+
+            start = time.perf_counter()
+            for i in range(iterations):
+                if setup == "sync":
+                    logger.info(f"Search initiated - User: user{i % 10}, Query: '{query[:50]}...'")
+                    logger.info(f"Cache miss for query: '{query[:50]}...' (check took {0.00012:.4f}s)")
+                    logger.info(f"Processing search for query: '{query[:50]}...'")
+                    logger.info(f"Search completed in {0.0123:.2f}s (total: {0.0125:.2f}s). Found {3} results.")
+                    logger.info(f"Performance metrics - Searches: {i}, Cache Hit Rate: {0.5:.1%}")
+                else:
+                    log_routine(logger, "Search initiated - User: user%d, Query: '%.50s'", i % 10, query)
+                    log_routine(logger, "Cache miss for query: '%.50s' (check took %.4fs)", query, 0.00012)
+                    log_routine(logger, "Processing search for query: '%.50s'", query)
+                    log_routine(logger, "Search completed in %.2fs (total: %.2fs). Found %d results.",
+                                0.0123, 0.0125, 3)
+                    log_routine(logger, "Performance metrics - Searches: %d, Cache Hit Rate: %.1f%%", i, 50.0)
+            elapsed = time.perf_counter() - start
+            results[f"{setup}_us_per_request"] = elapsed / iterations * 1e6
+
+            if listener is not None:
+                listener.stop()
+            for handler in list(logger.handlers):
+                logger.removeHandler(handler)
+            _sample_rates.pop(logger.name, None)
+            file_handler.close()
+    return results
+
+
+# --- Self-test block ---
+if __name__ == '__main__':
+    for name, cost in benchmark_logging().items():
+        print(f"{name}: {cost:.1f}")
+    for name, cost in benchmark_logging(iterations=200, write_delay=0.001).items():
+        print(f"{name} (1 ms writes): {cost:.1f}")
@@ -0,0 +1,218 @@
+"""
+Persistent, on-disk cache tier shared across restarts.
+
+Sits under the in-memory caches: lookups that miss in memory fall through to a
+SQLite file (WAL mode, so reads never wait on the writer), and anything stored
+in memory is also queued here. Writes are batched by one background thread, so
+a request never waits on disk I/O. At startup the most recently written entries
+can be preloaded into memory, so a fresh deploy starts with warm caches.
+
+Entries are grouped by namespace (e.g. 'search', 'embedding', 'diagnosis') and
+by scope: a string naming everything the value depends on besides its key
+(knowledge base content hash, model id, ...). A new knowledge base or model
+gets a new scope, so stale entries are never served; they age out after
+max_age seconds.
+"""
+import os
+import time
+import queue
+import pickle
+import atexit
+import sqlite3
+import logging
+import threading
+from typing import Any, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PersistentCache:
+    """SQLite-backed cache with asynchronous write-back."""
+
+    # Seconds a connection waits for another process's write transaction
+    BUSY_TIMEOUT = 5.0
+
+    def __init__(self, db_path: str, max_age: float = 7 * 24 * 3600,
+                 max_pending: int = 10000, batch_size: int = 256, mmap_size: int = 0):
+        """
+        Args:
+            db_path: SQLite file; created with its directory if missing.
+            max_age: Seconds after which entries are deleted (on open).
+            max_pending: Max writes queued; further writes are dropped until
+                the writer catches up.
+            batch_size: Max writes committed in one transaction.
+            mmap_size: Bytes of the file SQLite reads through a memory map
+                instead of read() calls (0 disables).
+        """
+        self.db_path = db_path
+        self.max_age = max_age
+        self.batch_size = batch_size
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+        self._pending: "queue.Queue[Optional[Tuple[str, str, str, bytes, float]]]" = queue.Queue(max_pending)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self.dropped_writes = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            "namespace TEXT NOT NULL, scope TEXT NOT NULL, key TEXT NOT NULL, "
+            "value BLOB NOT NULL, updated REAL NOT NULL, "
+            "PRIMARY KEY (namespace, scope, key))"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS cache_entries_recent "
+            "ON cache_entries (namespace, scope, updated)"
+        )
+        conn.execute("DELETE FROM cache_entries WHERE updated < ?", (time.time() - max_age,))
+
+    def _connection(self) -> sqlite3.Connection:
+        """This thread's connection (sqlite3 connections are not shared across threads)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.BUSY_TIMEOUT, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if self.mmap_size:
+                conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, scope: str, key: str,
+            max_age: Optional[float] = None) -> Optional[Any]:
+        """Return the stored value, or None if missing, older than max_age seconds or unreadable."""
+        entry = self.get_entry(namespace, scope, key, max_age)
+        return entry[0] if entry is not None else None
+
+    def get_entry(self, namespace: str, scope: str, key: str,
+                  max_age: Optional[float] = None) -> Optional[Tuple[Any, float]]:
+        """Return (value, time.time() it was written), or None as get() would."""
+        min_updated = time.time() - max_age if max_age is not None else 0.0
+        try:
+            row = self._connection().execute(
+                "SELECT value, updated FROM cache_entries "
+                "WHERE namespace = ? AND scope = ? AND key = ? AND updated >= ?",
+                (namespace, scope, key, min_updated)
+            ).fetchone()
+            return (pickle.loads(row[0]), row[1]) if row else None
+        except Exception as e:
+            logger.warning("Persistent cache read failed: %s", e)
+            return None
+
+    def put(self, namespace: str, scope: str, key: str, value: Any) -> None:
+        """Queue a value to be written by the background writer."""
+        self._start_writer()
+        try:
+            self._pending.put_nowait(
+                (namespace, scope, key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), time.time())
+            )
+        except queue.Full:
+            self.dropped_writes += 1
+
+    def preload(self, namespace: str, scope: str, limit: int) -> List[Tuple[str, Any]]:
+        """
+        Read the most recently written entries of a namespace and scope.
+
+        Returns:
+            (key, value) pairs, oldest first, so inserting them into an LRU in
+            order leaves the most recent ones most recently used.
+        """
+        try:
+            rows = self._connection().execute(
+                "SELECT key, value FROM cache_entries WHERE namespace = ? AND scope = ? "
+                "ORDER BY updated DESC LIMIT ?",
+                (namespace, scope, limit)
+            ).fetchall()
+        except Exception as e:
+            logger.warning("Persistent cache preload failed: %s", e)
+            return []
+        entries = []
+        for key, value in reversed(rows):
+            try:
+                entries.append((key, pickle.loads(value)))
+            except Exception:
+                continue
+        return entries
+
+    def delete(self, namespace: str, match: Optional[Callable[[str], bool]] = None) -> int:
+        """
+        Delete a namespace's entries, all of them or those whose key matches.
+
+        Queued writes are committed first, so they cannot bring deleted keys back.
+
+        Returns:
+            Number of entries deleted
+        """
+        self.flush()
+        conn = self._connection()
+        try:
+            if match is None:
+                cursor = conn.execute("DELETE FROM cache_entries WHERE namespace = ?", (namespace,))
+            else:
+                conn.create_function("key_matches", 1, lambda key: bool(match(key)), deterministic=True)
+                cursor = conn.execute(
+                    "DELETE FROM cache_entries WHERE namespace = ? AND key_matches(key)", (namespace,)
+                )
+            return cursor.rowcount
+        except sqlite3.Error as e:
+            logger.warning("Persistent cache delete failed: %s", e)
+            return 0
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Block until every queued write has been committed."""
+        if self._writer is None:
+            return
+        deadline = None if timeout is None else time.time() + timeout
+        while self._pending.unfinished_tasks:
+            if deadline is not None and time.time() > deadline:
+                return
+            time.sleep(0.01)
+
+    def close(self) -> None:
+        """Commit queued writes and stop the writer thread."""
+        with self._writer_lock:
+            if self._writer is None:
+                return
+            self._pending.put(None)
+            self._writer.join()
+            self._writer = None
+
+    def _start_writer(self) -> None:
+        if self._writer is not None:
+            return
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(
+                    target=self._write_loop, name="krishi-cache-writer", daemon=True
+                )
+                self._writer.start()
+                atexit.register(self.close)
+
+    def _write_loop(self) -> None:
+        """Commit queued writes in batches until close() queues None."""
+        conn = self._connection()
+        while True:
+            batch = [self._pending.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._pending.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [item for item in batch if item is not None]
+            if rows:
+                try:
+                    with conn:
+                        conn.execute("BEGIN")
+                        conn.executemany(
+                            "INSERT OR REPLACE INTO cache_entries "
+                            "(namespace, scope, key, value, updated) VALUES (?, ?, ?, ?, ?)",
+                            rows
+                        )
+                except Exception as e:
+                    logger.warning("Persistent cache write of %d entries failed: %s", len(rows), e)
+            for _ in batch:
+                self._pending.task_done()
+            if len(rows) < len(batch):
+                return
@@ -0,0 +1,170 @@
+"""
+Per-user, per-route rate limiting with the generic cell rate algorithm (GCRA).
+
+GCRA is a token bucket expressed as one timestamp per key: the "theoretical
+arrival time" (TAT) at which the bucket would be full again. A route allowing
+`limit` requests per `window` seconds admits a request when
+
+    max(tat, now) - now <= window - window / limit
+
+and then advances the TAT by window / limit. State is O(1) per user, and a key
+whose TAT has passed is indistinguishable from an unseen one, so idle users
+can be dropped at no cost.
+
+Two stores are provided:
+  - MemoryRateLimiter: in-process, bounded, idle keys evicted as they expire.
+  - SQLiteRateLimiter: a SQLite file (WAL mode) shared by several worker
+    processes on one host, so limits hold across all of them.
+"""
+import time
+import heapq
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Route -> (max requests, window in seconds)
+RouteLimits = Dict[str, Tuple[int, float]]
+
+
+def _gcra(tat: float, now: float, limit: int, window: float) -> Tuple[bool, float]:
+    """
+    One GCRA decision.
+
+    Returns:
+        (allowed, new_tat): new_tat equals tat when the request is rejected.
+    """
+    interval = window / limit
+    tat = max(tat, now)
+    if tat - now > window - interval:
+        return False, tat
+    return True, tat + interval
+
+
+class MemoryRateLimiter:
+    """GCRA limiter keeping its state in this process."""
+
+    def __init__(self, limits: RouteLimits, max_keys: int = 100000):
+        """
+        Args:
+            limits: Route -> (max requests, window in seconds).
+            max_keys: Max (route, user) states kept; the least recently
+                active are dropped beyond this.
+        """
+        self.limits = dict(limits)
+        self.max_keys = max_keys
+        # (route, user_id) -> TAT, least recently active first
+        self._tats: "OrderedDict[Tuple[str, str], float]" = OrderedDict()
+        # Min-heap of (TAT, key); entries superseded by a later TAT are skipped
+        self._expiry: List[Tuple[float, Tuple[str, str]]] = []
+        self._lock = threading.Lock()
+
+    def allow(self, user_id: str, route: str = "search") -> bool:
+        """Record a request and return True if it is within the route's limit."""
+        limit, window = self.limits[route]
+        key = (route, user_id)
+        now = time.time()
+        with self._lock:
+            previous = self._tats.pop(key, 0.0)
+            allowed, tat = _gcra(previous, now, limit, window)
+            self._tats[key] = tat
+            if tat != previous:
+                heapq.heappush(self._expiry, (tat, key))
+            self._evict(now)
+        return allowed
+
+    def _evict(self, now: float) -> None:
+        """Drop states whose TAT has passed, then the least recently active beyond max_keys.
+
+        Caller holds the lock.
+        """
+        while self._expiry and self._expiry[0][0] <= now:
+            tat, key = heapq.heappop(self._expiry)
+            if self._tats.get(key) == tat:
+                del self._tats[key]
+        while len(self._tats) > self.max_keys:
+            self._tats.popitem(last=False)
+        # Superseded entries pile up in the heap; rebuild it from the live states
+        if len(self._expiry) > 2 * len(self._tats) + 64:
+            self._expiry = [(tat, key) for key, tat in self._tats.items()]
+            heapq.heapify(self._expiry)
+
+    def __len__(self) -> int:
+        return len(self._tats)
+
+
+class SQLiteRateLimiter:
+    """GCRA limiter whose state lives in a SQLite file shared between processes."""
+
+    # Seconds a writer waits for another process's transaction
+    BUSY_TIMEOUT = 5.0
+    # Delete idle rows once every this many requests
+    PRUNE_EVERY = 1000
+
+    def __init__(self, limits: RouteLimits, db_path: str):
+        """
+        Args:
+            limits: Route -> (max requests, window in seconds).
+            db_path: SQLite file; every process using the same path shares limits.
+        """
+        self.limits = dict(limits)
+        self.db_path = db_path
+        self._local = threading.local()
+        self._requests = 0
+        with self._connection() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits ("
+                "route TEXT NOT NULL, user_id TEXT NOT NULL, tat REAL NOT NULL, "
+                "PRIMARY KEY (route, user_id))"
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        """This thread's connection (sqlite3 connections are not shared across threads)."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.BUSY_TIMEOUT, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def allow(self, user_id: str, route: str = "search") -> bool:
+        """
+        Record a request and return True if it is within the route's limit.
+
+        Fails open (allows the request) if the database cannot be used.
+        """
+        limit, window = self.limits[route]
+        now = time.time()
+        try:
+            conn = self._connection()
+            # IMMEDIATE takes the write lock up front, so the read-decide-write
+            # below is atomic across processes
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT tat FROM rate_limits WHERE route = ? AND user_id = ?", (route, user_id)
+                ).fetchone()
+                allowed, tat = _gcra(row[0] if row else 0.0, now, limit, window)
+                if allowed:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO rate_limits (route, user_id, tat) VALUES (?, ?, ?)",
+                        (route, user_id, tat)
+                    )
+                self._requests += 1
+                if self._requests % self.PRUNE_EVERY == 0:
+                    conn.execute("DELETE FROM rate_limits WHERE tat <= ?", (now,))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            return allowed
+        except sqlite3.Error as e:
+            logger.warning("Rate limit store unavailable, allowing request: %s", e)
+            return True
+
+    def __len__(self) -> int:
+        return self._connection().execute("SELECT COUNT(*) FROM rate_limits").fetchone()[0]
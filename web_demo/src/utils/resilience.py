@@ -0,0 +1,267 @@
+"""
+Retry policy, request deadlines and circuit breaker.
+
+- RetryPolicy retries only errors classified as transient (timeouts, dropped
+  connections, ...), waiting a random "full jitter" delay between attempts so
+  retries from many workers don't arrive in lockstep. A deterministic failure
+  (shape mismatch, bad input, ...) is raised at once.
+- A request deadline set with request_deadline() caps how long retries may
+  keep a request waiting: no retry is attempted if its delay would overrun it.
+  The deadline is held in a context variable, so it applies to everything the
+  request runs on its own thread.
+- CircuitBreaker fails calls fast after repeated failures, then lets a single
+  probe through after a cool-down; the probe's success closes it again.
+  RetryPolicy only counts transient failures against it: a deterministic
+  error says nothing about the guarded dependency's health.
+
+Retry and breaker counters are exposed through stats() for RAGMonitor.
+"""
+import time
+import random
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple, Type
+
+logger = logging.getLogger(__name__)
+
+# Absolute time.monotonic() deadline of the current request, if any
+_deadline: contextvars.ContextVar[Optional[float]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+class TransientError(Exception):
+    """Raise (or subclass) to mark a failure as worth retrying."""
+
+
+class DeadlineExceeded(TimeoutError):
+    """The request's deadline passed before the call could complete."""
+
+
+class CircuitOpenError(RuntimeError):
+    """The circuit breaker is open; the call was not attempted."""
+
+
+# Errors retried by default; everything else is treated as deterministic
+TRANSIENT_ERRORS: Tuple[Type[BaseException], ...] = (
+    TransientError, TimeoutError, ConnectionError, InterruptedError, BlockingIOError,
+)
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """Default classification: TRANSIENT_ERRORS, except our own fail-fast errors."""
+    if isinstance(exc, (DeadlineExceeded, CircuitOpenError)):
+        return False
+    return isinstance(exc, TRANSIENT_ERRORS)
+
+
+@contextmanager
+def request_deadline(seconds: float) -> Iterator[None]:
+    """Give the calls made inside the block a shared time budget.
+
+    Nested deadlines never extend an outer one.
+    """
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    token = _deadline.set(deadline if outer is None else min(outer, deadline))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the current request's deadline, or None without one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a single half-open probe."""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Args:
+            name: Used in logs and errors.
+            failure_threshold: Consecutive failures that open the breaker.
+            reset_timeout: Seconds the breaker stays open before a probe is let through.
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._probe_started = 0.0
+        self._lock = threading.Lock()
+        self.opened_count = 0
+        self.rejected_count = 0
+
+    def before_call(self) -> None:
+        """Admit a call or raise CircuitOpenError."""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            now = time.monotonic()
+            if self.state == self.OPEN and now - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+            # A probe that never reported back (e.g. interrupted) is replaced
+            if self.state == self.HALF_OPEN and (
+                not self._probing or now - self._probe_started >= self.reset_timeout
+            ):
+                self._probing = True
+                self._probe_started = now
+                return
+            self.rejected_count += 1
+        raise CircuitOpenError(f"Circuit '{self.name}' is open")
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Circuit '%s' closed after a successful probe", self.name)
+            self.state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def release_probe(self) -> None:
+        """End a call without counting it either way, e.g. after a deterministic error.
+
+        A half-open breaker lets the next call probe.
+        """
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.opened_count += 1
+                    logger.warning("Circuit '%s' opened after %d consecutive failures",
+                                   self.name, self._failures)
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self._failures,
+                'opened': self.opened_count,
+                'rejected': self.rejected_count,
+            }
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.opened_count = 0
+            self.rejected_count = 0
+
+
+class RetryPolicy:
+    """Decorator retrying transient failures with jittered backoff, within the request deadline."""
+
+    def __init__(self, name: str, max_attempts: int = 3, base_delay: float = 0.05,
+                 max_delay: float = 0.5,
+                 is_transient: Callable[[BaseException], bool] = is_transient_error,
+                 breaker: Optional[CircuitBreaker] = None):
+        """
+        Args:
+            name: Used in logs.
+            max_attempts: Total attempts, including the first.
+            base_delay: Backoff cap before the first retry, doubled per retry.
+            max_delay: Upper bound of the backoff cap.
+            is_transient: Decides whether a failure is retried.
+            breaker: Optional circuit breaker guarding the wrapped calls.
+        """
+        self.name = name
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.is_transient = is_transient
+        self.breaker = breaker
+        self._lock = threading.Lock()
+        self._counters = self._zero_counters()
+
+    @staticmethod
+    def _zero_counters() -> Dict[str, int]:
+        # calls: wrapped calls; retries: extra attempts made; recovered: calls
+        # that succeeded after a retry; exhausted: transient failures that used
+        # every attempt; non_transient: failures raised without retrying;
+        # deadline_exceeded: retries skipped because the deadline would pass
+        return {'calls': 0, 'retries': 0, 'recovered': 0, 'exhausted': 0,
+                'non_transient': 0, 'deadline_exceeded': 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def __call__(self, func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return self.call(func, *args, **kwargs)
+        return wrapper
+
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        """Run func under this policy."""
+        self._count('calls')
+        remaining = remaining_time()
+        if remaining is not None and remaining <= 0:
+            self._count('deadline_exceeded')
+            raise DeadlineExceeded(f"Deadline passed before calling {self.name}")
+        if self.breaker is not None:
+            self.breaker.before_call()
+
+        for attempt in range(self.max_attempts):
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if not self.is_transient(e):
+                    self._count('non_transient')
+                    if self.breaker is not None:
+                        self.breaker.release_probe()
+                    raise
+                if attempt + 1 >= self.max_attempts:
+                    self._count('exhausted')
+                    logger.error("%s failed after %d attempts: %s", self.name, self.max_attempts, e)
+                    self._fail()
+                    raise
+                delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+                remaining = remaining_time()
+                if remaining is not None and delay >= remaining:
+                    self._count('deadline_exceeded')
+                    self._fail()
+                    raise
+                self._count('retries')
+                logger.warning("%s attempt %d failed: %s. Retrying in %.3fs...",
+                               self.name, attempt + 1, e, delay)
+                time.sleep(delay)
+                continue
+            if attempt > 0:
+                self._count('recovered')
+            if self.breaker is not None:
+                self.breaker.record_success()
+            return result
+
+    def _fail(self) -> None:
+        if self.breaker is not None:
+            self.breaker.record_failure()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+        if self.breaker is not None:
+            stats['breaker'] = self.breaker.stats()
+        return stats
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._counters = self._zero_counters()
+        if self.breaker is not None:
+            self.breaker.reset_stats()
@@ -0,0 +1,81 @@
+"""
+Result cache shared by every worker process on one host.
+
+Each worker process keeps its own in-memory result cache; with several workers
+behind a load balancer a repeated query only hits if it lands on the worker
+that answered it first. This tier sits under the in-memory cache and is
+backed by one SQLite file that every worker opens:
+
+- WAL mode, so readers never take a lock that blocks other readers or the
+  writer, and reads go through a memory map of the file;
+- entries follow the same TTL as the in-memory cache (by write time);
+- writes are queued and committed by a background thread in each process;
+- entries carry a scope (the knowledge base version), so workers serving
+  different versions during a rolling reload never see each other's results.
+
+Hit and miss counts are kept per process, so each worker reports how much the
+shared tier saves it.
+"""
+import time
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .persistent_cache import PersistentCache
+
+
+class SharedResultCache:
+    """Cross-process TTL cache of search results on a shared SQLite file."""
+
+    NAMESPACE = "result"
+
+    def __init__(self, db_path: str, ttl: float, mmap_size: int = 256 * 1024 * 1024):
+        """
+        Args:
+            db_path: SQLite file shared by the worker processes.
+            ttl: Seconds an entry stays valid after it was written.
+            mmap_size: Bytes of the file read through a memory map.
+        """
+        self.ttl = ttl
+        self.store = PersistentCache(db_path, max_age=ttl, mmap_size=mmap_size)
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'writes': 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._counters[name] += 1
+
+    def get(self, scope: str, key: str) -> Optional[Any]:
+        """Return a result written by any worker within the TTL, or None."""
+        entry = self.get_with_ttl(scope, key)
+        return entry[0] if entry is not None else None
+
+    def get_with_ttl(self, scope: str, key: str) -> Optional[Tuple[Any, float]]:
+        """Return (result, seconds it stays valid) for a result written within the TTL, or None."""
+        entry = self.store.get_entry(self.NAMESPACE, scope, key, max_age=self.ttl)
+        self._count('hits' if entry is not None else 'misses')
+        if entry is None:
+            return None
+        value, updated = entry
+        return value, max(0.0, updated + self.ttl - time.time())
+
+    def set(self, scope: str, key: str, value: Any) -> None:
+        """Queue a result for the other workers."""
+        self.store.put(self.NAMESPACE, scope, key, value)
+        self._count('writes')
+
+    def clear(self, match: Optional[Callable[[str], bool]] = None) -> int:
+        """Remove entries (of every scope), all of them or those whose key matches."""
+        return self.store.delete(self.NAMESPACE, match)
+
+    def stats(self) -> Dict[str, Any]:
+        """This process's hit/miss/write counts."""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._counters)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        stats['dropped_writes'] = self.store.dropped_writes
+        return stats
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._counters = {'hits': 0, 'misses': 0, 'writes': 0}
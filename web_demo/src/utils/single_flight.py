@@ -0,0 +1,65 @@
+"""
+Single-flight de-duplication of identical in-flight calls.
+
+When several threads ask for the same key at once, only the first one runs the
+function; the others wait for it and receive the same result (or exception).
+This keeps a popular query that just fell out of the cache from being computed
+once per concurrent caller. A waiting caller stops waiting when its own
+request deadline passes; the shared call keeps running for the others.
+"""
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Any, Callable, Dict, Tuple
+
+from .resilience import DeadlineExceeded, remaining_time
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time and shares its outcome."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+
+    def do(self, key: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Tuple[Any, bool]:
+        """
+        Run ``func(*args, **kwargs)`` unless a call for ``key`` is already running.
+
+        Returns:
+            (result, shared) where shared is True if the result came from
+            another caller's in-flight call.
+
+        Raises:
+            DeadlineExceeded: The request deadline passed while waiting for
+                another caller's call.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not leader:
+            try:
+                return future.result(timeout=remaining_time()), True
+            except FutureTimeoutError:
+                if future.done():
+                    raise  # The shared call itself timed out
+                raise DeadlineExceeded("Deadline passed while waiting for a shared call") from None
+
+        try:
+            result = func(*args, **kwargs)
+            future.set_result(result)
+            return result, False
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def in_flight(self) -> int:
+        """Number of keys currently being computed."""
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,8 @@
+# --- tests/conftest.py ---
+"""Puts web_demo on sys.path so tests import the app's modules as 'src.*'."""
+import os
+import sys
+
+WEB_DEMO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if WEB_DEMO_DIR not in sys.path:
+    sys.path.insert(0, WEB_DEMO_DIR)
@@ -0,0 +1,76 @@
+# --- tests/test_bounded_cache.py ---
+import pytest
+
+from src.utils import bounded_cache
+from src.utils.bounded_cache import BoundedTTLCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(bounded_cache.time, 'time', fake)
+    return fake
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = BoundedTTLCache(ttl=10, stripes=1)
+    cache.set("a", 1)
+    clock.now += 9
+    assert cache.get("a") == 1
+    clock.now += 1
+    assert cache.get("a") is None
+    assert cache.stats()['expirations'] == 1
+    assert len(cache) == 0
+
+
+def test_expire_drops_only_expired_entries(clock):
+    cache = BoundedTTLCache(ttl=10, stripes=2)
+    cache.set("old", 1)
+    clock.now += 5
+    cache.set("new", 2)
+    clock.now += 5
+    assert cache.expire() == 1
+    assert cache.get("new") == 2
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = BoundedTTLCache(max_entries=2, ttl=10, stripes=1)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()['evictions'] == 1
+
+
+def test_byte_limit_evicts(clock):
+    cache = BoundedTTLCache(max_bytes=1000, ttl=10, stripes=1, size_fn=lambda value: 400)
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+    assert len(cache) == 2
+    assert cache.get("a") is None
+
+
+def test_shorter_entry_ttl_expires_on_read(clock):
+    cache = BoundedTTLCache(ttl=10, stripes=1)
+    cache.set("fresh", 2)
+    cache.set("copied", 1, ttl=3)
+    clock.now += 3
+    assert cache.get("copied") is None
+    assert cache.get("fresh") == 2
+
+
+def test_entry_ttl_never_exceeds_cache_ttl(clock):
+    cache = BoundedTTLCache(ttl=10, stripes=1)
+    cache.set("a", 1, ttl=60)
+    clock.now += 10
+    assert cache.get("a") is None
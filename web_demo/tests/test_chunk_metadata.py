@@ -0,0 +1,66 @@
+# --- tests/test_chunk_metadata.py ---
+import numpy as np
+import pytest
+
+from src.rag import metadata, search
+from src.rag.metadata import ChunkMetadata, filter_key, normalize_label
+from src.rag.packs import DataPack
+
+
+@pytest.fixture
+def chunk_metadata(tmp_path):
+    """Five chunks: tomato/blight, tomato/healthy, potato/blight, bell pepper/spot, tomato/blight."""
+    path = tmp_path / "kb.meta.npz"
+    np.savez(
+        path,
+        chunk_count=5,
+        plant_labels=np.array(["Bell_Pepper", "Potato", "Tomato"]),
+        plant_ids=np.array([2, 2, 1, 0, 2], dtype=np.int32),
+        disease_labels=np.array(["Bacterial_spot", "Late_blight", "healthy"]),
+        disease_ids=np.array([1, 2, 1, 0, 1], dtype=np.int32),
+    )
+    return ChunkMetadata(str(path))
+
+
+def test_labels_are_normalized():
+    assert normalize_label(" Bell_Pepper ") == "bell pepper"
+    assert filter_key({"plant": "Tomato", "disease": "Late_blight"}) == \
+        filter_key({"disease": "late blight", "plant": "tomato"})
+
+
+def test_ids_match_every_filter(chunk_metadata):
+    assert chunk_metadata.labels("plant") == ["bell pepper", "potato", "tomato"]
+    assert chunk_metadata.ids_for({"plant": "Tomato"}).tolist() == [0, 1, 4]
+    assert chunk_metadata.ids_for({"plant": "tomato", "disease": "late blight"}).tolist() == [0, 4]
+    assert chunk_metadata.ids_for({"plant": "cassava"}).tolist() == []
+    assert chunk_metadata.ids_for({}).tolist() == [0, 1, 2, 3, 4]
+
+
+def test_unknown_field_is_rejected(chunk_metadata):
+    with pytest.raises(ValueError, match="Unsupported filter field"):
+        chunk_metadata.ids_for({"region": "punjab"})
+
+
+def test_selectors_are_cached_for_known_labels_only(chunk_metadata):
+    ids, selector = chunk_metadata.selector_for({"plant": "Bell_Pepper"})
+    assert ids.tolist() == [3]
+    assert chunk_metadata.selector_for({"plant": "bell pepper"})[1] is selector
+
+    chunk_metadata.selector_for({"plant": "cassava"})
+    assert len(chunk_metadata._selectors) == 1
+
+
+def test_selector_cache_drops_least_recently_used(chunk_metadata, monkeypatch):
+    monkeypatch.setattr(metadata, 'SELECTOR_CACHE_SIZE', 2)
+    chunk_metadata.selector_for({"plant": "tomato"})
+    chunk_metadata.selector_for({"plant": "potato"})
+    chunk_metadata.selector_for({"plant": "tomato"})
+    chunk_metadata.selector_for({"plant": "bell pepper"})
+    assert list(chunk_metadata._selectors) == [(("plant", "tomato"),), (("plant", "bell pepper"),)]
+
+
+def test_filtered_search_needs_chunk_metadata():
+    pack = DataPack("test", "knowledge_base_test.faiss", "knowledge_base_test_text.pkl")
+    assert search._filter_selector(pack, None) == (None, None)
+    with pytest.raises(ValueError, match="chunk metadata"):
+        search._filter_selector(pack, {"plant": "tomato"})
@@ -0,0 +1,92 @@
+# --- tests/test_coalescer.py ---
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+import pytest
+
+from src.rag.coalescer import SearchCoalescer
+
+
+def echo_batch(calls):
+    """Batch function returning, per request, its query repeated top_k times."""
+    def batch_fn(queries, top_ks):
+        calls.append((list(queries), list(top_ks)))
+        return [[query] * top_k for query, top_k in zip(queries, top_ks)]
+    return batch_fn
+
+
+def test_concurrent_requests_share_one_batch_with_their_own_top_k():
+    calls = []
+    batch_sizes = []
+    coalescer = SearchCoalescer(echo_batch(calls), max_wait=0.2, max_batch_size=3,
+                                on_batch=batch_sizes.append)
+    requests = [("a", 1), ("b", 3), ("c", 2)]
+    with ThreadPoolExecutor(len(requests)) as pool:
+        results = list(pool.map(lambda r: coalescer.search(*r, timeout=5), requests))
+
+    assert results == [["a"], ["b", "b", "b"], ["c", "c"]]
+    assert len(calls) == 1
+    queries, top_ks = calls[0]
+    assert sorted(zip(queries, top_ks)) == requests
+    assert batch_sizes == [3]
+
+
+def test_batch_dispatches_at_max_batch_size_without_waiting():
+    calls = []
+    coalescer = SearchCoalescer(echo_batch(calls), max_wait=30, max_batch_size=1)
+    assert coalescer.search("a", 2, timeout=5) == ["a", "a"]
+
+
+def test_batch_failure_reaches_every_caller():
+    def failing_batch(queries, top_ks):
+        raise RuntimeError("index unavailable")
+
+    coalescer = SearchCoalescer(failing_batch, max_wait=0.001)
+    with pytest.raises(RuntimeError, match="index unavailable"):
+        coalescer.search("a", 1, timeout=5)
+
+
+def test_timed_out_request_is_cancelled_and_skipped():
+    release = threading.Event()
+    calls = []
+
+    def slow_batch(queries, top_ks):
+        calls.append(list(queries))
+        release.wait(5)
+        return [[query] for query in queries]
+
+    coalescer = SearchCoalescer(slow_batch, max_wait=0.001, max_batch_size=1)
+    # Occupies the dispatcher, so the next request stays queued
+    first = coalescer.submit("first", 1)
+    with pytest.raises(FutureTimeoutError):
+        coalescer.search("abandoned", 1, timeout=0.05)
+
+    release.set()
+    assert first.result(5) == ["first"]
+    assert coalescer.search("next", 1, timeout=5) == ["next"]
+    assert "abandoned" not in [query for batch in calls for query in batch]
+
+
+def test_batch_runs_in_the_first_requests_context():
+    request_id = contextvars.ContextVar("request_id", default=None)
+    seen = []
+
+    def batch_fn(queries, top_ks):
+        seen.append(request_id.get())
+        return queries
+
+    coalescer = SearchCoalescer(batch_fn, max_wait=0.001)
+    request_id.set("req-1")
+    assert coalescer.search("a", 1, timeout=5) == "a"
+    assert seen == ["req-1"]
+
+
+def test_short_batch_result_fails_the_unanswered_requests():
+    coalescer = SearchCoalescer(lambda queries, top_ks: [queries[0]], max_wait=5, max_batch_size=3)
+    futures = [coalescer.submit(query, 1) for query in ("a", "b", "c")]
+
+    assert futures[0].result(5) == "a"
+    for future in futures[1:]:
+        with pytest.raises(RuntimeError, match="returned 1 results for 3 requests"):
+            future.result(5)
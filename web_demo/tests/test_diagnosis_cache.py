@@ -0,0 +1,77 @@
+# --- tests/test_diagnosis_cache.py ---
+import hashlib
+import os
+
+import pytest
+
+# src.pipeline imports the GGUF runtime on package import
+pytest.importorskip("llama_cpp")
+
+from src.pipeline import diagnosis_cache  # noqa: E402
+from src.pipeline.diagnosis_cache import HASH_SUFFIX, DiagnosisCache, model_file_hash  # noqa: E402
+from src.utils.persistent_cache import PersistentCache  # noqa: E402
+
+GREEDY = {'max_tokens': 256, 'temperature': 0.0, 'seed': 0}
+
+
+@pytest.fixture
+def persistent(tmp_path, monkeypatch):
+    """Backs the diagnosis cache with a temporary persistent tier."""
+    cache = PersistentCache(str(tmp_path / "cache.sqlite3"))
+
+    def get(namespace, scope, key, max_age=None):
+        cache.flush()
+        return cache.get(namespace, scope, key, max_age)
+
+    monkeypatch.setattr(diagnosis_cache, 'get_persistent', get)
+    monkeypatch.setattr(diagnosis_cache, 'set_persistent', cache.put)
+    yield cache
+    cache.close()
+
+
+def test_key_ignores_prompt_case_and_whitespace():
+    assert DiagnosisCache.key("Rice  leaves with\nbrown spots", GREEDY) == \
+        DiagnosisCache.key("rice leaves with brown spots ", GREEDY)
+    assert DiagnosisCache.key("rice leaves", GREEDY) != DiagnosisCache.key("wheat leaves", GREEDY)
+
+
+def test_key_depends_on_sampling_but_not_its_order():
+    key = DiagnosisCache.key("rice leaves", GREEDY)
+    assert DiagnosisCache.key("rice leaves", dict(reversed(list(GREEDY.items())))) == key
+    assert DiagnosisCache.key("rice leaves", dict(GREEDY, max_tokens=512)) != key
+
+
+def test_diagnoses_are_scoped_to_the_model(persistent):
+    cache = DiagnosisCache()
+    key = DiagnosisCache.key("rice leaves", GREEDY)
+    cache.set("model-a", key, "Rice blast")
+    assert cache.get("model-a", key) == "Rice blast"
+    assert cache.get("model-b", key) is None
+
+
+def test_diagnoses_survive_a_restart(persistent):
+    key = DiagnosisCache.key("rice leaves", GREEDY)
+    DiagnosisCache().set("model-a", key, "Rice blast")
+
+    restarted = DiagnosisCache()
+    assert restarted.get("model-a", key) == "Rice blast"
+    assert restarted.get("model-a", key) == "Rice blast"
+    assert restarted.stats()['persistent_hits'] == 1
+
+
+def test_model_hash_is_remembered_until_the_file_changes(tmp_path):
+    model = tmp_path / "model.gguf"
+    model.write_bytes(b"weights v1")
+    digest = model_file_hash(str(model))
+    assert digest == hashlib.sha256(b"weights v1").hexdigest()
+
+    # An unchanged file is not hashed again: the sidecar's digest is returned
+    sidecar = str(model) + HASH_SUFFIX
+    stamp = open(sidecar, encoding='utf-8').read().split("\n")[0]
+    with open(sidecar, 'w', encoding='utf-8') as f:
+        f.write(f"{stamp}\nremembered\n")
+    assert model_file_hash(str(model)) == "remembered"
+
+    model.write_bytes(b"weights v2!")
+    os.utime(model, ns=(1, 1))
+    assert model_file_hash(str(model)) == hashlib.sha256(b"weights v2!").hexdigest()
@@ -0,0 +1,107 @@
+# --- tests/test_hot_reload.py ---
+import json
+import pickle
+
+import faiss
+import numpy as np
+import pytest
+
+from src.rag import search
+from src.rag.manifest import METRIC_INNER_PRODUCT, ManifestMismatchError, manifest_path
+from src.rag.packs import DataPack, PackRegistry, pack_paths
+from src.utils.cache_utils import clear_cache, get_cache, set_cache
+
+DIMENSION = 4
+
+
+class FakeEncoder:
+    def get_sentence_embedding_dimension(self):
+        return DIMENSION
+
+
+def write_pack(directory, region, texts, content_hash, chunk_count=None):
+    """Writes a flat inner-product pack with one basis vector per chunk."""
+    index_path, text_path = pack_paths(str(directory), region)
+    index = faiss.IndexFlatIP(DIMENSION)
+    index.add(np.eye(DIMENSION, dtype=np.float32)[:len(texts)])
+    faiss.write_index(index, index_path)
+    with open(text_path, 'wb') as f:
+        pickle.dump(texts, f)
+    with open(manifest_path(index_path), 'w', encoding='utf-8') as f:
+        json.dump({
+            'metric': METRIC_INNER_PRODUCT, 'normalized': True,
+            'embedding_model': search.EMBEDDING_MODEL_ID, 'dimension': DIMENSION,
+            'chunk_count': len(texts) if chunk_count is None else chunk_count,
+            'content_hash': content_hash, 'index_type': 'IndexFlatIP', 'index_params': {},
+        }, f)
+    return index_path, text_path
+
+
+@pytest.fixture
+def live(tmp_path, monkeypatch):
+    """A loaded default pack, with the encoder and persistent tier stubbed out."""
+    monkeypatch.setattr(search, 'embedding_model', FakeEncoder())
+    monkeypatch.setattr(search, 'load_embedding_model', lambda: None)
+    monkeypatch.setattr(search, '_encode_queries',
+                        lambda pack, queries: np.ones((len(queries), DIMENSION), dtype=np.float32))
+    monkeypatch.setattr(search, '_preload_persistent_cache', lambda pack: None)
+
+    (tmp_path / "v1").mkdir()
+    index_path, text_path = write_pack(tmp_path / "v1", "default", ["old chunk"], "v1")
+    pack = DataPack("default", index_path, text_path).load(search.EMBEDDING_MODEL_ID, DIMENSION)
+    monkeypatch.setattr(search, 'default_pack', pack)
+    monkeypatch.setattr(search, 'index', pack.index)
+    monkeypatch.setattr(search, 'text_data', pack.text_data)
+    yield pack
+    clear_cache(pack.result_scope)
+
+
+def test_reload_swaps_in_a_new_snapshot_and_drops_old_results(live, tmp_path):
+    set_cache("blast", 3, ["old result"], scope=live.result_scope)
+    (tmp_path / "v2").mkdir()
+    index_path, text_path = write_pack(tmp_path / "v2", "default", ["new chunk", "more"], "v2")
+
+    manifest = search.reload_knowledge_base(index_path=index_path, text_path=text_path)
+
+    pack = search.default_pack
+    assert manifest['content_hash'] == "v2"
+    assert pack is not live and pack.text_data == ["new chunk", "more"]
+    assert search.text_data is pack.text_data
+    assert live.retired and not pack.retired
+    assert pack.result_scope != live.result_scope
+    assert get_cache("blast", 3, scope=live.result_scope) is None
+
+
+def test_reload_of_identical_content_keeps_cached_results(live):
+    set_cache("blast", 3, ["kept result"], scope=live.result_scope)
+    search.reload_knowledge_base()
+
+    assert search.default_pack is not live
+    assert search.default_pack.result_scope == live.result_scope
+    assert get_cache("blast", 3, scope=live.result_scope) == ["kept result"]
+
+
+def test_failed_reload_keeps_the_live_snapshot(live, tmp_path):
+    (tmp_path / "bad").mkdir()
+    index_path, text_path = write_pack(tmp_path / "bad", "default", ["chunk"], "bad", chunk_count=7)
+
+    with pytest.raises(ManifestMismatchError):
+        search.reload_knowledge_base(index_path=index_path, text_path=text_path)
+    assert search.default_pack is live
+    assert not live.retired
+
+
+def test_regional_reload_retires_the_resident_pack(live, tmp_path, monkeypatch):
+    packs_dir = tmp_path / "packs"
+    packs_dir.mkdir()
+    write_pack(packs_dir, "punjab", ["wheat rust"], "p1")
+    registry = PackRegistry(str(packs_dir), search._load_pack, memory_budget_bytes=1 << 30)
+    monkeypatch.setattr(search, 'pack_registry', registry)
+
+    first = registry.get("punjab")
+    search.reload_knowledge_base(region="punjab")
+
+    second = registry.peek("punjab")
+    assert second is not first
+    assert first.retired and not second.retired
+    assert registry.resident() == ["punjab"]
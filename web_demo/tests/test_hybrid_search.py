@@ -0,0 +1,91 @@
+# --- tests/test_hybrid_search.py ---
+import faiss
+import numpy as np
+import pytest
+
+from src.rag import search
+from src.rag.lexical import BM25Index, reciprocal_rank_fusion, tokenize
+from src.rag.manifest import METRIC_INNER_PRODUCT
+from src.rag.packs import DataPack
+
+TEXTS = [
+    "rice blast causes diamond shaped lesions",
+    "tomato late blight spreads in wet weather",
+    "wheat rust forms orange pustules on rice stubble",
+    "धान में झोंका रोग",
+]
+
+
+def write_bm25(path, texts):
+    """Writes a .bm25.npz whose term weights are plain term frequencies."""
+    postings = {}
+    for doc, text in enumerate(texts):
+        for term in tokenize(text):
+            postings.setdefault(term, {}).setdefault(doc, 0.0)
+            postings[term][doc] += 1.0
+    terms = sorted(postings)
+    offsets = np.cumsum([0] + [len(postings[t]) for t in terms])
+    np.savez(
+        path,
+        terms=np.array(terms),
+        postings_offsets=offsets.astype(np.int64),
+        postings_docs=np.array([d for t in terms for d in sorted(postings[t])], dtype=np.int32),
+        postings_weights=np.array([postings[t][d] for t in terms for d in sorted(postings[t])],
+                                  dtype=np.float32),
+        doc_count=len(texts),
+    )
+    return path
+
+
+@pytest.fixture
+def pack(tmp_path, monkeypatch):
+    """Four chunks, one basis vector each; every query embeds to QUERY_VECTOR."""
+    index = faiss.IndexFlatIP(4)
+    index.add(np.eye(4, dtype=np.float32))
+    pack = DataPack("test", str(tmp_path / "knowledge_base_test.faiss"), "", index=index, text_data=TEXTS)
+    pack.manifest = {'metric': METRIC_INNER_PRODUCT, 'normalized': False, 'index_params': {}}
+    pack.lexical_index = BM25Index(write_bm25(str(tmp_path / "kb.bm25.npz"), TEXTS))
+    # Dense ranking: 1, 3, 0, 2
+    monkeypatch.setattr(search, '_encode_queries',
+                        lambda pack, queries: np.array([[0.2, 1.0, 0.0, 0.5]] * len(queries), dtype=np.float32))
+    return pack
+
+
+def test_tokenize_keeps_devanagari_words_whole():
+    assert tokenize("Rice BLAST, धान में!") == ["rice", "blast", "धान", "में"]
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1]], k=60)
+    assert [chunk_id for chunk_id, _ in fused] == [1, 3, 2]
+    assert fused[0][1] == pytest.approx(1 / 61 + 1 / 62)
+
+
+def test_bm25_ranks_by_term_weight_and_ignores_unknown_terms(pack):
+    ids, scores = pack.lexical_index.search("rice blast", top_k=5)
+    assert ids.tolist() == [0, 2]
+    assert scores.tolist() == [2.0, 1.0]
+    assert len(pack.lexical_index.search("cassava", top_k=5)[0]) == 0
+    assert pack.lexical_index.search("झोंका", top_k=5)[0].tolist() == [3]
+
+
+def test_hybrid_search_fuses_lexical_and_dense_rankings(pack):
+    results = search._perform_hybrid_search(pack, "rice blast", top_k=3)
+    # Chunks 0 and 2 match both rankings, so they beat chunk 1 (first densely only)
+    assert results.ids.tolist() == [0, 2, 1]
+    assert results.scores[0] == pytest.approx((1 / 61 + 1 / 63) / (2 / 61))
+    assert results.texts()[0] == TEXTS[0]
+
+
+def test_hybrid_search_respects_filtered_ids(pack):
+    allowed = np.array([1, 2], dtype=np.int64)
+    results = search._perform_hybrid_search(
+        pack, "rice blast", top_k=3, allowed_ids=allowed, filter_sel=faiss.IDSelectorBatch(allowed)
+    )
+    assert sorted(results.ids.tolist()) == [1, 2]
+
+
+def test_hybrid_search_without_bm25_falls_back_to_dense(pack):
+    pack.lexical_index = None
+    results = search._perform_hybrid_search(pack, "rice blast", top_k=2)
+    assert results.ids.tolist() == [1, 3]
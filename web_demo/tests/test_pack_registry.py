@@ -0,0 +1,85 @@
+# --- tests/test_pack_registry.py ---
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.rag.packs import PackRegistry, pack_paths
+
+
+@pytest.fixture
+def packs_dir(tmp_path):
+    """Empty pack files for three regions, plus one pack without chunk text."""
+    for region in ("bihar", "punjab", "kerala"):
+        for path in pack_paths(str(tmp_path), region):
+            open(path, 'wb').close()
+    open(pack_paths(str(tmp_path), "goa")[0], 'wb').close()
+    return str(tmp_path)
+
+
+def make_registry(packs_dir, budget=250, sizes=None, events=None):
+    """A registry whose loader only records the pack and sets its size (default 100 bytes)."""
+    loaded = []
+
+    def loader(pack):
+        loaded.append(pack.name)
+        pack.memory_bytes = (sizes or {}).get(pack.name, 100)
+
+    on_event = (lambda region, event: events.append((region, event))) if events is not None else None
+    return PackRegistry(packs_dir, loader, budget, on_event), loaded
+
+
+def test_packs_are_discovered_and_loaded_on_first_use(packs_dir):
+    events = []
+    registry, loaded = make_registry(packs_dir, events=events)
+    assert registry.regions() == ["bihar", "kerala", "punjab"]
+    assert registry.resident() == []
+
+    pack = registry.get("punjab")
+    assert registry.get("punjab") is pack
+    assert loaded == ["punjab"]
+    assert events == [("punjab", "load"), ("punjab", "hit")]
+
+
+def test_unknown_region_is_rejected(packs_dir):
+    registry, _ = make_registry(packs_dir)
+    with pytest.raises(ValueError, match="No data pack for region 'goa'"):
+        registry.get("goa")
+
+
+def test_least_recently_used_pack_is_evicted_over_budget(packs_dir):
+    registry, loaded = make_registry(packs_dir)
+    registry.get("bihar")
+    registry.get("punjab")
+    registry.get("bihar")
+    registry.get("kerala")
+    assert registry.resident() == ["bihar", "kerala"]
+    assert registry.resident_bytes() == 200
+
+    registry.get("punjab")
+    assert loaded == ["bihar", "punjab", "kerala", "punjab"]
+    metrics = registry.get_metrics()
+    assert metrics['packs']['punjab']['loads'] == 2
+    assert metrics['packs']['punjab']['evictions'] == 1
+    assert metrics['packs']['bihar']['resident'] is False
+
+
+def test_most_recent_pack_stays_even_over_budget(packs_dir):
+    registry, _ = make_registry(packs_dir, sizes={"kerala": 1000})
+    registry.get("bihar")
+    registry.get("kerala")
+    assert registry.resident() == ["kerala"]
+
+
+def test_concurrent_requests_load_a_pack_once(packs_dir):
+    registry, loaded = make_registry(packs_dir)
+    start = threading.Barrier(4)
+
+    def get():
+        start.wait(5)
+        return registry.get("bihar")
+
+    with ThreadPoolExecutor(4) as pool:
+        packs = list(pool.map(lambda _: get(), range(4)))
+    assert loaded == ["bihar"]
+    assert all(pack is packs[0] for pack in packs)
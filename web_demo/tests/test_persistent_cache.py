@@ -0,0 +1,94 @@
+# --- tests/test_persistent_cache.py ---
+import pytest
+
+from src.utils import persistent_cache
+from src.utils.persistent_cache import PersistentCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(persistent_cache.time, 'time', fake)
+    return fake
+
+
+@pytest.fixture
+def open_cache(tmp_path):
+    caches = []
+
+    def open_cache(**kwargs):
+        cache = PersistentCache(str(tmp_path / "cache" / "entries.sqlite3"), **kwargs)
+        caches.append(cache)
+        return cache
+
+    yield open_cache
+    for cache in caches:
+        cache.close()
+
+
+def test_entries_survive_a_restart(open_cache, clock):
+    cache = open_cache()
+    cache.put('search', 'kb-v1', 'blast', ([3, 1], [0.9, 0.5]))
+    cache.flush()
+    cache.close()
+
+    reopened = open_cache()
+    assert reopened.get('search', 'kb-v1', 'blast') == ([3, 1], [0.9, 0.5])
+    assert reopened.get_entry('search', 'kb-v1', 'blast') == (([3, 1], [0.9, 0.5]), 1000.0)
+
+
+def test_namespaces_and_scopes_are_separate(open_cache, clock):
+    cache = open_cache()
+    cache.put('search', 'kb-v1', 'blast', 'v1 result')
+    cache.flush()
+    assert cache.get('search', 'kb-v2', 'blast') is None
+    assert cache.get('embedding', 'kb-v1', 'blast') is None
+
+
+def test_reads_honor_max_age(open_cache, clock):
+    cache = open_cache()
+    cache.put('search', 'kb', 'blast', 'result')
+    cache.flush()
+    clock.now += 60
+    assert cache.get('search', 'kb', 'blast', max_age=60) == 'result'
+    assert cache.get('search', 'kb', 'blast', max_age=59) is None
+
+
+def test_old_entries_are_deleted_on_open(open_cache, clock):
+    cache = open_cache(max_age=100)
+    cache.put('search', 'kb', 'old', 'old')
+    clock.now += 50
+    cache.put('search', 'kb', 'new', 'new')
+    cache.flush()
+    cache.close()
+
+    clock.now += 60
+    reopened = open_cache(max_age=100)
+    assert reopened.get('search', 'kb', 'old') is None
+    assert reopened.get('search', 'kb', 'new') == 'new'
+
+
+def test_preload_returns_most_recent_entries_oldest_first(open_cache, clock):
+    cache = open_cache()
+    for key in ('a', 'b', 'c'):
+        cache.put('search', 'kb', key, key.upper())
+        clock.now += 1
+    cache.flush()
+    assert cache.preload('search', 'kb', limit=2) == [('b', 'B'), ('c', 'C')]
+
+
+def test_delete_matching_keys_includes_queued_writes(open_cache, clock):
+    cache = open_cache()
+    cache.put('diagnosis', 'model', 'rice|1', 'blast')
+    cache.put('diagnosis', 'model', 'wheat|1', 'rust')
+    assert cache.delete('diagnosis', lambda key: key.startswith('rice')) == 1
+    assert cache.get('diagnosis', 'model', 'rice|1') is None
+    assert cache.get('diagnosis', 'model', 'wheat|1') == 'rust'
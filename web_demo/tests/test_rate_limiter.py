@@ -0,0 +1,68 @@
+# --- tests/test_rate_limiter.py ---
+import pytest
+
+from src.utils import rate_limiter
+from src.utils.rate_limiter import MemoryRateLimiter, SQLiteRateLimiter
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, 'time', fake)
+    return fake
+
+
+def test_burst_up_to_limit_then_one_request_per_interval(clock):
+    limiter = MemoryRateLimiter({'search': (3, 60)})
+    assert [limiter.allow("u") for _ in range(4)] == [True, True, True, False]
+    clock.now += 19
+    assert not limiter.allow("u")
+    clock.now += 1
+    assert limiter.allow("u")
+    assert not limiter.allow("u")
+
+
+def test_routes_and_users_have_separate_limits(clock):
+    limiter = MemoryRateLimiter({'search': (1, 60), 'diagnosis': (1, 60)})
+    assert limiter.allow("u", "search")
+    assert limiter.allow("u", "diagnosis")
+    assert limiter.allow("v", "search")
+    assert not limiter.allow("u", "search")
+
+
+def test_idle_keys_are_evicted_by_expiry_not_insertion_order(clock):
+    limiter = MemoryRateLimiter({'slow': (1, 100), 'fast': (1, 1)})
+    limiter.allow("a", "slow")
+    limiter.allow("b", "fast")
+    clock.now += 2
+    limiter.allow("c", "fast")
+    # "b" expired behind the still-active "a"
+    assert len(limiter) == 2
+
+
+def test_max_keys_drops_least_recently_active(clock):
+    limiter = MemoryRateLimiter({'search': (1, 60)}, max_keys=2)
+    limiter.allow("a")
+    limiter.allow("b")
+    limiter.allow("c")
+    assert len(limiter) == 2
+    # "a" was dropped, so it starts with a full bucket again
+    assert limiter.allow("a")
+
+
+def test_sqlite_limits_are_shared_between_instances(clock, tmp_path):
+    db_path = str(tmp_path / "limits.sqlite3")
+    first = SQLiteRateLimiter({'search': (2, 60)}, db_path)
+    second = SQLiteRateLimiter({'search': (2, 60)}, db_path)
+    assert first.allow("u")
+    assert second.allow("u")
+    assert not first.allow("u")
+    assert len(second) == 1
@@ -0,0 +1,105 @@
+# --- tests/test_resilience.py ---
+import time
+
+import pytest
+
+from src.utils.resilience import (
+    CircuitBreaker, CircuitOpenError, DeadlineExceeded, RetryPolicy, TransientError,
+    remaining_time, request_deadline
+)
+
+
+def open_breaker(reset_timeout=0.05):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=reset_timeout)
+    breaker.record_failure()
+    breaker.record_failure()
+    return breaker
+
+
+def test_breaker_opens_after_consecutive_failures_and_rejects():
+    breaker = open_breaker(reset_timeout=60)
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.stats()['rejected'] == 1
+
+
+def test_half_open_breaker_admits_a_single_probe():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    breaker.before_call()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_successful_probe_closes_the_breaker():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_call()
+
+
+def test_failed_probe_reopens_the_breaker():
+    breaker = open_breaker()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_retry_policy_retries_transient_errors_only():
+    policy = RetryPolicy("test", max_attempts=3, base_delay=0.001)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise TransientError("busy")
+        return "ok"
+
+    assert policy.call(flaky) == "ok"
+    assert len(attempts) == 3
+    assert policy.stats()['recovered'] == 1
+
+    def broken():
+        attempts.append(1)
+        raise ValueError("bad input")
+
+    attempts.clear()
+    with pytest.raises(ValueError):
+        policy.call(broken)
+    assert len(attempts) == 1
+
+
+def test_expired_deadline_fails_fast():
+    policy = RetryPolicy("test")
+    with request_deadline(0):
+        assert remaining_time() <= 0
+        with pytest.raises(DeadlineExceeded):
+            policy.call(lambda: "never called")
+    assert remaining_time() is None
+
+
+def test_non_transient_errors_neither_open_the_breaker_nor_hold_the_probe():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.05)
+    policy = RetryPolicy("test", breaker=breaker)
+
+    def broken():
+        raise ValueError("bad input")
+
+    with pytest.raises(ValueError):
+        policy.call(broken)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record_failure()
+    time.sleep(0.06)
+    with pytest.raises(ValueError):
+        policy.call(broken)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert policy.call(lambda: "ok") == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,39 @@
+# --- tests/test_search_results.py ---
+import pytest
+
+from src.rag import search
+from src.rag.results import SearchResults
+from src.utils.resilience import CircuitOpenError, DeadlineExceeded
+
+
+class FakePack:
+    text_data = ["tomato blight", "potato scab", "rice blast"]
+
+
+def test_empty_results_format_to_no_chunks():
+    assert SearchResults.empty().texts() == []
+    assert SearchResults.empty().format() == []
+    assert SearchResults([1], [0.5]).format() == []
+
+
+def test_bound_results_resolve_text_in_rank_order():
+    results = SearchResults([2, 0], [0.9, 0.4], FakePack())
+    assert results.texts() == ["rice blast", "tomato blight"]
+    assert results.format(limit=1) == ["rice blast\n[Relevance: 0.90]"]
+
+
+def test_empty_query_returns_no_chunks():
+    assert search.search_knowledge_base("   ") == []
+    assert search.search_knowledge_base_batch(["", "  "]) == [[], []]
+
+
+@pytest.mark.parametrize("error", [
+    RuntimeError("index corrupt"), FileNotFoundError("missing.faiss"),
+    CircuitOpenError("open"), DeadlineExceeded("late"),
+])
+def test_search_errors_return_no_chunks(monkeypatch, error):
+    def failing_pack(region):
+        raise error
+    monkeypatch.setattr(search, "_get_pack", failing_pack)
+    assert search.search_knowledge_base("tomato leaves curling", user_id="errors") == []
+    assert search.search_knowledge_base_batch(["tomato", ""], user_id="errors") == [[], []]
@@ -0,0 +1,28 @@
+# --- tests/test_single_flight.py ---
+import threading
+
+import pytest
+
+from src.utils.resilience import DeadlineExceeded, request_deadline
+from src.utils.single_flight import SingleFlight
+
+
+def test_waiting_caller_gives_up_at_its_deadline():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return "done"
+
+    leader = threading.Thread(target=lambda: flight.do("key", slow))
+    leader.start()
+    started.wait(5)
+    with request_deadline(0.05):
+        with pytest.raises(DeadlineExceeded):
+            flight.do("key", slow)
+    release.set()
+    leader.join(5)
+    assert flight.in_flight() == 0